@@ -1,24 +1,26 @@
 from flask import Flask, request, jsonify
-import requests
 import os
-import simplejson as json
 import logging
+from pi_api import PiApiClient
+from circuit_breaker import CircuitOpenError
+import json_codec
+from log_config import configure_logging, PAYLOAD
 
-# Configurar logging
-logging.basicConfig(level=logging.DEBUG)
+# Configurar logging (ver log_config.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Configurar headers para la API de Pi Network
+# Configurar la API key de Pi Network
 api_key = os.getenv('PI_API_KEY', None)
 if not api_key:
     logger.warning('PI_API_KEY is missing, limited mode enabled.')
 
 
-server_header = {
-    'Authorization': f'Key {api_key}'
-}
+# Cliente compartido con pool de conexiones hacia la API de Pi Network
+pi_client = PiApiClient(api_key=api_key)
 
 app = Flask(__name__)
+json_codec.install(app)
 
 @app.route('/api/me', methods=['POST'])
 def get_user_info():
@@ -29,25 +31,23 @@ def get_user_info():
             logger.error('No access token provided')
             return jsonify({'error': 'No access token provided'}), 400
 
-        # Configurar headers para la petición al usuario
-        user_header = {
-            'Authorization': f'Bearer {access_token}'
-        }
-
         # Hacer la petición a la API de Pi Network
-        user_url = "https://api.minepi.com/v2/me"
-        response = requests.get(user_url, headers=user_header)
+        response = pi_client.get('/v2/me', access_token=access_token)
 
         if response.status_code != 200:
-            logger.error(f'Failed to get user info: {response.text}')
+            logger.error('Failed to get user info: %s', response.text)
             return jsonify({'error': 'Failed to get user info'}), 400
 
         user_data = response.json()
-        logger.info(f'Successfully retrieved user info: {user_data}')
+        logger.debug('Successfully retrieved user info: %s', user_data, extra=PAYLOAD)
         return jsonify(user_data)
 
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return jsonify(e.payload()), 503, e.headers()
+
     except Exception as e:
-        logger.error(f'Error getting user info: {str(e)}')
+        logger.error('Error getting user info: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/wallet', methods=['POST'])
@@ -59,25 +59,23 @@ def get_wallet_info():
             logger.error('No access token provided')
             return jsonify({'error': 'No access token provided'}), 400
 
-        # Configurar headers para la petición al usuario
-        user_header = {
-            'Authorization': f'Bearer {access_token}'
-        }
-
         # Hacer la petición a la API de Pi Network
-        wallet_url = "https://api.minepi.com/v1/me"
-        response = requests.get(wallet_url, headers=user_header)
+        response = pi_client.get('/v1/me', access_token=access_token)
 
         if response.status_code != 200:
-            logger.error(f'Failed to get wallet info: {response.text}')
+            logger.error('Failed to get wallet info: %s', response.text)
             return jsonify({'error': 'Failed to get wallet info'}), 400
 
         wallet_data = response.json()
-        logger.info(f'Successfully retrieved wallet info: {wallet_data}')
+        logger.debug('Successfully retrieved wallet info: %s', wallet_data, extra=PAYLOAD)
         return jsonify(wallet_data)
 
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return jsonify(e.payload()), 503, e.headers()
+
     except Exception as e:
-        logger.error(f'Error getting wallet info: {str(e)}')
+        logger.error('Error getting wallet info: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
@@ -1,35 +1,115 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from flask_bootstrap import Bootstrap
-from flask_cors import CORS
-import requests
+# Primero: el perfil de arranque (STARTUP_PROFILE) mide los imports siguientes
+import startup
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 import os
+import math
 import time
-from dotenv import load_dotenv
-import simplejson as json
 import logging
 # Importar el módulo de contador de pagos
-from payment_counter import add_to_counter, get_counter_summary
-
-# Configurar logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+from payment_counter import add_to_counter, get_counter_summary, get_counter_version, get_payment_stats, counter_events
+from pi_api import PiApiClient, PI_API_BASE_URL
+from circuit_breaker import CircuitOpenError, UPSTREAM_BREAKERS
+from fanout import fan_out, DeadlineExceeded
+from ttl_cache import TTLCache
+from storage import create_score_store
+from leaderboards import Leaderboards
+from payment_dedup import ProcessedPayments
+from completion_outbox import CompletionOutbox, public_status, COMPLETED, ACTIVE_STATES
+from events import format_sse, format_heartbeat
+from http_cache import conditional_response
+from transactions import parse_filters, decode_cursor, filter_transactions, paginate
+import assets
+import metrics
+import json_codec
+from log_config import configure_logging, REQUEST, UPSTREAM, PAYLOAD
+from page_cache import PageCache
+import hashlib
 
 # Cargar variables de entorno
-load_dotenv()
+startup.load_env()
+
+# Modo de arranque: en lazy (por defecto en Vercel) se aplaza el trabajo que la primera petición quizá no necesite
+LAZY_STARTUP = startup.lazy_startup()
 
-# Configurar headers para la API de Pi Network
+# Configurar logging (cola, muestreo y ocultación de datos sensibles; ver log_config.py)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Configurar la API key de Pi Network
 api_key = os.getenv('PI_API_KEY', None)
 if not api_key:
     logger.warning('PI_API_KEY is missing, limited mode enabled.')
 
 
-server_header = {
-    'Authorization': f'Key {api_key}'
-}
+# Cliente compartido con pool de conexiones hacia la API de Pi Network
+# (PI_API_BASE_URL permite apuntar a otro servidor, como benchmarks/mock_pi_api.py)
+pi_client = PiApiClient(api_key=api_key, base_url=os.getenv('PI_API_BASE_URL', PI_API_BASE_URL))
+
+# Caché de /api/me y /api/wallet por token de acceso (TTL en segundos, tamaño máximo)
+lookup_cache = TTLCache(
+    ttl=float(os.getenv('LOOKUP_CACHE_TTL', 30)),
+    max_entries=int(os.getenv('LOOKUP_CACHE_MAX_ENTRIES', 1024)),
+    max_bytes=int(os.getenv('LOOKUP_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+)
+
+# Registro de puntuaciones del juego (se carga en memoria en el primer uso)
+score_store = create_score_store(compact_every=int(os.getenv('SCORES_COMPACT_EVERY', 1000)))
+# Clasificaciones del día, de la semana y de siempre (las LEADERBOARD_SIZE mejores por nivel)
+leaderboards = Leaderboards(score_store, k=int(os.getenv('LEADERBOARD_SIZE', 100)))
+
+# Pagos ya completados: respuesta guardada por payment_id (TTL en segundos y tamaño opcionales)
+processed_payments = ProcessedPayments(
+    ttl=float(os.getenv('PROCESSED_PAYMENTS_TTL')) if os.getenv('PROCESSED_PAYMENTS_TTL') else None,
+    max_entries=int(os.getenv('PROCESSED_PAYMENTS_MAX')) if os.getenv('PROCESSED_PAYMENTS_MAX') else None
+)
+
+# Streams SSE (contador y estado de pagos): cada conexión ocupa un worker o una
+# invocación mientras dura, así que solo se sirven si se activan en un servidor de
+# larga duración (asgi.py los activa por defecto). Desactivados responden 204 y el
+# navegador pasa a consultar periódicamente.
+SSE_ENABLED = os.getenv('SSE_ENABLED', 'false').lower() not in ('0', 'false', 'no', '')
+# Heartbeat y duración máxima de cada conexión (segundos)
+SSE_HEARTBEAT = float(os.getenv('SSE_HEARTBEAT', 15))
+SSE_MAX_DURATION = float(os.getenv('SSE_MAX_DURATION', 300))
+# Stream de estado de un pago: intervalo máximo entre consultas (segundos)
+PAYMENT_STATUS_POLL = float(os.getenv('PAYMENT_STATUS_POLL', 1))
+
+# /api/transactions: tamaño de página y caché por usuario de la lista descargada (segundos, bytes)
+TRANSACTIONS_DEFAULT_LIMIT = int(os.getenv('TRANSACTIONS_DEFAULT_LIMIT', 50))
+TRANSACTIONS_MAX_LIMIT = int(os.getenv('TRANSACTIONS_MAX_LIMIT', 500))
+transactions_cache = TTLCache(
+    ttl=float(os.getenv('TRANSACTIONS_CACHE_TTL', 60)),
+    max_entries=int(os.getenv('TRANSACTIONS_CACHE_MAX_ENTRIES', 256)),
+    max_bytes=int(os.getenv('TRANSACTIONS_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+)
+
+# /api/bootstrap: secciones disponibles y plazo total compartido (segundos)
+BOOTSTRAP_SECTIONS = ('user', 'wallet', 'counter', 'scores')
+BOOTSTRAP_DEADLINE = float(os.getenv('BOOTSTRAP_DEADLINE', 5))
+
+# Completado de pagos: 'sync' (la petición espera a la API de Pi) o 'async' (cola en segundo plano)
+PAYMENT_COMPLETION_MODE = os.getenv('PAYMENT_COMPLETION_MODE', 'sync').lower()
+
+# Cancelación masiva de pagos pendientes: paralelismo máximo y plazo total (segundos)
+CANCEL_MAX_PARALLEL = int(os.getenv('CANCEL_MAX_PARALLEL', 8))
+CANCEL_DEADLINE = float(os.getenv('CANCEL_DEADLINE', 20))
 
 app = Flask(__name__, static_folder='static')
-Bootstrap(app)
-CORS(app, resources={r"/*": {"origins": "*"}})
+# jsonify y request.json con orjson si está instalado (ver json_codec.py)
+json_codec.install(app)
+if not LAZY_STARTUP:
+    # Las plantillas cargan Bootstrap desde su CDN y after_request ya añade las
+    # cabeceras CORS: en modo lazy no se importan estas extensiones
+    from flask_bootstrap import Bootstrap
+    from flask_cors import CORS
+    Bootstrap(app)
+    CORS(app, resources={r"/*": {"origins": "*"}})
+
+# Archivos estáticos versionados y precomprimidos (asset_url() en las plantillas)
+assets.init_app(app)
+
+# Latencia y códigos de estado por ruta, expuestos en /metrics
+metrics.init_app(app)
 
 # Configuración de Flask
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'dev-key-change-in-production')
@@ -45,20 +125,106 @@ def after_request(response):
         del response.headers['X-Frame-Options']
     return response
 
+# Todas las rutas POST leen un objeto JSON: un cuerpo mal formado es un 400, no un error interno
+@app.before_request
+def reject_invalid_json():
+    if request.method == 'POST' and not isinstance(request.get_json(silent=True), dict):
+        logger.warning('Invalid JSON body for %s', request.path)
+        return jsonify({'error': 'Invalid JSON body'}), 400
+
+# Páginas renderizadas una sola vez y servidas ya comprimidas
+page_cache = PageCache(app)
+if not LAZY_STARTUP:
+    # En modo lazy cada página (y los archivos estáticos) se prepara en su primera petición
+    with startup.profiler.phase('page_cache.warm'):
+        page_cache.warm('index.html', 'simon.html')
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return page_cache.response('index.html')
 
 @app.route('/simon')
 def simon_game():
     """Ruta para el juego Simon Dice"""
-    return render_template('simon.html')
+    return page_cache.response('simon.html')
 
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory(os.path.join(app.root_path, 'static'),
                                'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    Estado de la aplicación y de los circuitos de la API de Pi Network
+
+    Responde 200 aunque algún circuito esté abierto: las páginas y las rutas
+    que no dependen de Pi siguen funcionando (status 'degraded').
+    """
+    upstream = UPSTREAM_BREAKERS.snapshot()
+    degraded = any(breaker['state'] != 'closed' for breaker in upstream.values())
+    response = jsonify({'status': 'degraded' if degraded else 'ok', 'upstream': upstream})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def token_key(access_token):
+    """Hash del token de acceso, para no guardar tokens en memoria en claro"""
+    return hashlib.sha256(access_token.encode('utf-8')).hexdigest()
+
+def cached_user_lookup(kind, path, access_token):
+    """
+    Consulta /v2/me o /v2/wallet pasando por la caché de búsquedas
+
+    La clave es un hash del token para no guardar tokens en memoria en claro.
+    Las peticiones concurrentes con el mismo token comparten una sola llamada.
+    """
+    key = token_key(access_token)
+
+    def load():
+        response = pi_client.get(path, access_token=access_token)
+        return lookup_entry(kind, key, response), response.status_code == 200
+
+    response, user_uid = lookup_cache.get_or_load((kind, key), load, size_of=lambda entry: len(entry[0].content))
+    tag_user_lookups(key, user_uid)
+    return response
+
+def lookup_entry(kind, key, response):
+    """
+    Valor que se guarda en la caché de búsquedas: (respuesta, uid del usuario o None)
+
+    El uid se obtiene una sola vez al cargar: de la propia respuesta de /v2/me,
+    o para /v2/wallet del /v2/me del mismo token si está en caché.
+    """
+    user_uid = None
+    if response.status_code == 200:
+        if kind == 'me':
+            try:
+                user_uid = response.json().get('uid')
+            except (ValueError, AttributeError):
+                pass
+        else:
+            me = lookup_cache.get(('me', key))
+            user_uid = me[1] if me is not None else None
+    return response, user_uid
+
+def tag_user_lookups(key, user_uid):
+    """Asocia las búsquedas y transacciones del token al usuario para poder invalidarlas tras un pago"""
+    if user_uid:
+        tag = f'user:{user_uid}'
+        lookup_cache.tag(tag, ('me', key), ('wallet', key))
+        transactions_cache.tag(tag, ('transactions', key))
+
+def invalidate_user_lookups(user_uid=None, access_token=None):
+    """Descarta las búsquedas en caché de un usuario cuyo wallet ha cambiado"""
+    if user_uid:
+        lookup_cache.invalidate_tag(f'user:{user_uid}')
+        transactions_cache.invalidate_tag(f'user:{user_uid}')
+    if access_token:
+        key = token_key(access_token)
+        lookup_cache.invalidate(('me', key), ('wallet', key))
+        # Tras un pago hay una transacción nueva
+        transactions_cache.invalidate(('transactions', key))
+
 @app.route('/api/me', methods=['POST'])
 def get_user_info():
     try:
@@ -68,58 +234,48 @@ def get_user_info():
             logger.error('No access token provided')
             return jsonify({'error': 'No access token provided'}), 400
 
-        # Configurar headers para la petición al usuario
-        user_header = {
-            'Authorization': f'Bearer {access_token}'
-        }
-
         # Hacer la petición a la API de Pi Network
-        user_url = "https://api.minepi.com/v2/me"
-        response = requests.get(user_url, headers=user_header)
+        response = cached_user_lookup('me', '/v2/me', access_token)
 
         if response.status_code != 200:
-            logger.error(f'Failed to get user info: {response.text}')
+            logger.error('Failed to get user info: %s', response.text)
             return jsonify({'error': 'Failed to get user info'}), 400
 
         user_data = response.json()
-        logger.info(f'Successfully retrieved user info: {user_data}')
+        logger.debug('Successfully retrieved user info: %s', user_data, extra=PAYLOAD)
         return jsonify(user_data)
 
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return jsonify(e.payload()), 503, e.headers()
+    
     except Exception as e:
-        logger.error(f'Error getting user info: {str(e)}')
+        logger.error('Error getting user info: %s', e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/wallet', methods=['POST'])
 def get_wallet_info():
     try:
         # Obtener el token de acceso del frontend
-        logger.debug(f'Request JSON: {request.json}')
+        logger.debug('Request JSON: %s', request.json, extra=PAYLOAD)
         access_token = request.json.get('accessToken')
         if not access_token:
             logger.error('No access token provided')
             return jsonify({'error': 'No access token provided'}), 400
 
-        logger.debug(f'Access token received: {access_token[:10]}...')
-
-        # Configurar headers para la petición al usuario
-        user_header = {
-            'Authorization': f'Bearer {access_token}'
-        }
-
         # Hacer la petición a la API de Pi Network
-        wallet_url = "https://api.minepi.com/v2/wallet"
-        logger.debug(f'Making request to: {wallet_url}')
-        response = requests.get(wallet_url, headers=user_header)
+        logger.debug('Making request to: %s', '/v2/wallet', extra=REQUEST)
+        response = cached_user_lookup('wallet', '/v2/wallet', access_token)
 
-        logger.debug(f'Response status code: {response.status_code}')
-        logger.debug(f'Response content: {response.text}')
+        logger.debug('Response status code: %s', response.status_code, extra=UPSTREAM)
+        logger.debug('Response content: %s', response.text, extra=PAYLOAD)
 
         if response.status_code != 200:
-            logger.error(f'Failed to get wallet info: {response.text}')
+            logger.error('Failed to get wallet info: %s', response.text)
             return jsonify({'error': f'Failed to get wallet info: {response.text}'}), 400
 
         wallet_data = response.json()
-        logger.info(f'Successfully retrieved wallet info: {wallet_data}')
+        logger.debug('Successfully retrieved wallet info: %s', wallet_data, extra=PAYLOAD)
         
         # Si no hay balance, establecer un valor predeterminado
         if 'balance' not in wallet_data:
@@ -128,8 +284,12 @@ def get_wallet_info():
             
         return jsonify(wallet_data)
 
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return jsonify(e.payload()), 503, e.headers()
+    
     except Exception as e:
-        logger.error(f'Error getting wallet info: {str(e)}')
+        logger.error('Error getting wallet info: %s', e)
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
 # Rutas para manejar pagos de Pi Network
@@ -144,91 +304,106 @@ def approve_payment():
             logger.error('Missing paymentId or accessToken')
             return jsonify({'error': 'Missing paymentId or accessToken'}), 400
         
-        logger.info(f'Approving payment: {payment_id}')
-        
-        # Configurar headers para la petición a la API de Pi Network
-        headers = {
-            'Authorization': f'Key {api_key}'
-        }
+        logger.info('Approving payment: %s', payment_id)
         
         # Aprobar el pago en la API de Pi Network
-        approve_url = f"https://api.minepi.com/v2/payments/{payment_id}/approve"
         approve_data = {}  # No se necesitan datos adicionales para aprobar
         
-        response = requests.post(approve_url, json=approve_data, headers=headers)
+        response = pi_client.post(f'/v2/payments/{payment_id}/approve', json=approve_data)
         
         if response.status_code != 200:
-            logger.error(f'Failed to approve payment: {response.text}')
+            logger.error('Failed to approve payment: %s', response.text)
             return jsonify({'error': f'Failed to approve payment: {response.text}'}), 400
         
         approval_result = response.json()
-        logger.info(f'Payment approved: {approval_result}')
+        logger.info('Payment approved: %s', payment_id)
+        logger.debug('Approval result: %s', approval_result, extra=PAYLOAD)
         
         return jsonify(approval_result)
     
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return jsonify(e.payload()), 503, e.headers()
+    
     except Exception as e:
-        logger.error(f'Error approving payment: {str(e)}')
+        logger.error('Error approving payment: %s', e)
         return jsonify({'error': f'Error approving payment: {str(e)}'}), 500
 
-@app.route('/payment/complete', methods=['POST'])
-def complete_payment():
-    try:
-        # Obtener el ID del pago y el ID de la transacción
-        payment_id = request.json.get('paymentId')
-        txid = request.json.get('txid')
-        
-        if not payment_id:
-            logger.error('Missing paymentId')
-            return jsonify({'error': 'Missing paymentId'}), 400
-        
-        logger.info(f'Completing payment: {payment_id}, txid: {txid}')
-        
-        # Si es una cancelación o un error, simplemente registrarlo
-        debug = request.json.get('debug')
-        if debug == 'cancel':
-            logger.info(f'Payment {payment_id} was cancelled')
-            return jsonify({'status': 'cancelled'})
-        elif debug == 'error':
-            logger.info(f'Payment {payment_id} had an error')
-            return jsonify({'status': 'error'})
-        
-        # Si no hay txid, puede ser una cancelación o un error
-        if not txid:
-            logger.warning(f'No txid provided for payment {payment_id}')
-            return jsonify({'status': 'incomplete', 'message': 'No transaction ID provided'})
-        
-        # Configurar headers para la petición a la API de Pi Network
-        headers = {
-            'Authorization': f'Key {api_key}'
-        }
-        
-        # Obtener detalles completos del pago desde la API de Pi
-        payment_url = f"https://api.minepi.com/v2/payments/{payment_id}"
-        payment_response = requests.get(payment_url, headers=headers)
-        
-        if payment_response.status_code != 200:
-            logger.error(f'Failed to get payment details: {payment_response.text}')
-            return jsonify({'error': f'Failed to get payment details: {payment_response.text}'}), 400
-        
-        payment_details = payment_response.json()
-        payment_amount = float(payment_details.get('amount', 0.0))
-        user_id = payment_details.get('user_uid', '')
-        username = payment_details.get('user_uid', '') # Usamos user_uid como nombre también, podríamos obtener el nombre real con otra llamada API
-        
+def finalize_payment(payment_id, txid, access_token=None):
+    """
+    Completa un pago en la API de Pi Network y lo suma al contador una sola vez
+
+    Args:
+        payment_id (str): El ID del pago
+        txid (str): El ID de la transacción en la blockchain
+        access_token (str, opcional): Token del usuario, para invalidar su caché
+
+    Returns:
+        tuple: (respuesta, código de estado HTTP)
+    """
+    # Otra petición del mismo pago pudo terminar mientras esperábamos
+    cached_result = processed_payments.get(payment_id)
+    if cached_result is not None:
+        return cached_result, 200
+    
+    # Obtener detalles completos del pago desde la API de Pi
+    payment_response = pi_client.get(f'/v2/payments/{payment_id}')
+    
+    if payment_response.status_code != 200:
+        logger.error('Failed to get payment details: %s', payment_response.text)
+        return {'error': f'Failed to get payment details: {payment_response.text}',
+                'upstreamStatus': payment_response.status_code}, 400
+    
+    payment_details = payment_response.json()
+    payment_amount = float(payment_details.get('amount', 0.0))
+    user_id = payment_details.get('user_uid', '')
+    
+    if completed_upstream(payment_details):
+        # Un intento anterior llegó a la API pero no recibió la respuesta: solo falta sumarlo al contador
+        logger.info('Payment %s already completed in Pi Network', payment_id)
+        completion_result = payment_details
+    else:
         # Completar el pago en la API de Pi Network
-        complete_url = f"https://api.minepi.com/v2/payments/{payment_id}/complete"
         complete_data = {
             'txid': txid
         }
         
-        response = requests.post(complete_url, json=complete_data, headers=headers)
+        response = pi_client.post(f'/v2/payments/{payment_id}/complete', json=complete_data)
         
         if response.status_code != 200:
-            logger.error(f'Failed to complete payment: {response.text}')
-            return jsonify({'error': f'Failed to complete payment: {response.text}'}), 400
+            logger.error('Failed to complete payment: %s', response.text)
+            return {'error': f'Failed to complete payment: {response.text}',
+                    'upstreamStatus': response.status_code}, 400
         
         completion_result = response.json()
-        logger.info(f'Payment completed: {completion_result}')
+    logger.info('Payment completed: %s', payment_id)
+    logger.debug('Completion result: %s', completion_result, extra=PAYLOAD)
+    
+    # El balance del usuario ha cambiado: descartar su wallet en caché
+    invalidate_user_lookups(user_uid=user_id, access_token=access_token)
+    
+    return record_completion(payment_id, payment_amount, user_id, completion_result), 200
+
+def completed_upstream(payment_details):
+    """True si la API de Pi ya marca el pago como completado por el desarrollador"""
+    status = payment_details.get('status')
+    return isinstance(status, dict) and bool(status.get('developer_completed'))
+
+def record_completion(payment_id, payment_amount, user_id, completion_result):
+    """
+    Suma un pago completado al contador y guarda su respuesta
+
+    La comprobación y el registro se hacen de forma atómica entre workers para
+    no contar dos veces el mismo pago.
+
+    Returns:
+        dict: La respuesta de /payment/complete para este pago
+    """
+    username = user_id  # Usamos user_uid como nombre también, podríamos obtener el nombre real con otra llamada API
+    with processed_payments.exclusive():
+        cached_result = processed_payments.get(payment_id)
+        if cached_result is not None:
+            return cached_result
         
         # Añadir el 50% del pago al contador (la otra mitad va a la wallet principal)
         amount_to_add = payment_amount / 2  # Dividimos el pago en dos partes iguales
@@ -239,10 +414,10 @@ def complete_payment():
             username=username
         )
         
-        logger.info(f'Added {amount_to_add} Pi to counter. Total accumulated: {counter_result["accumulated_amount"]} Pi')
+        logger.info('Added %s Pi to counter. Total accumulated: %s Pi', amount_to_add, counter_result['accumulated_amount'])
         
         # Devolver el resultado con la información del contador
-        return jsonify({
+        result = {
             'status': 'success',
             'message': 'Payment completed and counter updated',
             'payment_result': completion_result,
@@ -251,12 +426,176 @@ def complete_payment():
                 'total_accumulated': counter_result['accumulated_amount'],
                 'payments_count': counter_result['payments_count']
             }
-        })
+        }
+        processed_payments.record(payment_id, result)
+    return result
+
+def process_queued_completion(payment_id, txid, access_token):
+    """Un intento de la cola de completados (mismo proceso que la ruta síncrona)"""
+    with processed_payments.claim(payment_id):
+        result, status_code = finalize_payment(payment_id, txid, access_token=access_token)
+    # La cola decide si reintenta según el código de la API de Pi, no el 400 de la ruta
+    return result, result.get('upstreamStatus', status_code)
+
+# Cola persistente de completados, solo en modo asíncrono (requiere un servidor de larga duración)
+completion_outbox = None
+if PAYMENT_COMPLETION_MODE == 'async':
+    completion_outbox = CompletionOutbox(
+        process_queued_completion,
+        workers=int(os.getenv('COMPLETION_WORKERS', 2)),
+        max_attempts=int(os.getenv('COMPLETION_MAX_ATTEMPTS', 5)),
+        backoff=float(os.getenv('COMPLETION_BACKOFF', 1)),
+        max_backoff=float(os.getenv('COMPLETION_MAX_BACKOFF', 60)),
+        stale_after=float(os.getenv('COMPLETION_STALE_AFTER', 120))
+    )
+    completion_outbox.start()
+
+def completion_status(payment_id):
+    """
+    Estado del completado de un pago para /payment/status
+
+    Returns:
+        dict: Estado del pago (con la respuesta de /payment/complete si ya se
+        completó) o None si el pago no se conoce
+    """
+    entry = completion_outbox.status(payment_id) if completion_outbox is not None else None
+    status = public_status(entry) if entry is not None else None
+    if status is None or status['state'] == COMPLETED:
+        # También los pagos completados de forma síncrona o ya retirados de la cola
+        result = processed_payments.get(payment_id)
+        if result is not None:
+            status = status or {'paymentId': payment_id, 'state': COMPLETED}
+            status['result'] = result
+    return status
+
+def prepare_completion(data):
+    """
+    Comprobaciones de /payment/complete anteriores a completar el pago
+
+    Compartidas por app.py y asgi.py: validan la petición, devuelven la respuesta
+    guardada si el pago ya se completó y, en modo asíncrono, lo anotan en la cola.
+
+    Args:
+        data (dict): Cuerpo de la petición
+
+    Returns:
+        tuple: (respuesta, código) si la petición ya tiene respuesta, o None si
+        el llamador debe completar el pago con finalize_payment
+    """
+    # Obtener el ID del pago y el ID de la transacción
+    payment_id = data.get('paymentId')
+    txid = data.get('txid')
+    
+    if not payment_id:
+        logger.error('Missing paymentId')
+        return {'error': 'Missing paymentId'}, 400
+    
+    logger.info('Completing payment: %s, txid: %s', payment_id, txid)
+    
+    # Si es una cancelación o un error, simplemente registrarlo
+    debug = data.get('debug')
+    if debug == 'cancel':
+        logger.info('Payment %s was cancelled', payment_id)
+        return {'status': 'cancelled'}, 200
+    elif debug == 'error':
+        logger.info('Payment %s had an error', payment_id)
+        return {'status': 'error'}, 200
+    
+    # Si no hay txid, puede ser una cancelación o un error
+    if not txid:
+        logger.warning('No txid provided for payment %s', payment_id)
+        return {'status': 'incomplete', 'message': 'No transaction ID provided'}, 200
+    
+    # Si el pago ya se completó, devolver la respuesta guardada sin llamar a la API
+    cached_result = processed_payments.get(payment_id)
+    if cached_result is not None:
+        logger.info('Payment %s already completed, returning stored result', payment_id)
+        return cached_result, 200
+    
+    if completion_outbox is not None:
+        # Modo asíncrono: anotar el pago y responder sin esperar a la API de Pi
+        entry = completion_outbox.enqueue(payment_id, txid, access_token=data.get('accessToken'))
+        return dict(public_status(entry), status='queued', statusUrl=f'/payment/status/{payment_id}'), 202
+    return None
+
+@app.route('/payment/complete', methods=['POST'])
+def complete_payment():
+    try:
+        prepared = prepare_completion(request.json)
+        if prepared is not None:
+            result, status_code = prepared
+            return jsonify(result), status_code
+        
+        payment_id = request.json['paymentId']
+        with processed_payments.claim(payment_id):
+            result, status_code = finalize_payment(payment_id, request.json['txid'],
+                                                   access_token=request.json.get('accessToken'))
+        return jsonify(result), status_code
+    
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return jsonify(e.payload()), 503, e.headers()
     
     except Exception as e:
-        logger.error(f'Error completing payment: {str(e)}')
+        logger.error('Error completing payment: %s', e)
         return jsonify({'error': f'Error completing payment: {str(e)}'}), 500
 
+@app.route('/payment/status/<payment_id>', methods=['GET'])
+def get_payment_status(payment_id):
+    """Estado del completado de un pago (para consultar tras un 202 de /payment/complete)"""
+    try:
+        status = completion_status(payment_id)
+        if status is None:
+            return jsonify({'error': 'Unknown payment'}), 404
+        return jsonify(status)
+    
+    except Exception as e:
+        logger.error('Error getting payment status: %s', e)
+        return jsonify({'error': f'Error getting payment status: {str(e)}'}), 500
+
+def sse_disabled():
+    """
+    Respuesta de los streams SSE cuando están desactivados
+
+    Con 204 el navegador no vuelve a conectar el EventSource y el JS pasa a
+    consultar la ruta normal periódicamente.
+    """
+    return Response(status=204, headers={'Cache-Control': 'no-store'})
+
+@app.route('/payment/status/<payment_id>/stream', methods=['GET'])
+def stream_payment_status(payment_id):
+    """Enviar los cambios de estado de un pago como Server-Sent Events hasta que termine"""
+    if not SSE_ENABLED:
+        return sse_disabled()
+
+    def generate():
+        deadline = time.monotonic() + SSE_MAX_DURATION
+        yield 'retry: 3000\n\n'
+        last_sent = None
+        # Los cambios hechos por otro worker no llegan como evento: se consulta el
+        # estado en cada vuelta, como mucho cada PAYMENT_STATUS_POLL segundos
+        events = completion_outbox.events.subscribe(heartbeat=PAYMENT_STATUS_POLL) if completion_outbox else None
+        while True:
+            status = completion_status(payment_id)
+            if status != last_sent:
+                last_sent = status
+                yield format_sse(status, event='payment')
+            else:
+                yield format_heartbeat()
+            if status is None or status['state'] not in ACTIVE_STATES:
+                return
+            if time.monotonic() >= deadline:
+                return
+            if events is not None:
+                next(events)
+            else:
+                time.sleep(PAYMENT_STATUS_POLL)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/payment/error', methods=['POST'])
 def payment_error():
     try:
@@ -264,7 +603,7 @@ def payment_error():
         payment_dto = request.json.get('paymentDTO')
         payment_id = request.json.get('paymentId')
         
-        logger.error(f'Payment error: {payment_id}, DTO: {payment_dto}')
+        logger.error('Payment error: %s, DTO: %s', payment_id, payment_dto)
         
         # Aquí podrías implementar lógica para manejar errores de pago
         # Por ejemplo, notificar al usuario, intentar nuevamente, etc.
@@ -272,7 +611,7 @@ def payment_error():
         return jsonify({'status': 'error_logged'})
     
     except Exception as e:
-        logger.error(f'Error handling payment error: {str(e)}')
+        logger.error('Error handling payment error: %s', e)
         return jsonify({'error': f'Error handling payment error: {str(e)}'}), 500
 
 @app.route('/payment/check-pending', methods=['POST'])
@@ -285,36 +624,86 @@ def check_pending_payments():
             logger.error('Missing accessToken')
             return jsonify({'error': 'Missing accessToken'}), 400
         
-        # Configurar headers para la petición al usuario
-        user_header = {
-            'Authorization': f'Bearer {access_token}'
-        }
-        
         # Consultar la API de Pi Network para pagos pendientes
         # Esto es una aproximación, ya que la API puede no tener este endpoint exacto
         try:
-            payments_url = "https://api.minepi.com/v2/payments/incomplete"
-            response = requests.get(payments_url, headers=user_header)
+            response = pi_client.get('/v2/payments/incomplete', access_token=access_token)
             
             if response.status_code == 200:
                 payments_data = response.json()
-                logger.info(f'Found pending payments: {payments_data}')
+                logger.info('Found %d pending payments', len(payments_data))
+                logger.debug('Pending payments: %s', payments_data, extra=PAYLOAD)
                 return jsonify({'pendingPayments': payments_data})
             else:
                 # Si la API no tiene el endpoint, buscar en el servidor local
-                logger.warning(f'Could not get pending payments from API: {response.text}')
+                logger.warning('Could not get pending payments from API: %s', response.text)
                 # Aquí podrías implementar lógica para buscar pagos pendientes localmente
                 return jsonify({'pendingPayments': []})
                 
         except Exception as api_error:
-            logger.error(f'Error checking pending payments from API: {str(api_error)}')
+            logger.error('Error checking pending payments from API: %s', api_error)
             # Fallback a un método alternativo
             return jsonify({'pendingPayments': [], 'error': str(api_error)})
     
     except Exception as e:
-        logger.error(f'Error checking pending payments: {str(e)}')
+        logger.error('Error checking pending payments: %s', e)
         return jsonify({'error': f'Error checking pending payments: {str(e)}'}), 500
 
+def cancel_timeout(deadline_at):
+    """
+    Timeout (connect, read) de una llamada que no debe superar el final del plazo de la petición
+
+    Raises:
+        DeadlineExceeded: Si el plazo ya venció
+    """
+    remaining = deadline_at - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded(f'Deadline of {CANCEL_DEADLINE}s exceeded')
+    return (min(pi_client.connect_timeout, remaining), min(pi_client.read_timeout, remaining))
+
+def cancel_payments(payment_ids, deadline_at=None):
+    """
+    Cancela varios pagos en la API de Pi Network de forma concurrente
+
+    Args:
+        payment_ids (list): IDs de los pagos a cancelar
+        deadline_at (float, opcional): Final del plazo (time.monotonic()); por
+            defecto CANCEL_DEADLINE a partir de ahora
+
+    Returns:
+        list: Un resultado por pago, en el mismo orden que payment_ids. El
+        estado es 'cancelled', 'error' o 'unknown' (la llamada seguía en curso
+        al vencer el plazo: el pago puede haberse cancelado)
+    """
+    if deadline_at is None:
+        deadline_at = time.monotonic() + CANCEL_DEADLINE
+    # El timeout se calcula al empezar cada llamada (las que esperan turno tienen
+    # menos tiempo) y nunca supera el plazo total de la petición
+    tasks = {
+        payment_id: (lambda pid=payment_id: pi_client.post(f'/v2/payments/{pid}/cancel',
+                                                           timeout=cancel_timeout(deadline_at)))
+        for payment_id in dict.fromkeys(payment_ids)
+    }
+    outcomes = fan_out(tasks, max_workers=CANCEL_MAX_PARALLEL, deadline=max(0.0, deadline_at - time.monotonic()))
+
+    results = []
+    for payment_id in payment_ids:
+        ok, value = outcomes[payment_id]
+        if not ok and isinstance(value, DeadlineExceeded) and value.started:
+            logger.warning('Cancellation of payment %s still in progress at the deadline', payment_id)
+            results.append({'id': payment_id, 'status': 'unknown',
+                            'message': 'Cancellation still in progress when the deadline expired'})
+        elif not ok:
+            logger.error('Failed to cancel payment %s: %s', payment_id, value)
+            results.append({'id': payment_id, 'status': 'error', 'message': str(value)})
+        elif value.status_code == 200:
+            logger.info('Successfully cancelled payment %s', payment_id)
+            results.append({'id': payment_id, 'status': 'cancelled'})
+        else:
+            logger.error('Failed to cancel payment %s: %s', payment_id, value.text)
+            results.append({'id': payment_id, 'status': 'error', 'message': value.text})
+    return results
+
 @app.route('/payment/cancel-all-pending', methods=['POST'])
 def cancel_all_pending_payments():
     try:
@@ -325,68 +714,52 @@ def cancel_all_pending_payments():
             logger.error('Missing accessToken')
             return jsonify({'error': 'Missing accessToken'}), 400
         
-        # Configurar headers
-        user_header = {
-            'Authorization': f'Bearer {access_token}'
-        }
-        
-        server_header = {
-            'Authorization': f'Key {api_key}'
-        }
-        
+        # CANCEL_DEADLINE cubre toda la petición, también la consulta de los pagos pendientes
+        deadline_at = time.monotonic() + CANCEL_DEADLINE
+
         # 1. Primero intenta obtener la lista de pagos pendientes
         try:
             # Intentar obtener pagos pendientes (la API puede no tener este endpoint)
-            payments_url = "https://api.minepi.com/v2/payments/incomplete"
-            response = requests.get(payments_url, headers=user_header)
+            response = pi_client.get('/v2/payments/incomplete', access_token=access_token,
+                                     timeout=cancel_timeout(deadline_at))
             
             # Si la API responde correctamente
             if response.status_code == 200:
                 payments_data = response.json()
-                logger.info(f'Found payments to cancel: {payments_data}')
+                logger.info('Found %d payments to cancel', len(payments_data))
+                logger.debug('Payments to cancel: %s', payments_data, extra=PAYLOAD)
                 
-                # Cancelar cada pago pendiente
-                results = []
-                for payment in payments_data:
-                    payment_id = payment.get('identifier')
-                    if payment_id:
-                        cancel_url = f"https://api.minepi.com/v2/payments/{payment_id}/cancel"
-                        cancel_response = requests.post(cancel_url, headers=server_header)
-                        
-                        if cancel_response.status_code == 200:
-                            logger.info(f'Successfully cancelled payment {payment_id}')
-                            results.append({'id': payment_id, 'status': 'cancelled'})
-                        else:
-                            logger.error(f'Failed to cancel payment {payment_id}: {cancel_response.text}')
-                            results.append({'id': payment_id, 'status': 'error', 'message': cancel_response.text})
+                # Cancelar los pagos pendientes en paralelo, con un plazo total
+                payment_ids = [p.get('identifier') for p in payments_data if p.get('identifier')]
+                results = cancel_payments(payment_ids, deadline_at)
                 
                 return jsonify({'status': 'completed', 'results': results})
             else:
                 # API no soporta esta operación, intentar alternativa
-                logger.warning(f'API does not support listing incomplete payments: {response.text}')
+                logger.warning('API does not support listing incomplete payments: %s', response.text)
                 
                 # Como no podemos obtener la lista, intentamos cancelar un pago específico si se proporciona
                 specific_payment_id = request.json.get('specificPaymentId')
                 if specific_payment_id:
-                    cancel_url = f"https://api.minepi.com/v2/payments/{specific_payment_id}/cancel"
-                    cancel_response = requests.post(cancel_url, headers=server_header)
+                    cancel_response = pi_client.post(f'/v2/payments/{specific_payment_id}/cancel',
+                                                     timeout=cancel_timeout(deadline_at))
                     
                     if cancel_response.status_code == 200:
-                        logger.info(f'Successfully cancelled specific payment {specific_payment_id}')
+                        logger.info('Successfully cancelled specific payment %s', specific_payment_id)
                         return jsonify({'status': 'completed', 'message': f'Cancelled payment {specific_payment_id}'})
                     else:
-                        logger.error(f'Failed to cancel specific payment {specific_payment_id}: {cancel_response.text}')
+                        logger.error('Failed to cancel specific payment %s: %s', specific_payment_id, cancel_response.text)
                         return jsonify({'status': 'error', 'message': f'Failed to cancel payment: {cancel_response.text}'})
                 
                 # Si no hay un ID específico, informar que no podemos realizar la operación
                 return jsonify({'status': 'error', 'error': 'Cannot list or cancel pending payments through API', 'pendingPaymentId': specific_payment_id})
                 
         except Exception as api_error:
-            logger.error(f'Error cancelling payments through API: {str(api_error)}')
+            logger.error('Error cancelling payments through API: %s', api_error)
             return jsonify({'status': 'error', 'error': str(api_error)})
     
     except Exception as e:
-        logger.error(f'Error in cancel all pending payments: {str(e)}')
+        logger.error('Error in cancel all pending payments: %s', e)
         return jsonify({'error': f'Error cancelling payments: {str(e)}'}), 500
 
 # Rutas para el sistema de contador de pagos
@@ -394,24 +767,96 @@ def cancel_all_pending_payments():
 def get_payment_counter():
     """Obtener el estado actual del contador de pagos"""
     try:
-        counter_data = get_counter_summary()
-        
-        if not counter_data:
+        def build_response():
+            counter_data = get_counter_summary()
+            
+            if not counter_data:
+                return jsonify({
+                    'error': 'No se pudo obtener el contador de pagos'
+                }), 500
+            
             return jsonify({
-                'error': 'No se pudo obtener el contador de pagos'
-            }), 500
+                'status': 'success',
+                'counter': counter_data
+            })
         
-        return jsonify({
-            'status': 'success',
-            'counter': counter_data
-        })
+        # Si el cliente ya tiene esta versión del contador, responder 304
+        return conditional_response(get_counter_version(), build_response)
     
     except Exception as e:
-        logger.error(f'Error al obtener el contador de pagos: {str(e)}')
+        logger.error('Error al obtener el contador de pagos: %s', e)
         return jsonify({
             'error': f'Error al obtener el contador de pagos: {str(e)}'
         }), 500
 
+@app.route('/api/payment-counter/stats', methods=['GET'])
+def get_payment_counter_stats():
+    """
+    Estadísticas de los pagos, ya calculadas al registrar cada pago
+
+    Devuelve el número, la suma, el mínimo, el máximo y la media de todos los
+    pagos y por hora, día y mes, y los usuarios que más han pagado (top=N).
+    """
+    try:
+        top = request.args.get('top', type=int)
+        if top is not None and top < 0:
+            return jsonify({'error': 'top must be positive'}), 400
+
+        def build_response():
+            stats = get_payment_stats(top)
+            if stats is None:
+                return jsonify({
+                    'error': 'No se pudieron obtener las estadísticas de pagos'
+                }), 500
+            return jsonify({
+                'status': 'success',
+                'stats': stats
+            })
+
+        # Las estadísticas cambian con el contador: misma versión para el ETag
+        return conditional_response(get_counter_version(), build_response)
+
+    except Exception as e:
+        logger.error('Error al obtener las estadísticas de pagos: %s', e)
+        return jsonify({
+            'error': f'Error al obtener las estadísticas de pagos: {str(e)}'
+        }), 500
+
+@app.route('/api/payment-counter/stream', methods=['GET'])
+def stream_payment_counter():
+    """Enviar los cambios del contador de pagos como Server-Sent Events"""
+    if not SSE_ENABLED:
+        return sse_disabled()
+
+    last_event_id = request.headers.get('Last-Event-ID')
+
+    def generate():
+        # Cerrar la conexión periódicamente libera el worker; el navegador se
+        # reconecta solo y reanuda con Last-Event-ID
+        deadline = time.monotonic() + SSE_MAX_DURATION
+        yield 'retry: 3000\n\n'
+        last_sent = None
+        for item in counter_events.subscribe(last_event_id, heartbeat=SSE_HEARTBEAT):
+            if item is None or item[1] == 'resync':
+                # Estado actual: al conectar sin historial o si otro worker cambió el contador
+                summary = get_counter_summary()
+                if summary and summary != last_sent:
+                    last_sent = summary
+                    yield format_sse(summary, event='counter', event_id=counter_events.last_id())
+                else:
+                    yield format_heartbeat()
+            else:
+                event_id, event, data = item
+                last_sent = data
+                yield format_sse(data, event=event, event_id=event_id)
+            if time.monotonic() >= deadline:
+                return
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 # Rutas para el juego Simon Dice
 @app.route('/api/scores', methods=['POST'])
 def save_score():
@@ -423,7 +868,7 @@ def save_score():
         if not username or score is None:
             return jsonify({'error': 'Missing username or score'}), 400
         
-        logger.info(f'Saving score for {username}: {score}')
+        logger.info('Saving score (username=%s): %s', username, score)
         
         # Aquí podrías implementar lógica para guardar puntuaciones en una base de datos
         # Por ahora, solo registramos en el log
@@ -431,58 +876,77 @@ def save_score():
         return jsonify({'status': 'success', 'message': 'Score saved'})
     
     except Exception as e:
-        logger.error(f'Error saving score: {str(e)}')
+        logger.error('Error saving score: %s', e)
         return jsonify({'error': f'Error saving score: {str(e)}'}), 500
 
+def load_transactions(access_token):
+    """
+    Transacciones del usuario, desde la caché si se descargaron hace poco
+
+    Returns:
+        list: Las transacciones, o una lista vacía si la API no las devuelve
+    """
+    def load():
+        try:
+            # Esta URL puede variar según la documentación actual de Pi
+            response = pi_client.get('/v2/transactions', access_token=access_token)
+        except Exception as api_error:
+            logger.error('Error getting transactions from API: %s', api_error)
+            return ([], 0), False
+        if response.status_code != 200:
+            # Si la API no está disponible o devuelve error, no hay transacciones
+            logger.warning('Could not get transactions from API: %s', response.text)
+            return ([], 0), False
+        transactions = response.json()
+        logger.info('Successfully retrieved %d transactions', len(transactions))
+        return (transactions, len(response.content)), True
+
+    transactions, _ = transactions_cache.get_or_load(
+        ('transactions', token_key(access_token)), load, size_of=lambda value: value[1])
+    return transactions
+
 @app.route('/api/transactions', methods=['POST'])
 def get_user_transactions():
+    """
+    Transacciones del usuario, filtradas y paginadas
+
+    Parámetros del cuerpo JSON (todos opcionales salvo accessToken): filterType,
+    since/until (fecha ISO o milisegundos), minAmount/maxAmount, limit y cursor
+    (de la cabecera X-Next-Cursor de la página anterior). La respuesta es un
+    array JSON con las transacciones de la página; sin limit ni cursor no se
+    pagina y contiene todas las que cumplen los filtros.
+    """
     try:
+        body = request.json or {}
         # Obtener el token de acceso
-        access_token = request.json.get('accessToken')
-        filter_type = request.json.get('filterType', None)
+        access_token = body.get('accessToken')
         
         if not access_token:
             logger.error('No access token provided')
             return jsonify({'error': 'No access token provided'}), 400
         
-        # Configurar headers para la petición al usuario
-        user_header = {
-            'Authorization': f'Bearer {access_token}'
-        }
+        try:
+            limit, filters = parse_filters(body, TRANSACTIONS_DEFAULT_LIMIT, TRANSACTIONS_MAX_LIMIT)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid filter: {str(e)}'}), 400
+        
+        # Las páginas siguientes usan la lista en caché, sin volver a la API
+        transactions = load_transactions(access_token)
         
-        # En un entorno sandbox, simulamos las transacciones almacenadas en localStorage
-        # Para producción, se usaría la API real de Pi Network
         try:
-            # Intentar consultar transacciones a la API de Pi Network
-            # Esta URL puede variar según la documentación actual de Pi
-            tx_url = "https://api.minepi.com/v2/transactions"
-            response = requests.get(tx_url, headers=user_header)
-            
-            if response.status_code == 200:
-                transactions = response.json()
-                logger.info(f'Successfully retrieved {len(transactions)} transactions')
-            else:
-                # Si la API no está disponible o devuelve error, usamos simulación
-                logger.warning(f'Could not get transactions from API: {response.text}')
-                # Simulamos transacciones para desarrollo/testing
-                transactions = []
-        except Exception as api_error:
-            logger.error(f'Error getting transactions from API: {str(api_error)}')
-            # Simulamos transacciones para desarrollo/testing
-            transactions = []
-        
-        # Filtrar transacciones por tipo si se especifica
-        if filter_type and transactions:
-            filtered_transactions = []
-            for tx in transactions:
-                if 'metadata' in tx and 'type' in tx['metadata'] and tx['metadata']['type'] == filter_type:
-                    filtered_transactions.append(tx)
-            transactions = filtered_transactions
-        
-        return jsonify(transactions)
+            start = decode_cursor(body['cursor'], transactions) if body.get('cursor') else 0
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        page, next_cursor = paginate(filter_transactions(transactions, start=start, **filters), limit)
+        
+        response = jsonify(page)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
     
     except Exception as e:
-        logger.error(f'Error getting transactions: {str(e)}')
+        logger.error('Error getting transactions: %s', e)
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
 @app.route('/api/scores/record', methods=['POST'])
@@ -498,25 +962,14 @@ def record_score():
             logger.error('Missing required score data')
             return jsonify({'error': 'Missing required score data'}), 400
         
-        logger.info(f'Recording score for {username}: {score} at level {level}')
-        
-        # Abrir o crear un archivo JSON para almacenar puntuaciones
-        scores_file = '/tmp/scores.json'
-        
-        # Crear directorio si no existe
-        os.makedirs(os.path.dirname(scores_file), exist_ok=True)
+        try:
+            finite = not isinstance(score, bool) and math.isfinite(float(score))
+        except (TypeError, ValueError, OverflowError):
+            finite = False
+        if not finite:
+            return jsonify({'error': 'score must be a finite number'}), 400
         
-        # Leer puntuaciones existentes si el archivo existe
-        if os.path.exists(scores_file):
-            with open(scores_file, 'r') as f:
-                try:
-                    scores = json.load(f)
-                except json.JSONDecodeError:
-                    # Si el archivo está corrupto, crear lista vacía
-                    scores = []
-        else:
-            # No hay archivo de puntuaciones, inicializar con lista vacía
-            scores = []
+        logger.info('Recording score (username=%s): %s at level %s', username, score, level)
         
         # Crear objeto de puntuación
         score_obj = {
@@ -528,12 +981,13 @@ def record_score():
             'blockchain': request.json.get('blockchain', False)
         }
         
-        # Añadir a la lista de puntuaciones
-        scores.append(score_obj)
-        
-        # Guardar puntuaciones actualizadas
-        with open(scores_file, 'w') as f:
-            json.dump(scores, f)
+        # Añadir al registro de puntuaciones (solo se escribe la nueva línea)
+        try:
+            score_store.append(score_obj)
+        except ValueError as e:
+            # El almacén binario no admite valores fuera del rango de 64 bits
+            return jsonify({'error': str(e)}), 400
+        leaderboards.update()
         
         return jsonify({
             'status': 'success',
@@ -542,7 +996,7 @@ def record_score():
         })
     
     except Exception as e:
-        logger.error(f'Error recording score: {str(e)}')
+        logger.error('Error recording score: %s', e)
         return jsonify({'error': f'Error recording score: {str(e)}'}), 500
 
 @app.route('/api/scores', methods=['GET'])
@@ -550,35 +1004,151 @@ def get_scores():
     try:
         # Obtener el nombre de usuario desde el query parameter (opcional)
         username_filter = request.args.get('username', None)
+        
+        # Clasificación de un periodo (daily, weekly o all), opcionalmente de un nivel
+        window = request.args.get('window')
+        if window:
+            return get_leaderboard(window)
 
-        # Cambiar la ruta del archivo a /tmp (espacio de escritura permitido en Vercel)
-        scores_file = '/tmp/scores.json'
-
-        # Leer puntuaciones del archivo JSON si existe
-        if os.path.exists(scores_file):
-            with open(scores_file, 'r') as f:
-                try:
-                    scores = json.load(f)
-                except json.JSONDecodeError:
-                    # Si el archivo está corrupto, crear lista vacía
-                    scores = []
-        else:
-            # No hay archivo de puntuaciones, inicializar con lista vacía
-            scores = []
-
-        # Filtrar por nombre de usuario si se proporciona
-        if username_filter:
-            scores = [score for score in scores if score.get('username') == username_filter]
+        def build_response():
+            # Paginación: top=K (las K mejores), o limit/offset, o cursor de la página anterior
+            try:
+                top = request.args.get('top', type=int)
+                limit = top if top is not None else request.args.get('limit', type=int)
+                offset = 0 if top is not None else request.args.get('offset', 0, type=int)
+                cursor = None if top is not None else request.args.get('cursor')
+                if (limit is not None and limit < 0) or offset < 0:
+                    raise ValueError('limit and offset must be positive')
+                # Leer del índice ordenado en memoria (en /tmp, espacio de escritura permitido en Vercel)
+                scores, total, next_cursor = score_store.ranked(
+                    username=username_filter or None,
+                    offset=offset,
+                    limit=limit,
+                    cursor=cursor
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
 
-        # Ordenar por puntuación (de mayor a menor)
-        scores.sort(key=lambda x: x.get('score', 0), reverse=True)
+            response = jsonify(scores)
+            response.headers['X-Total-Count'] = str(total)
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response
 
-        return jsonify(scores)
+        # Si el cliente ya tiene esta versión de las puntuaciones, responder 304
+        return conditional_response(score_store.version(), build_response)
 
     except Exception as e:
-        logger.error(f'Error getting scores: {str(e)}')
+        logger.error('Error getting scores: %s', e)
         return jsonify({'error': f'Error getting scores: {str(e)}'}), 500
 
+def get_leaderboard(window):
+    """Respuesta de /api/scores?window=...: las mejores puntuaciones del periodo, ya calculadas"""
+    if request.args.get('username') or request.args.get('cursor') or request.args.get('offset'):
+        return jsonify({'error': 'window cannot be combined with username, offset or cursor'}), 400
+    level = request.args.get('level', type=int)
+    top = request.args.get('top', type=int)
+    limit = top if top is not None else request.args.get('limit', type=int)
+    if limit is not None and limit < 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+    try:
+        scores, version = leaderboards.top(window, level=level, limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def build_response():
+        response = jsonify(scores)
+        response.headers['X-Total-Count'] = str(len(scores))
+        return response
+
+    return conditional_response(version, build_response)
+
+def load_user_section(kind, path, access_token):
+    """
+    Sección de /api/bootstrap que viene de la API de Pi Network (user o wallet)
+
+    Raises:
+        ValueError: Si falta el token o la API no responde 200
+    """
+    if not access_token:
+        raise ValueError('No access token provided')
+    response = cached_user_lookup(kind, path, access_token)
+    if response.status_code != 200:
+        raise ValueError(f'Failed to get {kind} info: {response.status_code}')
+    return response.json()
+
+def load_wallet_section(access_token):
+    wallet_data = load_user_section('wallet', '/v2/wallet', access_token)
+    # Mismo valor predeterminado que /api/wallet
+    wallet_data.setdefault('balance', '0')
+    return wallet_data
+
+def load_counter_section():
+    counter_data = get_counter_summary()
+    if not counter_data:
+        raise ValueError('No se pudo obtener el contador de pagos')
+    return counter_data
+
+@app.route('/api/bootstrap', methods=['POST'])
+def bootstrap():
+    """
+    Datos iniciales de la página en una sola petición
+
+    Pide a la vez el usuario y la wallet a la API de Pi Network y lee el
+    contador y las puntuaciones, con un plazo total común. Las secciones que
+    fallan o no terminan a tiempo aparecen en 'errors' y el resto se devuelve igual.
+    """
+    try:
+        body = request.json or {}
+        access_token = body.get('accessToken')
+        sections = body.get('sections')
+        username = body.get('username') or None
+
+        if sections is not None and (not isinstance(sections, list)
+                                     or not all(isinstance(name, str) for name in sections)):
+            return jsonify({'error': 'sections must be a list of strings'}), 400
+        sections = sections or list(BOOTSTRAP_SECTIONS)
+        unknown = [name for name in sections if name not in BOOTSTRAP_SECTIONS]
+        if unknown:
+            return jsonify({'error': f'Unknown sections: {", ".join(map(str, unknown))}'}), 400
+        try:
+            scores_limit = max(0, int(body.get('scoresLimit', 50)))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'scoresLimit must be a number'}), 400
+
+        loaders = {
+            'user': lambda: load_user_section('me', '/v2/me', access_token),
+            'wallet': lambda: load_wallet_section(access_token),
+            'counter': load_counter_section,
+            'scores': lambda: score_store.ranked(username=username, limit=scores_limit)[0],
+        }
+        outcomes = fan_out(
+            {name: loaders[name] for name in dict.fromkeys(sections)},
+            max_workers=len(BOOTSTRAP_SECTIONS),
+            deadline=BOOTSTRAP_DEADLINE
+        )
+
+        data, errors = {}, {}
+        for name, (ok, value) in outcomes.items():
+            if ok:
+                data[name] = value
+            else:
+                logger.warning('Bootstrap section %s failed: %s', name, value)
+                errors[name] = str(value)
+
+        return jsonify({
+            'status': 'partial' if errors else 'success',
+            'data': data,
+            'errors': errors
+        })
+
+    except Exception as e:
+        logger.error('Error in bootstrap: %s', e)
+        return jsonify({'error': f'Error in bootstrap: {str(e)}'}), 500
+
+
+# Fin del arranque: registrar el perfil si STARTUP_PROFILE está activo
+startup.finish()
 
 if __name__ == '__main__':
     logger.info('Starting Pi Network Basic App')
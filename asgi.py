@@ -0,0 +1,466 @@
+"""
+Punto de entrada asíncrono (ASGI) de la aplicación
+Las rutas que esperan a la API de Pi Network se sirven con handlers async y un
+cliente HTTP no bloqueante; el resto de rutas (páginas, contador, puntuaciones)
+se delegan en la aplicación Flask de app.py, que sigue siendo la entrada WSGI
+usada en Vercel.
+
+Ejecutar con: uvicorn asgi:application --port 8080
+"""
+
+import os
+import time
+import asyncio
+import logging
+import functools
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse as StarletteJSONResponse
+from starlette.routing import Mount, Route
+
+import app as wsgi
+import metrics
+import json_codec
+from pi_api import AsyncPiApiClient
+from circuit_breaker import CircuitOpenError
+from log_config import PAYLOAD
+from transactions import parse_filters, decode_cursor, filter_transactions, paginate
+
+logger = logging.getLogger(__name__)
+
+
+class JSONResponse(StarletteJSONResponse):
+    """Respuesta JSON codificada con json_codec, igual que las de Flask"""
+
+    def render(self, content):
+        return json_codec.dumps(content)
+
+
+# Bajo uvicorn el proceso es de larga duración: los streams SSE se sirven salvo que
+# SSE_ENABLED los desactive expresamente
+if os.getenv('SSE_ENABLED') is None:
+    wsgi.SSE_ENABLED = True
+
+# Cliente asíncrono con pool de conexiones hacia la API de Pi Network
+pi_client = AsyncPiApiClient(api_key=wsgi.api_key, base_url=wsgi.pi_client.base_url)
+
+# Búsquedas en curso por clave de caché, para coalescer peticiones concurrentes
+_inflight_lookups = {}
+# Completados en curso por payment_id, para serializar los reintentos del cliente:
+# payment_id -> [lock, peticiones que lo usan]; se descarta cuando no queda ninguna
+_payment_locks = {}
+
+
+async def cached_user_lookup(kind, path, access_token):
+    """Versión async de app.cached_user_lookup sobre la misma caché"""
+    key = wsgi.token_key(access_token)
+    entry = wsgi.lookup_cache.get((kind, key))
+    if entry is None:
+        task = _inflight_lookups.get((kind, key))
+        if task is None:
+            task = asyncio.ensure_future(_load_user_lookup(kind, key, path, access_token))
+            _inflight_lookups[(kind, key)] = task
+            task.add_done_callback(lambda _: _inflight_lookups.pop((kind, key), None))
+        # shield: si un cliente se desconecta no se cancela la carga de los demás
+        entry = await asyncio.shield(task)
+    response, user_uid = entry
+    wsgi.tag_user_lookups(key, user_uid)
+    return response
+
+
+async def _load_user_lookup(kind, key, path, access_token):
+    # Si un pago invalida la caché durante la llamada, la respuesta ya no se guarda
+    generation = wsgi.lookup_cache.generation()
+    response = await pi_client.get(path, access_token=access_token)
+    entry = wsgi.lookup_entry(kind, key, response)
+    if response.status_code == 200:
+        wsgi.lookup_cache.set((kind, key), entry, len(response.content), generation=generation)
+    return entry
+
+
+async def get_user_info(request):
+    try:
+        # Obtener el token de acceso del frontend
+        access_token = (await request.json()).get('accessToken')
+        if not access_token:
+            logger.error('No access token provided')
+            return JSONResponse({'error': 'No access token provided'}, status_code=400)
+
+        response = await cached_user_lookup('me', '/v2/me', access_token)
+
+        if response.status_code != 200:
+            logger.error('Failed to get user info: %s', response.text)
+            return JSONResponse({'error': 'Failed to get user info'}, status_code=400)
+
+        return JSONResponse(response.json())
+
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return JSONResponse(e.payload(), status_code=503, headers=e.headers())
+    except Exception as e:
+        logger.error('Error getting user info: %s', e)
+        return JSONResponse({'error': 'Internal server error'}, status_code=500)
+
+
+async def get_wallet_info(request):
+    try:
+        # Obtener el token de acceso del frontend
+        access_token = (await request.json()).get('accessToken')
+        if not access_token:
+            logger.error('No access token provided')
+            return JSONResponse({'error': 'No access token provided'}, status_code=400)
+
+        response = await cached_user_lookup('wallet', '/v2/wallet', access_token)
+
+        if response.status_code != 200:
+            logger.error('Failed to get wallet info: %s', response.text)
+            return JSONResponse({'error': f'Failed to get wallet info: {response.text}'}, status_code=400)
+
+        wallet_data = response.json()
+
+        # Si no hay balance, establecer un valor predeterminado
+        if 'balance' not in wallet_data:
+            wallet_data['balance'] = '0'
+            logger.warning('Balance not found in wallet data, using default value')
+
+        return JSONResponse(wallet_data)
+
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return JSONResponse(e.payload(), status_code=503, headers=e.headers())
+    except Exception as e:
+        logger.error('Error getting wallet info: %s', e)
+        return JSONResponse({'error': f'Internal server error: {str(e)}'}, status_code=500)
+
+
+async def approve_payment(request):
+    try:
+        data = await request.json()
+        payment_id = data.get('paymentId')
+        access_token = data.get('accessToken')
+
+        if not payment_id or not access_token:
+            logger.error('Missing paymentId or accessToken')
+            return JSONResponse({'error': 'Missing paymentId or accessToken'}, status_code=400)
+
+        logger.info('Approving payment: %s', payment_id)
+        response = await pi_client.post(f'/v2/payments/{payment_id}/approve', json={})
+
+        if response.status_code != 200:
+            logger.error('Failed to approve payment: %s', response.text)
+            return JSONResponse({'error': f'Failed to approve payment: {response.text}'}, status_code=400)
+
+        approval_result = response.json()
+        logger.info('Payment approved: %s', payment_id)
+        logger.debug('Approval result: %s', approval_result, extra=PAYLOAD)
+        return JSONResponse(approval_result)
+
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return JSONResponse(e.payload(), status_code=503, headers=e.headers())
+    except Exception as e:
+        logger.error('Error approving payment: %s', e)
+        return JSONResponse({'error': f'Error approving payment: {str(e)}'}, status_code=500)
+
+
+async def finalize_payment(payment_id, txid, access_token=None):
+    """Versión async de app.finalize_payment; la parte local se ejecuta en un hilo"""
+    cached_result = await run_in_threadpool(wsgi.processed_payments.get, payment_id)
+    if cached_result is not None:
+        return cached_result, 200
+
+    payment_response = await pi_client.get(f'/v2/payments/{payment_id}')
+    if payment_response.status_code != 200:
+        logger.error('Failed to get payment details: %s', payment_response.text)
+        return {'error': f'Failed to get payment details: {payment_response.text}',
+                'upstreamStatus': payment_response.status_code}, 400
+
+    payment_details = payment_response.json()
+    payment_amount = float(payment_details.get('amount', 0.0))
+    user_id = payment_details.get('user_uid', '')
+
+    if wsgi.completed_upstream(payment_details):
+        # Igual que app.finalize_payment: un intento anterior ya completó el pago en la API
+        logger.info('Payment %s already completed in Pi Network', payment_id)
+        completion_result = payment_details
+    else:
+        response = await pi_client.post(f'/v2/payments/{payment_id}/complete', json={'txid': txid})
+        if response.status_code != 200:
+            logger.error('Failed to complete payment: %s', response.text)
+            return {'error': f'Failed to complete payment: {response.text}',
+                    'upstreamStatus': response.status_code}, 400
+        completion_result = response.json()
+    logger.info('Payment completed: %s', payment_id)
+    logger.debug('Completion result: %s', completion_result, extra=PAYLOAD)
+    wsgi.invalidate_user_lookups(user_uid=user_id, access_token=access_token)
+
+    return await run_in_threadpool(
+        wsgi.record_completion, payment_id, payment_amount, user_id, completion_result
+    ), 200
+
+
+async def complete_payment(request):
+    try:
+        data = await request.json()
+        # Validación, respuesta guardada y modo asíncrono: lo mismo que app.py
+        prepared = await run_in_threadpool(wsgi.prepare_completion, data)
+        if prepared is not None:
+            result, status_code = prepared
+            return JSONResponse(result, status_code=status_code)
+
+        payment_id, txid = data['paymentId'], data['txid']
+        entry = _payment_locks.setdefault(payment_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                result, status_code = await finalize_payment(payment_id, txid, access_token=data.get('accessToken'))
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _payment_locks[payment_id]
+        return JSONResponse(result, status_code=status_code)
+
+    except CircuitOpenError as e:
+        logger.warning('%s', e)
+        return JSONResponse(e.payload(), status_code=503, headers=e.headers())
+    except Exception as e:
+        logger.error('Error completing payment: %s', e)
+        return JSONResponse({'error': f'Error completing payment: {str(e)}'}, status_code=500)
+
+
+async def check_pending_payments(request):
+    try:
+        access_token = (await request.json()).get('accessToken')
+
+        if not access_token:
+            logger.error('Missing accessToken')
+            return JSONResponse({'error': 'Missing accessToken'}, status_code=400)
+
+        try:
+            response = await pi_client.get('/v2/payments/incomplete', access_token=access_token)
+
+            if response.status_code == 200:
+                payments_data = response.json()
+                logger.debug('Pending payments: %s', payments_data, extra=PAYLOAD)
+                return JSONResponse({'pendingPayments': payments_data})
+            logger.warning('Could not get pending payments from API: %s', response.text)
+            return JSONResponse({'pendingPayments': []})
+
+        except Exception as api_error:
+            logger.error('Error checking pending payments from API: %s', api_error)
+            return JSONResponse({'pendingPayments': [], 'error': str(api_error)})
+
+    except Exception as e:
+        logger.error('Error checking pending payments: %s', e)
+        return JSONResponse({'error': f'Error checking pending payments: {str(e)}'}, status_code=500)
+
+
+async def cancel_payments(payment_ids, deadline_at=None):
+    """Versión async de app.cancel_payments: mismo límite de paralelismo y plazo total"""
+    loop = asyncio.get_running_loop()
+    if deadline_at is None:
+        deadline_at = loop.time() + wsgi.CANCEL_DEADLINE
+    semaphore = asyncio.Semaphore(wsgi.CANCEL_MAX_PARALLEL)
+    sent = set()  # pagos cuya llamada ya empezó: al cancelarla su resultado es desconocido
+
+    async def cancel(payment_id):
+        async with semaphore:
+            sent.add(payment_id)
+            return await pi_client.post(f'/v2/payments/{payment_id}/cancel')
+
+    tasks = {payment_id: asyncio.ensure_future(cancel(payment_id)) for payment_id in dict.fromkeys(payment_ids)}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=max(0.0, deadline_at - loop.time()))
+
+    results = []
+    for payment_id in payment_ids:
+        task = tasks[payment_id]
+        if not task.done():
+            task.cancel()
+            if payment_id in sent:
+                logger.warning('Cancellation of payment %s still in progress at the deadline', payment_id)
+                results.append({'id': payment_id, 'status': 'unknown',
+                                'message': 'Cancellation still in progress when the deadline expired'})
+                continue
+            message = f'Deadline of {wsgi.CANCEL_DEADLINE}s exceeded'
+        elif task.exception() is not None:
+            message = str(task.exception())
+        elif task.result().status_code == 200:
+            logger.info('Successfully cancelled payment %s', payment_id)
+            results.append({'id': payment_id, 'status': 'cancelled'})
+            continue
+        else:
+            message = task.result().text
+        logger.error('Failed to cancel payment %s: %s', payment_id, message)
+        results.append({'id': payment_id, 'status': 'error', 'message': message})
+    return results
+
+
+async def cancel_all_pending_payments(request):
+    try:
+        data = await request.json()
+        access_token = data.get('accessToken')
+
+        if not access_token:
+            logger.error('Missing accessToken')
+            return JSONResponse({'error': 'Missing accessToken'}, status_code=400)
+
+        # CANCEL_DEADLINE cubre toda la petición, también la consulta de los pagos pendientes
+        deadline_at = asyncio.get_running_loop().time() + wsgi.CANCEL_DEADLINE
+
+        try:
+            response = await asyncio.wait_for(pi_client.get('/v2/payments/incomplete', access_token=access_token),
+                                              timeout=wsgi.CANCEL_DEADLINE)
+
+            if response.status_code == 200:
+                payment_ids = [p.get('identifier') for p in response.json() if p.get('identifier')]
+                results = await cancel_payments(payment_ids, deadline_at)
+                return JSONResponse({'status': 'completed', 'results': results})
+
+            logger.warning('API does not support listing incomplete payments: %s', response.text)
+            specific_payment_id = data.get('specificPaymentId')
+            if specific_payment_id:
+                remaining = max(0.0, deadline_at - asyncio.get_running_loop().time())
+                cancel_response = await asyncio.wait_for(
+                    pi_client.post(f'/v2/payments/{specific_payment_id}/cancel'), timeout=remaining)
+                if cancel_response.status_code == 200:
+                    logger.info('Successfully cancelled specific payment %s', specific_payment_id)
+                    return JSONResponse({'status': 'completed', 'message': f'Cancelled payment {specific_payment_id}'})
+                logger.error('Failed to cancel specific payment %s: %s', specific_payment_id, cancel_response.text)
+                return JSONResponse({'status': 'error', 'message': f'Failed to cancel payment: {cancel_response.text}'})
+
+            return JSONResponse({'status': 'error', 'error': 'Cannot list or cancel pending payments through API', 'pendingPaymentId': specific_payment_id})
+
+        except asyncio.TimeoutError:
+            message = f'Deadline of {wsgi.CANCEL_DEADLINE}s exceeded'
+            logger.error('Error cancelling payments through API: %s', message)
+            return JSONResponse({'status': 'error', 'error': message})
+        except Exception as api_error:
+            logger.error('Error cancelling payments through API: %s', api_error)
+            return JSONResponse({'status': 'error', 'error': str(api_error)})
+
+    except Exception as e:
+        logger.error('Error in cancel all pending payments: %s', e)
+        return JSONResponse({'error': f'Error cancelling payments: {str(e)}'}, status_code=500)
+
+
+async def load_transactions(access_token):
+    """Versión async de app.load_transactions sobre la misma caché"""
+    key = ('transactions', wsgi.token_key(access_token))
+    cached = wsgi.transactions_cache.get(key)
+    if cached is not None:
+        return cached[0]
+    generation = wsgi.transactions_cache.generation()
+    try:
+        response = await pi_client.get('/v2/transactions', access_token=access_token)
+    except Exception as api_error:
+        logger.error('Error getting transactions from API: %s', api_error)
+        return []
+    if response.status_code != 200:
+        logger.warning('Could not get transactions from API: %s', response.text)
+        return []
+    transactions = response.json()
+    wsgi.transactions_cache.set(key, (transactions, len(response.content)), len(response.content),
+                                generation=generation)
+    return transactions
+
+
+async def get_user_transactions(request):
+    try:
+        data = await request.json()
+        access_token = data.get('accessToken')
+
+        if not access_token:
+            logger.error('No access token provided')
+            return JSONResponse({'error': 'No access token provided'}, status_code=400)
+
+        try:
+            limit, filters = parse_filters(data, wsgi.TRANSACTIONS_DEFAULT_LIMIT, wsgi.TRANSACTIONS_MAX_LIMIT)
+        except ValueError as e:
+            return JSONResponse({'error': f'Invalid filter: {str(e)}'}, status_code=400)
+
+        transactions = await load_transactions(access_token)
+
+        try:
+            start = decode_cursor(data['cursor'], transactions) if data.get('cursor') else 0
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        page, next_cursor = paginate(filter_transactions(transactions, start=start, **filters), limit)
+        headers = {'X-Next-Cursor': next_cursor} if next_cursor else None
+        return JSONResponse(page, headers=headers)
+
+    except Exception as e:
+        logger.error('Error getting transactions: %s', e)
+        return JSONResponse({'error': f'Internal server error: {str(e)}'}, status_code=500)
+
+
+def instrumented(path, endpoint):
+    """Mide una ruta async igual que metrics.init_app mide las rutas de Flask"""
+    @functools.wraps(endpoint)
+    async def wrapper(request):
+        start = time.perf_counter()
+        status = 500
+        metrics.http_in_flight.inc()
+        try:
+            response = await endpoint(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.http_in_flight.dec()
+            metrics.observe_request(request.method, path, status, time.perf_counter() - start)
+    return wrapper
+
+
+def json_body(endpoint):
+    """Responde 400 si el cuerpo no es un objeto JSON, igual que app.reject_invalid_json"""
+    @functools.wraps(endpoint)
+    async def wrapper(request):
+        try:
+            data = json_codec.loads(await request.body())
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            logger.warning('Invalid JSON body for %s', request.url.path)
+            return JSONResponse({'error': 'Invalid JSON body'}, status_code=400)
+        # request.json() devuelve el cuerpo ya decodificado
+        request._json = data
+        return await endpoint(request)
+    return wrapper
+
+
+def post_route(path, endpoint):
+    return Route(path, instrumented(path, json_body(endpoint)), methods=['POST'])
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    yield
+    await pi_client.aclose()
+
+
+application = Starlette(
+    routes=[
+        post_route('/api/me', get_user_info),
+        post_route('/api/wallet', get_wallet_info),
+        post_route('/payment/approve', approve_payment),
+        post_route('/payment/complete', complete_payment),
+        post_route('/payment/check-pending', check_pending_payments),
+        post_route('/payment/cancel-all-pending', cancel_all_pending_payments),
+        post_route('/api/transactions', get_user_transactions),
+        # El resto de rutas las sirve la aplicación Flask
+        Mount('/', app=WSGIMiddleware(wsgi.app)),
+    ],
+    middleware=[
+        # Mismas cabeceras CORS que añade app.after_request
+        Middleware(CORSMiddleware, allow_origins=['*'],
+                   allow_methods=['GET', 'PUT', 'POST', 'DELETE', 'OPTIONS'],
+                   allow_headers=['Content-Type', 'Authorization'])
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,216 @@
+"""
+Pipeline de archivos estáticos
+Cada archivo de static/ recibe un nombre con el hash de su contenido
+(js/simon.3f2a9c1b0d4e.js) y variantes precomprimidas gzip y brotli (si el
+paquete brotli está instalado). Las plantillas usan asset_url() para enlazarlos
+y se sirven desde /assets/ con caché inmutable de un año y negociación de
+Accept-Encoding.
+
+El pipeline se construye en memoria la primera vez que se usa. También se puede
+generar en disco durante el despliegue (python assets.py) para no comprimir en
+el arranque; si existe static/dist/manifest.json se usa directamente.
+"""
+
+import os
+import sys
+import gzip
+import hashlib
+import logging
+import mimetypes
+import threading
+
+from flask import abort, request, Response
+
+import json_codec
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ASSETS_URL_PREFIX = '/assets'
+BUILD_DIR_NAME = 'dist'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Tipos que vale la pena comprimir (el resto ya está comprimido, como mp3 o ico, o apenas
+# se reduce con gzip, como el audio PCM de los wav)
+COMPRESSIBLE_EXTENSIONS = {'.js', '.css', '.html', '.json', '.svg', '.txt'}
+
+
+class AssetPipeline:
+    """
+    Manifiesto de archivos estáticos con nombre versionado
+
+    Args:
+        static_folder (str): Carpeta static/ de la aplicación
+        build_dir (str, opcional): Carpeta con una compilación previa en disco
+    """
+
+    def __init__(self, static_folder, build_dir=None):
+        self.static_folder = static_folder
+        self.build_dir = build_dir or os.path.join(static_folder, BUILD_DIR_NAME)
+        self._manifest = None  # ruta lógica -> ruta versionada
+        self._files = None  # ruta versionada -> {'source', 'etag', 'encodings': {codificación: bytes o ruta}}
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._manifest is not None:
+            return
+        with self._lock:
+            if self._manifest is not None:
+                return
+            manifest_path = os.path.join(self.build_dir, 'manifest.json')
+            if os.path.exists(manifest_path):
+                self._load_build(manifest_path)
+            else:
+                self._build_in_memory()
+
+    def _sources(self):
+        for root, dirs, files in os.walk(self.static_folder):
+            # No volver a procesar la salida de una compilación
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != self.build_dir]
+            for name in files:
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, self.static_folder).replace(os.sep, '/'), path
+
+    def _build_in_memory(self):
+        manifest, files = {}, {}
+        for logical, path in self._sources():
+            with open(path, 'rb') as f:
+                content = f.read()
+            digest, fingerprinted = _fingerprint(logical, content)
+            encodings = {'identity': content}
+            encodings.update(_compress(logical, content, level=6))
+            manifest[logical] = fingerprinted
+            files[fingerprinted] = {'source': logical, 'etag': digest, 'encodings': encodings}
+        self._manifest, self._files = manifest, files
+        logger.info('Built %d static assets in memory', len(manifest))
+
+    def _load_build(self, manifest_path):
+        build = json_codec.load_file(manifest_path)
+        files = {}
+        for fingerprinted, entry in build['files'].items():
+            encodings = {
+                encoding: os.path.join(self.build_dir, filename)
+                for encoding, filename in entry['encodings'].items()
+            }
+            files[fingerprinted] = {'source': entry['source'], 'etag': entry['etag'], 'encodings': encodings}
+        self._manifest, self._files = build['manifest'], files
+        logger.info('Loaded %d static assets from %s', len(self._manifest), manifest_path)
+
+    def build(self):
+        """Genera los archivos versionados y comprimidos en build_dir (paso de despliegue)"""
+        manifest, files = {}, {}
+        for logical, path in self._sources():
+            with open(path, 'rb') as f:
+                content = f.read()
+            digest, fingerprinted = _fingerprint(logical, content)
+            variants = {'identity': content}
+            variants.update(_compress(logical, content, level=9))
+            encodings = {}
+            for encoding, data in variants.items():
+                filename = fingerprinted + {'identity': '', 'gzip': '.gz', 'br': '.br'}[encoding]
+                target = os.path.join(self.build_dir, filename)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as f:
+                    f.write(data)
+                encodings[encoding] = filename
+            manifest[logical] = fingerprinted
+            files[fingerprinted] = {'source': logical, 'etag': digest, 'encodings': encodings}
+        with open(os.path.join(self.build_dir, 'manifest.json'), 'wb') as f:
+            f.write(json_codec.dumps({'manifest': manifest, 'files': files}, sort_keys=True, pretty=True))
+        return manifest
+
+    def url(self, logical):
+        """URL versionada de un archivo de static/ (o la URL normal si no existe)"""
+        self._ensure_loaded()
+        fingerprinted = self._manifest.get(logical)
+        if fingerprinted is None:
+            return f'/static/{logical}'
+        return f'{ASSETS_URL_PREFIX}/{fingerprinted}'
+
+    def response(self, fingerprinted):
+        """Respuesta para /assets/<archivo versionado> según Accept-Encoding"""
+        self._ensure_loaded()
+        entry = self._files.get(fingerprinted)
+        if entry is None:
+            abort(404)
+
+        headers = {
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL,
+            'Vary': 'Accept-Encoding',
+        }
+        mimetype = mimetypes.guess_type(entry['source'])[0] or 'application/octet-stream'
+        # Cada codificación tiene su propio ETag, como en page_cache
+        etags = {encoding: entry['etag'] if encoding == 'identity' else f"{entry['etag']}-{encoding}"
+                 for encoding in entry['encodings']}
+        encoding = negotiate_encoding(request.accept_encodings, entry['encodings'])
+
+        # El contenido de una URL versionada nunca cambia: basta con que el cliente tenga uno de sus ETags
+        if any(request.if_none_match.contains(etag) for etag in etags.values()):
+            response = Response(status=304, headers=headers)
+            response.set_etag(etags[encoding])
+            return response
+
+        data = entry['encodings'][encoding]
+        if isinstance(data, str):
+            with open(data, 'rb') as f:
+                data = f.read()
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        response = Response(data, mimetype=mimetype, headers=headers)
+        response.set_etag(etags[encoding])
+        return response
+
+
+def _fingerprint(logical, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    base, ext = os.path.splitext(logical)
+    return digest, f'{base}.{digest}{ext}'
+
+
+def _compress(logical, content, level):
+    if os.path.splitext(logical)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return {}
+    return compress_variants(content, level)
+
+
+def compress_variants(content, level=6):
+    """
+    Variantes gzip y brotli de un contenido, solo las que reducen el tamaño
+
+    Args:
+        content (bytes): Contenido original
+        level (int): Nivel de compresión gzip (1-9); brotli usa uno equivalente
+
+    Returns:
+        dict: Codificación ('gzip', 'br') -> bytes comprimidos
+    """
+    variants = {'gzip': gzip.compress(content, compresslevel=level, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(content, quality=min(11, level + 2))
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(content)}
+
+
+def negotiate_encoding(accept_encodings, available):
+    """Elige br, luego gzip, luego el archivo sin comprimir"""
+    for encoding in ('br', 'gzip'):
+        if encoding in available and accept_encodings[encoding]:
+            return encoding
+    return 'identity'
+
+
+def init_app(app):
+    """Registra la ruta /assets/ y la función asset_url() en las plantillas"""
+    pipeline = AssetPipeline(app.static_folder)
+    app.add_url_rule(f'{ASSETS_URL_PREFIX}/<path:fingerprinted>', 'assets', pipeline.response)
+    app.jinja_env.globals['asset_url'] = pipeline.url
+    return pipeline
+
+
+if __name__ == '__main__':
+    # Paso de despliegue: python assets.py [carpeta static]
+    static_folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    built = AssetPipeline(static_folder).build()
+    print(f'Built {len(built)} assets into {os.path.join(static_folder, BUILD_DIR_NAME)}')
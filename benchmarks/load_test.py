@@ -0,0 +1,335 @@
+"""
+Prueba de carga de extremo a extremo
+Arranca el servidor simulado de la API de Pi (mock_pi_api.py) y la aplicación
+apuntando a él, recorre todas las rutas (incluido el flujo completo
+approve → complete → contador) con N peticiones concurrentes por ruta y muestra
+req/s y los percentiles p50/p95/p99 de cada una.
+
+Uso:
+    python benchmarks/load_test.py --requests 500 --concurrency 16
+    python benchmarks/load_test.py --save baseline.json
+    python benchmarks/load_test.py --baseline baseline.json   # compara con una ejecución anterior
+    python benchmarks/load_test.py --target http://127.0.0.1:8080   # servidor ya arrancado
+
+Las rutas que escriben (puntuaciones, contador, pagos procesados) usan el
+almacenamiento configurado de la aplicación, normalmente en /tmp.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_SCRIPT = os.path.join(ROOT_DIR, 'benchmarks', 'mock_pi_api.py')
+# Flujo completo de un pago; cada paso se mide también por separado (flow: <ruta>)
+FLOW_NAME = 'flow'
+
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class RouteStats:
+    """Latencias y códigos de estado de una ruta"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency, status):
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status is None or status >= 400:
+                self.errors += 1
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'rps': count / self.elapsed if self.elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'statuses': {str(k): v for k, v in sorted(self.statuses.items(), key=lambda kv: str(kv[0]))},
+        }
+
+
+class LoadTest:
+    """
+    Ejecuta los escenarios contra una aplicación en marcha
+
+    Args:
+        target (str): URL base de la aplicación
+        requests_per_route (int): Peticiones por escenario
+        concurrency (int): Peticiones simultáneas
+        users (int): Número de tokens de acceso distintos (afecta a las cachés por usuario)
+    """
+
+    def __init__(self, target, requests_per_route=200, concurrency=16, users=50):
+        self.target = target.rstrip('/')
+        self.requests_per_route = requests_per_route
+        self.concurrency = concurrency
+        self.users = users
+        self.run_id = uuid.uuid4().hex[:8]
+        self.stats = {}
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # Una sesión keep-alive por hilo del generador de carga
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def token(self, i):
+        return f'bench-token-{i % self.users}'
+
+    def call(self, name, method, path, **kwargs):
+        """Hace una petición y registra su latencia bajo el nombre de la ruta"""
+        stats = self.stats.setdefault(name, RouteStats(name))
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.target}{path}', timeout=60, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, None
+        stats.record(time.perf_counter() - start, status)
+        return response
+
+    def scenarios(self):
+        """Escenarios como (nombre, función(i)); cada uno se ejecuta requests_per_route veces"""
+        asset_path = self._first_asset()
+
+        def payment_id(kind, i):
+            return f'bench-{self.run_id}-{kind}-{i}'
+
+        def flow(i):
+            pid = payment_id('flow', i)
+            start = time.perf_counter()
+            ok = True
+            for method, path, body in (
+                ('POST', '/payment/approve', {'paymentId': pid, 'accessToken': self.token(i)}),
+                ('POST', '/payment/complete', {'paymentId': pid, 'txid': f'tx-{pid}', 'accessToken': self.token(i)}),
+                ('GET', '/api/payment-counter', None),
+            ):
+                response = self.call(f'{FLOW_NAME}: {method} {path}', method, path, json=body)
+                ok = ok and response is not None and response.status_code == 200
+            total = f'{FLOW_NAME}: total'
+            self.stats.setdefault(total, RouteStats(total)).record(time.perf_counter() - start, 200 if ok else 599)
+
+        scenarios = [
+            ('GET /', lambda i: self.call('GET /', 'GET', '/', headers={'Accept-Encoding': 'gzip'})),
+            ('GET /simon', lambda i: self.call('GET /simon', 'GET', '/simon', headers={'Accept-Encoding': 'gzip'})),
+            ('POST /api/me', lambda i: self.call('POST /api/me', 'POST', '/api/me',
+                                                  json={'accessToken': self.token(i)})),
+            ('POST /api/wallet', lambda i: self.call('POST /api/wallet', 'POST', '/api/wallet',
+                                                      json={'accessToken': self.token(i)})),
+            ('POST /api/bootstrap', lambda i: self.call(
+                'POST /api/bootstrap', 'POST', '/api/bootstrap',
+                json={'accessToken': self.token(i), 'username': f'bench{i % self.users}'})),
+            ('POST /payment/approve', lambda i: self.call('POST /payment/approve', 'POST', '/payment/approve',
+                                                           json={'paymentId': payment_id('approve', i),
+                                                                 'accessToken': self.token(i)})),
+            ('POST /payment/complete', lambda i: self.call(
+                'POST /payment/complete', 'POST', '/payment/complete',
+                json={'paymentId': payment_id('complete', i), 'txid': f'tx-{i}', 'accessToken': self.token(i)})),
+            ('POST /payment/error', lambda i: self.call('POST /payment/error', 'POST', '/payment/error',
+                                                         json={'paymentId': payment_id('error', i)})),
+            ('POST /payment/check-pending', lambda i: self.call(
+                'POST /payment/check-pending', 'POST', '/payment/check-pending', json={'accessToken': self.token(i)})),
+            ('POST /payment/cancel-all-pending', lambda i: self.call(
+                'POST /payment/cancel-all-pending', 'POST', '/payment/cancel-all-pending',
+                json={'accessToken': self.token(i)})),
+            ('GET /api/payment-counter', lambda i: self.call('GET /api/payment-counter', 'GET',
+                                                              '/api/payment-counter')),
+            ('POST /api/scores', lambda i: self.call('POST /api/scores', 'POST', '/api/scores',
+                                                      json={'username': f'bench{i % self.users}', 'score': i})),
+            ('POST /api/scores/record', lambda i: self.call(
+                'POST /api/scores/record', 'POST', '/api/scores/record',
+                json={'username': f'bench{i % self.users}', 'score': i % 500, 'level': 1 + i % 20})),
+            ('GET /api/scores', lambda i: self.call('GET /api/scores', 'GET', '/api/scores?top=50')),
+            ('POST /api/transactions', lambda i: self.call(
+                'POST /api/transactions', 'POST', '/api/transactions',
+                json={'accessToken': self.token(i), 'filterType': 'game_payment'})),
+            (FLOW_NAME, flow),
+        ]
+        if asset_path:
+            scenarios.insert(2, ('GET /assets/*', lambda i: self.call(
+                'GET /assets/*', 'GET', asset_path, headers={'Accept-Encoding': 'gzip'})))
+        return scenarios
+
+    def _first_asset(self):
+        try:
+            html = requests.get(f'{self.target}/simon', timeout=30).text
+        except requests.RequestException:
+            return None
+        match = re.search(r'/assets/[^"\']+\.js', html)
+        return match.group(0) if match else None
+
+    def run(self, only=None):
+        """
+        Ejecuta los escenarios uno detrás de otro
+
+        Args:
+            only (list, opcional): Subcadenas; solo se ejecutan los escenarios que contengan alguna
+
+        Returns:
+            dict: Nombre de la ruta -> resumen (req/s, percentiles, errores)
+        """
+        for name, scenario in self.scenarios():
+            if only and not any(part in name for part in only):
+                continue
+            print(f'  {name} ...', end='', flush=True)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                list(executor.map(scenario, range(self.requests_per_route)))
+            elapsed = time.perf_counter() - start
+            for stats in self.stats.values():
+                if stats.name == name or stats.name.startswith(f'{name}:'):
+                    stats.elapsed += elapsed
+            print(f' {elapsed:.2f}s', flush=True)
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+
+def format_report(results, baseline=None):
+    """Tabla con req/s y percentiles por ruta (y la diferencia con una ejecución anterior)"""
+    header = f"{'route':<40} {'reqs':>6} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    lines = [header, '-' * len(header)]
+    for name, row in results.items():
+        line = (f"{name:<40} {row['requests']:>6} {row['errors']:>5} {row['rps']:>9.1f} "
+                f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}")
+        previous = (baseline or {}).get(name)
+        if previous and previous['p95_ms']:
+            rps_delta = (row['rps'] / previous['rps'] - 1) * 100 if previous['rps'] else 0.0
+            p95_delta = (row['p95_ms'] / previous['p95_ms'] - 1) * 100
+            line += f"   req/s {rps_delta:+.0f}%  p95 {p95_delta:+.0f}%"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Process exited while starting ({url})')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f'Timed out waiting for {url}')
+
+
+def start_servers(args):
+    """Arranca el servidor simulado y la aplicación; devuelve (url, procesos)"""
+    mock_port, app_port = _free_port(), _free_port()
+    mock_cmd = [
+        sys.executable, MOCK_SCRIPT, '--port', str(mock_port),
+        '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+        '--error-rate', str(args.error_rate), '--payload-bytes', str(args.payload_bytes),
+        '--transactions', str(args.transactions), '--incomplete', str(args.incomplete),
+        '--seed', '42',
+    ]
+    env = dict(os.environ, PI_API_BASE_URL=f'http://127.0.0.1:{mock_port}',
+               PI_API_KEY=os.getenv('PI_API_KEY', 'bench-key'))
+    if args.server == 'asgi':
+        app_cmd = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', str(app_port),
+                   '--log-level', 'warning']
+    else:
+        app_cmd = [sys.executable, '-c',
+                   f"import logging, app; logging.disable(logging.INFO); "
+                   f"app.app.run(port={app_port}, threaded=True)"]
+
+    output = None if args.verbose else subprocess.DEVNULL
+    processes = [subprocess.Popen(mock_cmd, cwd=ROOT_DIR, stdout=output, stderr=output)]
+    _wait_until_up(f'http://127.0.0.1:{mock_port}/v2/payments/ping', processes[0])
+    processes.append(subprocess.Popen(app_cmd, cwd=ROOT_DIR, env=env, stdout=output, stderr=output))
+    target = f'http://127.0.0.1:{app_port}'
+    _wait_until_up(f'{target}/api/payment-counter', processes[1])
+    return target, processes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Prueba de carga de todas las rutas de la aplicación')
+    parser.add_argument('--target', help='URL de una aplicación ya arrancada (si no, se arrancan app y mock)')
+    parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi',
+                        help='Servidor a arrancar: app.py (wsgi) o asgi.py con uvicorn')
+    parser.add_argument('--requests', type=int, default=200, help='Peticiones por ruta')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--users', type=int, default=50, help='Tokens de acceso distintos')
+    parser.add_argument('--only', nargs='*', help='Ejecutar solo las rutas que contengan estas cadenas')
+    parser.add_argument('--save', help='Guardar los resultados en un JSON')
+    parser.add_argument('--baseline', help='JSON de una ejecución anterior con el que comparar')
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--payload-bytes', type=int, default=0)
+    parser.add_argument('--transactions', type=int, default=100)
+    parser.add_argument('--incomplete', type=int, default=5)
+    parser.add_argument('--verbose', action='store_true', help='Mostrar la salida del mock y de la aplicación')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    processes = []
+    try:
+        if args.target:
+            target = args.target
+        else:
+            target, processes = start_servers(args)
+        print(f'Load test against {target}: {args.requests} requests/route, concurrency {args.concurrency}')
+        results = LoadTest(target, args.requests, args.concurrency, args.users).run(only=args.only)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['results']
+    print()
+    print(format_report(results, baseline))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'timestamp': int(time.time()),
+                'config': {k: v for k, v in vars(args).items() if k not in ('save', 'baseline')},
+                'results': results,
+            }, f, indent=2)
+        print(f'\nResults saved to {args.save}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Servidor local que imita la API de Pi Network
+Implementa los endpoints que usa la aplicación (/v2/me, /v2/wallet, pagos y
+transacciones) con latencia, tasa de errores y tamaño de respuesta
+configurables, para medir la aplicación sin llamar a api.minepi.com.
+
+Uso:
+    python benchmarks/mock_pi_api.py --port 9090 --latency-ms 80 --error-rate 0.01
+    PI_API_BASE_URL=http://127.0.0.1:9090 python app.py
+"""
+
+import os
+import time
+import zlib
+import random
+import argparse
+import logging
+
+from flask import Flask, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TYPES = ['game_payment', 'score', 'donation', 'transfer']
+
+
+class MockConfig:
+    """
+    Comportamiento del servidor simulado
+
+    Args:
+        latency_ms (float): Latencia media de cada respuesta
+        jitter_ms (float): Variación máxima (+/-) sobre la latencia media
+        error_rate (float): Fracción de peticiones que fallan (0-1)
+        error_status (int): Código HTTP de las respuestas con error
+        payload_bytes (int): Relleno añadido a cada pago o transacción
+        transactions (int): Número de transacciones de /v2/transactions
+        incomplete (int): Número de pagos de /v2/payments/incomplete
+        seed (int, opcional): Semilla para repetir la misma secuencia de errores
+    """
+
+    def __init__(self, latency_ms=50.0, jitter_ms=10.0, error_rate=0.0, error_status=500,
+                 payload_bytes=0, transactions=100, incomplete=0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.payload_bytes = payload_bytes
+        self.transactions = transactions
+        self.incomplete = incomplete
+        self.random = random.Random(seed)
+
+    def delay(self):
+        latency = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def should_fail(self):
+        return self.error_rate > 0 and self.random.random() < self.error_rate
+
+
+def _user_uid(access_token):
+    """UID estable por token, para que cada usuario simulado sea distinto"""
+    return f'mock-user-{zlib.crc32(access_token.encode("utf-8")) % 100000:05d}'
+
+
+def create_app(config):
+    """
+    Crea la aplicación Flask del servidor simulado
+
+    Args:
+        config (MockConfig): Latencia, errores y tamaño de las respuestas
+
+    Returns:
+        Flask: Aplicación lista para ejecutar
+    """
+    app = Flask(__name__)
+    padding = 'x' * config.payload_bytes
+
+    def access_token():
+        header = request.headers.get('Authorization', '')
+        return header[len('Bearer '):] if header.startswith('Bearer ') else None
+
+    def payment(payment_id, user_uid='mock-user-00000', **status):
+        data = {
+            'identifier': payment_id,
+            'user_uid': user_uid,
+            'amount': 0.2,
+            'memo': 'Simon game payment',
+            'metadata': {'type': 'game_payment', 'padding': padding},
+            'created_at': '2024-01-01T00:00:00.000Z',
+            'status': {
+                'developer_approved': False,
+                'transaction_verified': False,
+                'developer_completed': False,
+                'cancelled': False,
+                'user_cancelled': False,
+            },
+        }
+        data['status'].update(status)
+        return data
+
+    @app.before_request
+    def simulate_network():
+        config.delay()
+        if config.should_fail():
+            return jsonify({'error': 'mock_error', 'message': 'Simulated upstream failure'}), config.error_status
+
+    @app.route('/v2/me')
+    @app.route('/v1/me')
+    def me():
+        token = access_token()
+        if not token:
+            return jsonify({'error': 'unauthorized'}), 401
+        uid = _user_uid(token)
+        return jsonify({'uid': uid, 'username': uid.replace('mock-user-', 'pioneer')})
+
+    @app.route('/v2/wallet')
+    def wallet():
+        token = access_token()
+        if not token:
+            return jsonify({'error': 'unauthorized'}), 401
+        return jsonify({'uid': _user_uid(token), 'balance': '314.159'})
+
+    @app.route('/v2/payments/incomplete')
+    def incomplete_payments():
+        return jsonify([payment(f'mock-incomplete-{i}', developer_approved=True) for i in range(config.incomplete)])
+
+    @app.route('/v2/payments/<payment_id>')
+    def payment_details(payment_id):
+        return jsonify(payment(payment_id, developer_approved=True))
+
+    @app.route('/v2/payments/<payment_id>/approve', methods=['POST'])
+    def approve(payment_id):
+        return jsonify(payment(payment_id, developer_approved=True))
+
+    @app.route('/v2/payments/<payment_id>/complete', methods=['POST'])
+    def complete(payment_id):
+        txid = (request.get_json(silent=True) or {}).get('txid')
+        data = payment(payment_id, developer_approved=True, transaction_verified=True, developer_completed=True)
+        data['transaction'] = {'txid': txid, 'verified': True}
+        return jsonify(data)
+
+    @app.route('/v2/payments/<payment_id>/cancel', methods=['POST'])
+    def cancel(payment_id):
+        return jsonify(payment(payment_id, cancelled=True))
+
+    @app.route('/v2/transactions')
+    def transactions():
+        uid = _user_uid(access_token() or '')
+        return jsonify([
+            {
+                'identifier': f'mock-tx-{i}',
+                'user_uid': uid,
+                'amount': round(0.1 + (i % 10) * 0.1, 2),
+                'created_at': f'2024-01-{1 + i % 28:02d}T12:00:00.000Z',
+                'metadata': {'type': TRANSACTION_TYPES[i % len(TRANSACTION_TYPES)], 'padding': padding},
+            }
+            for i in range(config.transactions)
+        ])
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Servidor local que imita la API de Pi Network')
+    parser.add_argument('--host', default=os.getenv('MOCK_PI_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('MOCK_PI_PORT', 9090)))
+    parser.add_argument('--latency-ms', type=float, default=float(os.getenv('MOCK_PI_LATENCY_MS', 50)))
+    parser.add_argument('--jitter-ms', type=float, default=float(os.getenv('MOCK_PI_JITTER_MS', 10)))
+    parser.add_argument('--error-rate', type=float, default=float(os.getenv('MOCK_PI_ERROR_RATE', 0)))
+    parser.add_argument('--error-status', type=int, default=int(os.getenv('MOCK_PI_ERROR_STATUS', 500)))
+    parser.add_argument('--payload-bytes', type=int, default=int(os.getenv('MOCK_PI_PAYLOAD_BYTES', 0)))
+    parser.add_argument('--transactions', type=int, default=int(os.getenv('MOCK_PI_TRANSACTIONS', 100)))
+    parser.add_argument('--incomplete', type=int, default=int(os.getenv('MOCK_PI_INCOMPLETE', 0)))
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    mock_config = MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        payload_bytes=args.payload_bytes,
+        transactions=args.transactions,
+        incomplete=args.incomplete,
+        seed=args.seed,
+    )
+    print(f'Mock Pi API on http://{args.host}:{args.port} '
+          f'(latency {args.latency_ms}±{args.jitter_ms} ms, error rate {args.error_rate})', flush=True)
+    create_app(mock_config).run(host=args.host, port=args.port, threaded=True)
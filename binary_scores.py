@@ -0,0 +1,505 @@
+"""
+Almacén binario de puntuaciones con registros de ancho fijo
+Cada puntuación ocupa 32 bytes: cuatro enteros de 64 bits con la puntuación
+(en milésimas), el timestamp, los IDs de usuario y de pago en la tabla de
+cadenas y el nivel con el indicador de blockchain. Los nombres de usuario y los
+IDs de pago se guardan una sola vez en una tabla de cadenas (JSONL).
+
+El archivo se mapea en memoria (mmap) y se lee como un array de enteros sin
+copiarlo: la clasificación es un array de índices de registro ordenado por
+puntuación, y los filtros recorren las columnas del mapa. Solo se crea un
+diccionario por cada puntuación que se devuelve.
+
+Importar o exportar las puntuaciones en JSON (formato de /tmp/scores.json):
+    python binary_scores.py import [/tmp/scores.json]
+    python binary_scores.py export [/tmp/scores.json]
+"""
+
+import os
+import sys
+import math
+import mmap
+import array
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+
+import json_codec
+from jsonl_log import AppendLog, atomic_write
+from metrics import timed_storage
+from score_store import encode_cursor, decode_cursor
+
+logger = logging.getLogger(__name__)
+
+BINARY_SCORES_FILE = '/tmp/scores.bin'
+MAGIC = b'BPSCORE1'
+# Cabecera: MAGIC y espacio reservado, múltiplo de 8 para alinear los registros
+HEADER_SIZE = 32
+# Campos de cada registro (int64)
+SCORE, TIMESTAMP, IDS, LEVEL_FLAGS = range(4)
+FIELDS = 4
+RECORD_SIZE = FIELDS * 8
+# La puntuación se guarda en milésimas para admitir decimales
+SCORE_SCALE = 1000
+BLOCKCHAIN_FLAG = 1
+# Con más registros nuevos que este, ordenar todo es más barato que insertar uno a uno
+RESORT_THRESHOLD = 64
+# Mayor puntuación que cabe en un entero de 64 bits en milésimas
+MAX_SCORE = (2 ** 63 - 1) // SCORE_SCALE
+# El nivel ocupa los bits por encima del indicador de blockchain
+MAX_LEVEL = (2 ** 63 - 1) >> 8
+INT64_MAX = 2 ** 63 - 1
+
+
+class BinaryScoreStore:
+    """
+    Puntuaciones en un archivo binario mapeado en memoria, con la misma interfaz que ScoreStore
+
+    Solo se guardan los campos de /api/scores/record: username, score, level,
+    timestamp, paymentId y blockchain.
+
+    Args:
+        path (str): Ruta del archivo de registros (la tabla de cadenas es path + '.strings.jsonl')
+        seed (callable, opcional): Devuelve las puntuaciones a importar si el archivo no existe
+    """
+
+    def __init__(self, path=BINARY_SCORES_FILE, seed=None):
+        self.path = path
+        # Tabla de cadenas; su bloqueo protege también las escrituras del archivo binario
+        self.strings = AppendLog(path + '.strings.jsonl')
+        self.seed = seed
+        self._strings = [None]  # id -> cadena; el 0 es None
+        self._string_ids = {}
+        self._view = None  # memoryview int64 sobre los registros del mmap
+        self._count = 0
+        self._inode = None  # inodo del archivo mapeado: cambia si se reemplaza
+        self._order = array.array('q')  # índices de registro de mayor a menor puntuación
+        self._order_keys = array.array('q')  # -puntuación de cada posición de _order (para bisect)
+        self._user_counts = {}  # id de usuario -> número de puntuaciones
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # --- Lectura ---
+
+    def _sync(self):
+        """Incorpora las cadenas y los registros que otros procesos hayan añadido"""
+        if not self._loaded:
+            with self.strings.lock():
+                self._initialize()
+            self._loaded = True
+        # Los escritores añaden las cadenas antes que los registros: mapeando primero
+        # los registros, toda cadena que referencian ya está en el JSONL al leerlo
+        self._map()
+        records, reset = self.strings.read_new()
+        if reset:
+            self._strings, self._string_ids = [None], {}
+            self._clear_index()
+            self._map()
+            records += self.strings.read_new()[0]
+        for value in records:
+            self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+
+    def _initialize(self):
+        """Crea el archivo (importando las puntuaciones de seed) o comprueba su cabecera"""
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f'{self.path} is not a binary score file')
+            return
+        atomic_write(self.path, MAGIC.ljust(HEADER_SIZE, b'\0'))
+        scores = valid_scores(self.seed()) if self.seed is not None else []
+        if scores:
+            self._sync_strings()
+            self._write(scores)
+            logger.info('Imported %d scores into %s', len(scores), self.path)
+
+    def _sync_strings(self):
+        records, _ = self.strings.read_new()
+        for value in records:
+            self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+
+    def _clear_index(self):
+        self._view = None
+        self._count = 0
+        self._inode = None
+        self._order = array.array('q')
+        self._order_keys = array.array('q')
+        self._user_counts = {}
+
+    def _map(self):
+        """Vuelve a mapear el archivo si ha crecido e indexa los registros nuevos"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._clear_index()
+            return
+        # Un registro a medio escribir al final se ignora hasta que esté completo
+        count = max(0, (stat.st_size - HEADER_SIZE) // RECORD_SIZE)
+        if stat.st_ino != self._inode or count < self._count:
+            # El archivo fue reemplazado: reindexar desde el principio
+            self._clear_index()
+            self._inode = stat.st_ino
+        if count == self._count:
+            return
+        with open(self.path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Las vistas anteriores mantienen vivo el mapa antiguo hasta que se liberan
+        self._view = memoryview(mapped)[HEADER_SIZE:HEADER_SIZE + count * RECORD_SIZE].cast('q')
+        previous, self._count = self._count, count
+        self._index(previous, count)
+
+    def _index(self, start, end):
+        scores = self._view[SCORE::FIELDS]
+        ids = self._view[IDS::FIELDS]
+        for i in range(start, end):
+            user = ids[i] >> 32
+            self._user_counts[user] = self._user_counts.get(user, 0) + 1
+        if end - start > RESORT_THRESHOLD:
+            # sorted es estable: a igual puntuación queda primero la más antigua
+            self._order = array.array('q', sorted(range(end), key=lambda i: -scores[i]))
+            self._order_keys = array.array('q', (-scores[i] for i in self._order))
+            return
+        for i in range(start, end):
+            # bisect_right: a igual puntuación, la nueva (índice mayor) va detrás
+            position = bisect_right(self._order_keys, -scores[i])
+            self._order.insert(position, i)
+            self._order_keys.insert(position, -scores[i])
+
+    def _record(self, i):
+        """Diccionario de una puntuación (solo para las que se devuelven)"""
+        base = i * FIELDS
+        view = self._view
+        ids = view[base + IDS]
+        level_flags = view[base + LEVEL_FLAGS]
+        return {
+            'username': self._strings[ids >> 32],
+            'score': _decode_score(view[base + SCORE]),
+            'level': level_flags >> 8,
+            'timestamp': view[base + TIMESTAMP],
+            'paymentId': self._strings[ids & 0xFFFFFFFF],
+            'blockchain': bool(level_flags & BLOCKCHAIN_FLAG),
+        }
+
+    # --- Escritura ---
+
+    def _intern(self, values):
+        """Añade a la tabla las cadenas que aún no tiene (llamar con el bloqueo)"""
+        new = list(dict.fromkeys(v for v in values if v is not None and v not in self._string_ids))
+        if new:
+            self.strings.append(*new)
+            self._sync_strings()
+
+    def _write(self, scores):
+        """
+        Añade puntuaciones al final del archivo (llamar con el bloqueo)
+
+        Raises:
+            ValueError: Si algún campo no cabe en el registro (no se escribe ninguna)
+        """
+        for score in scores:
+            _validate(score)
+        self._intern(s for score in scores for s in (_string(score.get('username')), _string(score.get('paymentId'))))
+        rows = array.array('q')
+        for score in scores:
+            rows.extend(self._encode(score))
+        with open(self.path, 'ab') as f:
+            f.write(rows.tobytes())
+
+    def _encode(self, score):
+        user = self._string_ids.get(_string(score.get('username')), 0)
+        payment = self._string_ids.get(_string(score.get('paymentId')), 0)
+        try:
+            level = int(score.get('level') or 0)
+        except (TypeError, ValueError):
+            level = 0
+        try:
+            timestamp = int(score.get('timestamp') or 0)
+        except (TypeError, ValueError):
+            timestamp = 0
+        return (
+            _encode_score(score.get('score')),
+            timestamp,
+            (user << 32) | payment,
+            (level << 8) | (BLOCKCHAIN_FLAG if score.get('blockchain') else 0),
+        )
+
+    @timed_storage('scores')
+    def append(self, score_obj):
+        """
+        Añade una puntuación al archivo
+
+        Args:
+            score_obj (dict): La puntuación a guardar
+
+        Returns:
+            dict: La puntuación guardada
+        """
+        with self._lock, self.strings.lock():
+            self._sync()
+            self._write([score_obj])
+            self._map()
+        return score_obj
+
+    @timed_storage('scores')
+    def extend(self, scores):
+        """Añade muchas puntuaciones con una sola escritura (importación); omite las que no caben"""
+        with self._lock, self.strings.lock():
+            self._sync()
+            self._write(valid_scores(scores))
+            self._map()
+
+    # --- Consultas ---
+
+    def all(self):
+        """Devuelve todas las puntuaciones en orden de llegada"""
+        with self._lock:
+            self._sync()
+            return [self._record(i) for i in range(self._count)]
+
+    def since(self, version):
+        """
+        Puntuaciones añadidas después de una versión
+
+        Returns:
+            tuple: (puntuaciones nuevas, versión actual, reiniciado), como ScoreStore.since
+        """
+        with self._lock:
+            self._sync()
+            inode, count = _parse_version(version)
+            if version is not None and (inode != self._inode or count > self._count):
+                return [self._record(i) for i in range(self._count)], self._version(), True
+            return [self._record(i) for i in range(count, self._count)], self._version(), False
+
+    def column(self, field):
+        """
+        Vista sin copia de una columna de enteros (SCORE, TIMESTAMP, IDS o LEVEL_FLAGS)
+
+        La puntuación está en milésimas, IDS lleva el id de usuario en los 32
+        bits altos y LEVEL_FLAGS el nivel a partir del bit 8.
+        """
+        with self._lock:
+            self._sync()
+            return self._view[field::FIELDS] if self._view is not None else memoryview(array.array('q'))
+
+    def indices(self, username=None, min_level=None, since=None, until=None, ranked=False):
+        """
+        Índices de las puntuaciones que cumplen los filtros, leyendo solo las columnas
+
+        Args:
+            username (str, opcional): Solo las de este usuario
+            min_level (int, opcional): Nivel mínimo
+            since, until (int, opcional): Rango de timestamp en ms (inclusivo)
+            ranked (bool): De mayor a menor puntuación en lugar de en orden de llegada
+
+        Returns:
+            list: Índices de registro (para record())
+        """
+        with self._lock:
+            self._sync()
+            if self._view is None:
+                return []
+            user = None
+            if username is not None:
+                user = self._string_ids.get(username)
+                if user is None:
+                    return []
+            ids = self._view[IDS::FIELDS]
+            levels = self._view[LEVEL_FLAGS::FIELDS]
+            timestamps = self._view[TIMESTAMP::FIELDS]
+            result = []
+            for i in (self._order if ranked else range(self._count)):
+                if user is not None and ids[i] >> 32 != user:
+                    continue
+                if min_level is not None and levels[i] >> 8 < min_level:
+                    continue
+                if (since is not None and timestamps[i] < since) or (until is not None and timestamps[i] > until):
+                    continue
+                result.append(i)
+            return result
+
+    def record(self, index):
+        """Puntuación de un índice devuelto por indices()"""
+        with self._lock:
+            self._sync()
+            return self._record(index)
+
+    @timed_storage('scores')
+    def ranked(self, username=None, offset=0, limit=None, cursor=None):
+        """
+        Devuelve una página de la clasificación (de mayor a menor puntuación)
+
+        Mismos argumentos y resultado que ScoreStore.ranked.
+        """
+        with self._lock:
+            self._sync()
+            order = self._order
+            if self._view is None:
+                return [], 0, None
+            scores = self._view[SCORE::FIELDS]
+            start = 0
+            if cursor:
+                neg_score, seq = decode_cursor(cursor)
+                key = round(neg_score * SCORE_SCALE)
+                # Entre las de igual puntuación los índices están en orden creciente
+                start = bisect_right(order, seq, bisect_left(self._order_keys, key),
+                                     bisect_right(self._order_keys, key))
+
+            if username is None:
+                total = self._count
+                start += offset
+                end = total if limit is None else min(total, start + limit)
+                page = order[start:end]
+                more = end < total
+            else:
+                user = self._string_ids.get(username)
+                total = self._user_counts.get(user, 0) if user is not None else 0
+                ids = self._view[IDS::FIELDS]
+                page, skip, more = [], offset, False
+                for position in range(start, len(order) if user is not None else start):
+                    i = order[position]
+                    if ids[i] >> 32 != user:
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    if limit is not None and len(page) == limit:
+                        more = True
+                        break
+                    page.append(i)
+
+            last = page[-1] if len(page) else None
+            next_cursor = encode_cursor((-scores[last] / SCORE_SCALE, last)) if more and last is not None else None
+            return [self._record(i) for i in page], total, next_cursor
+
+    def top(self, k, username=None):
+        """Devuelve las k mejores puntuaciones"""
+        return self.ranked(username=username, limit=k)[0]
+
+    @timed_storage('scores')
+    def compact(self):
+        """Elimina un registro incompleto al final del archivo (los registros no se reescriben)"""
+        with self._lock, self.strings.lock():
+            self._sync()
+            complete = HEADER_SIZE + self._count * RECORD_SIZE
+            if os.path.getsize(self.path) > complete:
+                os.truncate(self.path, complete)
+                logger.info('Truncated incomplete record from %s', self.path)
+
+    def version(self):
+        """Inodo y número de registros: cambia con cada puntuación y si el archivo se reemplaza"""
+        with self._lock:
+            self._sync()
+            return self._version()
+
+    def _version(self):
+        return f'{self._inode}-{self._count}'
+
+    def count(self, username=None):
+        with self._lock:
+            self._sync()
+            if username is None:
+                return self._count
+            user = self._string_ids.get(username)
+            return self._user_counts.get(user, 0) if user is not None else 0
+
+    def __len__(self):
+        return self.count()
+
+
+def _parse_version(version):
+    """(inodo, número de registros) de una versión de BinaryScoreStore"""
+    try:
+        inode, count = version.split('-')
+        return int(inode), int(count)
+    except (AttributeError, ValueError):
+        return None, 0
+
+
+def _string(value):
+    return None if value is None else str(value)
+
+
+def _encode_score(value):
+    """
+    Puntuación en milésimas
+
+    Raises:
+        ValueError: Si la puntuación no es finita o no cabe en 64 bits
+    """
+    try:
+        score = float(value or 0)
+    except (TypeError, ValueError):
+        return 0
+    if not math.isfinite(score) or abs(score) > MAX_SCORE:
+        raise ValueError(f'Score out of range: {value}')
+    return round(score * SCORE_SCALE)
+
+
+def _validate(score):
+    """
+    Comprueba que una puntuación cabe en un registro
+
+    Raises:
+        ValueError: Si la puntuación, el nivel o el timestamp están fuera de rango
+    """
+    _encode_score(score.get('score'))
+    for field, maximum in (('level', MAX_LEVEL), ('timestamp', INT64_MAX)):
+        try:
+            value = int(score.get(field) or 0)
+        except (TypeError, ValueError, OverflowError):
+            # Como en _encode: lo que no es un número se guarda como 0 (salvo infinito)
+            if isinstance(score.get(field), float):
+                raise ValueError(f'{field} out of range: {score.get(field)}')
+            continue
+        if abs(value) > maximum:
+            raise ValueError(f'{field} out of range: {value}')
+
+
+def valid_scores(scores):
+    """Las puntuaciones que caben en un registro (las demás se omiten con un aviso)"""
+    valid = []
+    for score in scores:
+        try:
+            _validate(score)
+        except ValueError as e:
+            logger.warning('Skipping score: %s', e)
+            continue
+        valid.append(score)
+    return valid
+
+
+def _decode_score(value):
+    # Las puntuaciones enteras se devuelven como int, igual que se recibieron
+    return value // SCORE_SCALE if value % SCORE_SCALE == 0 else value / SCORE_SCALE
+
+
+def load_json_scores(path):
+    """Puntuaciones de una lista JSON (/tmp/scores.json) o de un registro JSONL (/tmp/scores.jsonl)"""
+    with open(path, 'rb') as f:
+        text = f.read()
+    try:
+        data = json_codec.loads(text)
+    except ValueError:
+        data = [json_codec.loads(line) for line in text.splitlines() if line.strip()]
+    if not isinstance(data, list):
+        raise ValueError(f'{path} does not contain a list of scores')
+    return [score for score in data if isinstance(score, dict)]
+
+
+if __name__ == '__main__':
+    # python binary_scores.py import|export [archivo JSON] [archivo binario]
+    if len(sys.argv) < 2 or sys.argv[1] not in ('import', 'export'):
+        print(__doc__)
+        sys.exit(1)
+    json_path = sys.argv[2] if len(sys.argv) > 2 else '/tmp/scores.json'
+    store = BinaryScoreStore(sys.argv[3] if len(sys.argv) > 3 else os.getenv('BINARY_SCORES_PATH', BINARY_SCORES_FILE))
+    if sys.argv[1] == 'import':
+        scores = load_json_scores(json_path)
+        store.extend(scores)
+        print(f'Imported {len(scores)} scores into {store.path} ({len(store)} in total)')
+    else:
+        scores = store.all()
+        atomic_write(json_path, json_codec.dumps(scores))
+        print(f'Exported {len(scores)} scores to {json_path}')
@@ -0,0 +1,258 @@
+"""
+Circuit breakers y timeouts adaptativos para la API de Pi Network
+Cada endpoint (método + plantilla de la ruta, como POST /v2/payments/{id}/complete)
+tiene su propio circuito: si en la ventana reciente falla una fracción
+suficiente de llamadas, el circuito se abre y las siguientes fallan al instante
+sin ocupar un hilo esperando a la API. Pasado un tiempo se deja pasar alguna
+llamada de prueba (semiabierto) y, si responde bien, se vuelve a cerrar.
+
+El timeout de lectura de cada endpoint se ajusta a la latencia observada
+(un múltiplo del percentil alto), dentro de unos límites, para que una API
+degradada no alargue la cola de latencias hasta el timeout máximo.
+"""
+
+import os
+import math
+import time
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+
+import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+BREAKER_ENABLED = os.getenv('PI_API_BREAKER_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
+
+class CircuitOpenError(Exception):
+    """La llamada no se hizo porque el circuito del endpoint está abierto"""
+
+    def __init__(self, breaker):
+        self.method = breaker.method
+        self.endpoint = breaker.endpoint
+        self.retry_after = breaker.retry_after()
+        super().__init__(f'Pi API circuit open for {self.method} {self.endpoint}, retry in {self.retry_after:.0f}s')
+
+    def payload(self):
+        """Cuerpo JSON de la respuesta 503 que reciben los clientes"""
+        return {'error': 'Pi Network API temporarily unavailable', 'retryAfter': math.ceil(self.retry_after)}
+
+    def headers(self):
+        return {'Retry-After': str(max(1, math.ceil(self.retry_after)))}
+
+
+class AdaptiveTimeout:
+    """
+    Timeout de lectura a partir de las latencias recientes de un endpoint
+
+    Args:
+        maximum (float): Timeout máximo (y el que se usa sin datos suficientes)
+        minimum (float): Timeout mínimo
+        percentile (float): Percentil de la latencia que se toma como referencia (0-1)
+        multiplier (float): Múltiplo del percentil que se concede a cada llamada
+        samples (int): Número de latencias recientes que se conservan
+        min_samples (int): Latencias necesarias antes de ajustar el timeout
+    """
+
+    def __init__(self, maximum, minimum=1.0, percentile=0.99, multiplier=3.0, samples=200, min_samples=20):
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._recent = deque(maxlen=samples)
+        self._sorted = []
+        self._current = maximum
+
+    def observe(self, elapsed):
+        """
+        Registra la duración de una llamada (llamar con el lock del circuito)
+
+        Las llamadas que agotan el timeout también cuentan: si la API se vuelve
+        más lenta, el percentil sube y el timeout crece hasta el máximo.
+        """
+        if len(self._recent) == self._recent.maxlen:
+            del self._sorted[bisect_left(self._sorted, self._recent[0])]
+        self._recent.append(elapsed)
+        insort(self._sorted, elapsed)
+        if len(self._sorted) >= self.min_samples:
+            reference = self._sorted[min(len(self._sorted) - 1, int(self.percentile * len(self._sorted)))]
+            self._current = max(self.minimum, min(self.maximum, reference * self.multiplier))
+
+    @property
+    def current(self):
+        return self._current
+
+
+class CircuitBreaker:
+    """
+    Circuito de un endpoint de la API de Pi
+
+    Args:
+        method (str): Método HTTP
+        endpoint (str): Plantilla de la ruta (metrics.pi_api_endpoint)
+        failure_rate (float): Fracción de fallos en la ventana que abre el circuito
+        min_requests (int): Llamadas mínimas en la ventana para evaluar la fracción
+        window (float): Segundos de la ventana de llamadas recientes
+        open_seconds (float): Segundos que el circuito permanece abierto
+        half_open_probes (int): Llamadas de prueba simultáneas en estado semiabierto
+        timeout (AdaptiveTimeout): Timeout de lectura del endpoint
+    """
+
+    def __init__(self, method, endpoint, failure_rate=0.5, min_requests=10, window=30.0,
+                 open_seconds=15.0, half_open_probes=1, timeout=None):
+        self.method = method
+        self.endpoint = endpoint
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.timeout = timeout
+        self.state = CLOSED
+        self._calls = deque()  # (momento, fallo)
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+        self._lock = threading.Lock()
+        self._set_state(CLOSED)
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.circuit_state.set(STATE_VALUES[state], self.method, self.endpoint)
+
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, failed = self._calls.popleft()
+            self._failures -= failed
+
+    def allow(self):
+        """True si la llamada puede hacerse; en semiabierto reserva una llamada de prueba"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._set_state(HALF_OPEN)
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, success, elapsed=None):
+        """
+        Registra el resultado de una llamada permitida por allow()
+
+        Args:
+            success (bool): False si no hubo respuesta o la API respondió 5xx/429
+            elapsed (float, opcional): Duración de la llamada
+        """
+        now = time.monotonic()
+        with self._lock:
+            if elapsed is not None and self.timeout is not None:
+                self.timeout.observe(elapsed)
+                metrics.upstream_timeout.set(self.timeout.current, self.method, self.endpoint)
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if success:
+                    # La prueba salió bien: empezar de cero con el circuito cerrado
+                    self._calls.clear()
+                    self._failures = 0
+                    self._set_state(CLOSED)
+                else:
+                    self._open(now)
+                return
+            self._calls.append((now, not success))
+            self._failures += not success
+            self._trim(now)
+            if (self.state == CLOSED and len(self._calls) >= self.min_requests
+                    and self._failures / len(self._calls) >= self.failure_rate):
+                self._open(now)
+
+    def _open(self, now):
+        self._opened_at = now
+        self._set_state(OPEN)
+        metrics.circuit_opened.inc(self.method, self.endpoint)
+
+    def retry_after(self):
+        """Segundos hasta la próxima llamada de prueba"""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def snapshot(self):
+        """Estado del circuito para /health"""
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = len(self._calls)
+            return {
+                'state': self.state,
+                'requests': calls,
+                'failureRate': round(self._failures / calls, 3) if calls else 0.0,
+                'retryAfter': round(self.retry_after(), 1) if self.state != CLOSED else 0.0,
+                'readTimeout': round(self.timeout.current, 3) if self.timeout is not None else None,
+            }
+
+
+class CircuitBreakers:
+    """
+    Circuitos por endpoint, creados en la primera llamada
+
+    La configuración se lee de las variables de entorno PI_API_BREAKER_* y
+    PI_API_TIMEOUT_*; el timeout máximo es el read_timeout del cliente.
+    """
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, method, endpoint, read_timeout):
+        key = (method, endpoint)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = self._breakers[key] = CircuitBreaker(
+                        method, endpoint,
+                        failure_rate=_env_float('PI_API_BREAKER_FAILURE_RATE', 0.5),
+                        min_requests=int(_env_float('PI_API_BREAKER_MIN_REQUESTS', 10)),
+                        window=_env_float('PI_API_BREAKER_WINDOW', 30),
+                        open_seconds=_env_float('PI_API_BREAKER_OPEN_SECONDS', 15),
+                        half_open_probes=int(_env_float('PI_API_BREAKER_HALF_OPEN_PROBES', 1)),
+                        timeout=AdaptiveTimeout(
+                            maximum=read_timeout,
+                            minimum=_env_float('PI_API_TIMEOUT_MIN', 1),
+                            percentile=_env_float('PI_API_TIMEOUT_PERCENTILE', 0.99),
+                            multiplier=_env_float('PI_API_TIMEOUT_MULTIPLIER', 3),
+                        )
+                    )
+        return breaker
+
+    def snapshot(self):
+        """Estado de todos los circuitos, por 'MÉTODO endpoint'"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {f'{b.method} {b.endpoint}': b.snapshot() for b in sorted(breakers, key=lambda b: (b.endpoint, b.method))}
+
+
+# Compartidos por todos los clientes del proceso (app.py, api.py y asgi.py)
+UPSTREAM_BREAKERS = CircuitBreakers()
+
+
+def is_failure_status(status):
+    """Respuestas que cuentan como fallo de la API (errores del servidor y limitación)"""
+    return status is None or status >= 500 or status == 429
@@ -0,0 +1,268 @@
+"""
+Cola persistente de completados de pago (outbox)
+En el modo asíncrono /payment/complete solo anota la intención de completar el
+pago en un registro JSONL y responde enseguida; un grupo de hilos en segundo
+plano hace las llamadas a la API de Pi Network y la suma al contador, con
+reintentos y espera exponencial. El estado de cada pago se consulta por su
+payment_id.
+
+Cada cambio de estado es un registro nuevo en el archivo, así que un pago
+anotado no se pierde si el proceso se reinicia: al arrancar (y periódicamente)
+se retoman los pagos que llevan demasiado tiempo sin avanzar.
+"""
+
+import time
+import uuid
+import heapq
+import random
+import logging
+import threading
+from collections import OrderedDict
+
+import metrics
+from events import Broadcaster
+from jsonl_log import AppendLog
+
+logger = logging.getLogger(__name__)
+
+COMPLETION_OUTBOX_FILE = '/tmp/completion_outbox.jsonl'
+
+# Estados de un pago en la cola
+PENDING = 'pending'        # Anotado, esperando un worker
+PROCESSING = 'processing'  # Un worker está llamando a la API de Pi
+RETRYING = 'retrying'      # Falló el último intento; se reintentará en next_attempt
+COMPLETED = 'completed'
+FAILED = 'failed'          # Se agotaron los intentos o la API rechazó el pago
+ACTIVE_STATES = (PENDING, PROCESSING, RETRYING)
+
+# Errores 4xx que se reintentan (timeout de la petición y limitación); el resto no cambia al repetir
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+def is_terminal_status(status_code):
+    """Respuestas que marcan el pago como fallido sin reintentar (errores 4xx del cliente)"""
+    return 400 <= status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS
+
+
+class CompletionOutbox:
+    """
+    Cola de completados con un grupo de workers en segundo plano
+
+    Args:
+        process (callable): process(payment_id, txid, access_token) -> (respuesta, código
+            de estado HTTP); un código 200 marca el pago como completado y un 4xx
+            (salvo 408 y 429) como fallido sin reintentar
+        path (str): Ruta del registro JSONL
+        workers (int): Número de hilos que procesan la cola
+        max_attempts (int): Intentos antes de marcar el pago como fallido
+        backoff (float): Espera (segundos) antes del primer reintento; se duplica en cada uno
+        max_backoff (float): Espera máxima entre reintentos
+        stale_after (float): Segundos sin cambios tras los que otro proceso retoma un pago
+            activo; debe ser mayor que la duración máxima de un intento
+        retention (float): Segundos que se conservan los pagos terminados al compactar
+    """
+
+    def __init__(self, process, path=COMPLETION_OUTBOX_FILE, workers=2, max_attempts=5,
+                 backoff=1.0, max_backoff=60.0, stale_after=120.0, retention=86400.0):
+        self.process = process
+        self.log = AppendLog(path)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stale_after = stale_after
+        self.retention = retention
+        # Cambios de estado de los pagos procesados en este proceso (para SSE)
+        self.events = Broadcaster()
+        self._owner = uuid.uuid4().hex[:8]
+        self._entries = OrderedDict()  # payment_id -> último registro
+        self._log_records = 0
+        self._lock = threading.RLock()
+        # Tokens de acceso solo en memoria: no se escriben en disco
+        self._tokens = {}
+        self._due = []  # heap de (momento, payment_id) programados en este proceso
+        self._scheduled = set()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._last_recovery = 0.0
+
+    def _sync(self):
+        records, reset = self.log.read_new()
+        if reset:
+            self._entries.clear()
+            self._log_records = 0
+        for record in records:
+            self._entries[record['payment_id']] = record
+            self._entries.move_to_end(record['payment_id'])
+        self._log_records += len(records)
+
+    def _write(self, entry, **changes):
+        """Añade el nuevo estado de un pago al registro (llamar con self.log.lock())"""
+        record = dict(entry, **changes, timestamp=time.time(), owner=self._owner)
+        self.log.append(record)
+        self._sync()
+        metrics.outbox_transitions.inc(record['state'])
+        self._compact()
+        self.events.publish('payment', public_status(record))
+        return record
+
+    def _compact(self):
+        if self._log_records <= 2 * len(self._entries) + 100:
+            return
+        cutoff = time.time() - self.retention
+        keep = [entry for entry in self._entries.values()
+                if entry['state'] in ACTIVE_STATES or entry['timestamp'] >= cutoff]
+        self.log.rewrite(keep)
+        self._entries = OrderedDict((entry['payment_id'], entry) for entry in keep)
+        self._log_records = len(keep)
+
+    def status(self, payment_id):
+        """Último registro de un pago o None si no está en la cola"""
+        with self._lock:
+            self._sync()
+            return self._entries.get(payment_id)
+
+    def enqueue(self, payment_id, txid, access_token=None):
+        """
+        Anota un pago para completarlo en segundo plano
+
+        Si el pago ya está en la cola (activo o completado) no se vuelve a
+        anotar; solo un pago fallido se puede volver a intentar.
+
+        Returns:
+            dict: Registro con el estado actual del pago
+        """
+        with self._lock, self.log.lock():
+            self._sync()
+            entry = self._entries.get(payment_id)
+            if entry is not None and entry['state'] != FAILED:
+                return entry
+            if access_token:
+                self._tokens[payment_id] = access_token
+            entry = self._write(
+                {'payment_id': payment_id, 'txid': txid},
+                state=PENDING, attempts=0, error=None, next_attempt=time.time()
+            )
+        logger.info('Payment %s queued for completion', payment_id)
+        self._schedule(payment_id, entry['next_attempt'])
+        return entry
+
+    def _schedule(self, payment_id, when):
+        with self._condition:
+            if payment_id in self._scheduled:
+                return
+            self._scheduled.add(payment_id)
+            heapq.heappush(self._due, (when, payment_id))
+            self._condition.notify()
+
+    def start(self):
+        """Arranca los workers y retoma los pagos pendientes de ejecuciones anteriores"""
+        with self._condition:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'completion-outbox-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self.recover()
+
+    def recover(self, stale_after=None):
+        """
+        Programa en este proceso los pagos activos que nadie está procesando
+
+        Args:
+            stale_after (float, opcional): Segundos sin cambios para considerar
+                abandonado un pago de otro proceso (por defecto self.stale_after)
+        """
+        stale_after = self.stale_after if stale_after is None else stale_after
+        now = time.time()
+        self._last_recovery = now
+        claimed = []
+        with self._lock, self.log.lock():
+            self._sync()
+            with self._condition:
+                scheduled = set(self._scheduled)
+            for payment_id, entry in list(self._entries.items()):
+                if entry['state'] not in ACTIVE_STATES or payment_id in scheduled:
+                    continue
+                # Los pagos de este proceso que no están programados se están procesando ahora
+                if entry.get('owner') == self._owner or now - entry['timestamp'] < stale_after:
+                    continue
+                # Registrar el nuevo dueño bajo el bloqueo: los demás procesos lo verán reciente
+                entry = self._write(entry, state=PENDING if entry['state'] == PROCESSING else entry['state'])
+                claimed.append((payment_id, entry.get('next_attempt') or now))
+        for payment_id, when in claimed:
+            logger.info('Resuming queued completion of payment %s', payment_id)
+            self._schedule(payment_id, when)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    now = time.time()
+                    if self._due and self._due[0][0] <= now:
+                        _, payment_id = heapq.heappop(self._due)
+                        self._scheduled.discard(payment_id)
+                        break
+                    if now - self._last_recovery >= self.stale_after:
+                        payment_id = None
+                        self._last_recovery = now
+                        break
+                    wait = self._due[0][0] - now if self._due else self.stale_after
+                    self._condition.wait(timeout=min(wait, self.stale_after))
+            try:
+                if payment_id is None:
+                    self.recover()
+                else:
+                    self._attempt(payment_id)
+            except Exception as e:
+                logger.error('Completion outbox worker error: %s', e)
+
+    def _attempt(self, payment_id):
+        """Un intento de completar un pago; programa el siguiente si falla"""
+        with self._lock, self.log.lock():
+            self._sync()
+            entry = self._entries.get(payment_id)
+            if entry is None or entry['state'] not in ACTIVE_STATES:
+                return
+            if entry.get('owner') != self._owner:
+                # Otro proceso lo retomó mientras esperaba
+                return
+            entry = self._write(entry, state=PROCESSING, attempts=entry['attempts'] + 1)
+
+        terminal = False
+        try:
+            _, status_code = self.process(payment_id, entry['txid'], self._tokens.get(payment_id))
+            error = None if status_code == 200 else f'HTTP {status_code}'
+            terminal = is_terminal_status(status_code)
+        except Exception as e:
+            error = str(e)
+
+        with self._lock, self.log.lock():
+            if error is None:
+                self._write(entry, state=COMPLETED, error=None, next_attempt=None)
+                self._tokens.pop(payment_id, None)
+                return
+            if terminal or entry['attempts'] >= self.max_attempts:
+                logger.error('Giving up completing payment %s after %d attempts: %s', payment_id, entry['attempts'], error)
+                self._write(entry, state=FAILED, error=error, next_attempt=None)
+                self._tokens.pop(payment_id, None)
+                return
+            # Espera exponencial con variación aleatoria para no sincronizar reintentos
+            delay = min(self.max_backoff, self.backoff * 2 ** (entry['attempts'] - 1)) * random.uniform(0.5, 1.0)
+            logger.warning('Completing payment %s failed (attempt %d): %s; retrying in %.1fs',
+                           payment_id, entry['attempts'], error, delay)
+            entry = self._write(entry, state=RETRYING, error=error, next_attempt=time.time() + delay)
+        self._schedule(payment_id, entry['next_attempt'])
+
+
+def public_status(entry):
+    """Estado de un pago tal como lo reciben los clientes"""
+    return {
+        'paymentId': entry['payment_id'],
+        'state': entry['state'],
+        'attempts': entry['attempts'],
+        'error': entry.get('error'),
+        'nextAttemptAt': entry.get('next_attempt'),
+        'updatedAt': entry['timestamp'],
+    }
@@ -0,0 +1,113 @@
+"""
+Difusión de eventos en proceso para Server-Sent Events (SSE)
+Un Broadcaster guarda los últimos eventos en un buffer circular y despierta a
+los suscriptores cuando se publica uno nuevo; los clientes que se reconectan
+con Last-Event-ID reciben los eventos que se perdieron.
+"""
+
+import time
+import uuid
+import threading
+from collections import deque
+
+import json_codec
+
+
+class Broadcaster:
+    """
+    Canal de eventos compartido por todos los hilos del proceso
+
+    Args:
+        buffer_size (int): Número de eventos recientes que se conservan para reanudar
+    """
+
+    def __init__(self, buffer_size=100):
+        # Identificador de esta instancia: los IDs de otro proceso o de antes de un reinicio no son válidos
+        self._boot = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+
+    def publish(self, event, data):
+        """Publica un evento y despierta a todos los suscriptores"""
+        with self._condition:
+            self._seq += 1
+            self._buffer.append((self._seq, event, data))
+            self._condition.notify_all()
+            return self._event_id(self._seq)
+
+    def last_id(self):
+        """ID del último evento publicado"""
+        with self._condition:
+            return self._event_id(self._seq)
+
+    def _event_id(self, seq):
+        return f'{self._boot}:{seq}'
+
+    def _parse_id(self, event_id):
+        """Devuelve la secuencia de un Last-Event-ID de esta instancia, o None"""
+        try:
+            boot, seq = event_id.split(':', 1)
+            seq = int(seq)
+        except (AttributeError, ValueError):
+            return None
+        return seq if boot == self._boot and seq <= self._seq else None
+
+    def subscribe(self, last_event_id=None, heartbeat=15.0):
+        """
+        Generador de eventos para un suscriptor
+
+        Args:
+            last_event_id (str, opcional): Último ID recibido por el cliente
+            heartbeat (float): Segundos máximos sin enviar nada
+
+        Yields:
+            tuple: (id, evento, datos) por cada evento, o None cuando vence el
+            heartbeat sin eventos. Si last_event_id no se puede reanudar, el primer
+            elemento es (None, 'resync', None) para que el llamador envíe el estado actual.
+        """
+        with self._condition:
+            seq = self._parse_id(last_event_id) if last_event_id else None
+            oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+            if seq is None or seq < oldest - 1:
+                resync = True
+                seq = self._seq
+            else:
+                resync = False
+
+        if resync:
+            yield (None, 'resync', None)
+
+        while True:
+            with self._condition:
+                if self._seq == seq:
+                    self._condition.wait(timeout=heartbeat)
+                pending = [item for item in self._buffer if item[0] > seq]
+                # Si el suscriptor se quedó demasiado atrás, debe resincronizar
+                lost = bool(pending) and pending[0][0] > seq + 1
+                seq = self._seq
+
+            if lost:
+                yield (None, 'resync', None)
+                continue
+            if not pending:
+                yield None
+                continue
+            for item_seq, event, data in pending:
+                yield (self._event_id(item_seq), event, data)
+
+
+def format_sse(data, event=None, event_id=None):
+    """Da formato text/event-stream a un evento"""
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json_codec.dumps_str(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def format_heartbeat():
+    """Comentario SSE que mantiene viva la conexión a través de proxies"""
+    return f': heartbeat {int(time.time())}\n\n'
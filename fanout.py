@@ -0,0 +1,69 @@
+"""
+Ejecución concurrente acotada de llamadas a la API de Pi Network
+Lanza varias tareas en paralelo con un límite de concurrencia y un plazo
+total compartido, devolviendo el resultado (o el error) de cada una
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class DeadlineExceeded(Exception):
+    """
+    La tarea no terminó antes del plazo total de la petición
+
+    Args:
+        message (str): Descripción del error
+        started (bool): True si la tarea ya estaba en marcha y sigue en segundo
+            plano (su efecto es desconocido); False si no llegó a empezar
+    """
+
+    def __init__(self, message, started=False):
+        super().__init__(message)
+        self.started = started
+
+
+def fan_out(tasks, max_workers=8, deadline=None):
+    """
+    Ejecuta un conjunto de tareas en paralelo
+
+    Args:
+        tasks (dict): Clave -> función sin argumentos a ejecutar
+        max_workers (int): Número máximo de tareas simultáneas
+        deadline (float, opcional): Segundos máximos para el conjunto completo
+
+    Returns:
+        dict: Clave -> (True, resultado) o (False, excepción). Las tareas que no
+        terminan a tiempo devuelven DeadlineExceeded, con started=True si ya
+        estaban en marcha (no se pueden interrumpir y pueden acabar después).
+    """
+    if not tasks:
+        return {}
+
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks))))
+    futures = {}
+    try:
+        futures = {executor.submit(fn): key for key, fn in tasks.items()}
+        remaining = None if deadline is None else max(0.0, deadline - (time.monotonic() - started))
+        done, _ = wait(futures, timeout=remaining)
+
+        results = {}
+        for future, key in futures.items():
+            if future not in done and future.cancel():
+                results[key] = (False, DeadlineExceeded(f'Deadline of {deadline}s exceeded'))
+                continue
+            if not future.done():
+                results[key] = (False, DeadlineExceeded(f'Deadline of {deadline}s exceeded', started=True))
+                continue
+            try:
+                results[key] = (True, future.result())
+            except Exception as e:
+                results[key] = (False, e)
+        return results
+    finally:
+        # No esperar a las tareas que se quedaron colgadas: el plazo ya venció. Las que
+        # aún no empezaron se cancelan una a una (cancel_futures requiere Python 3.9)
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -0,0 +1,52 @@
+"""
+Peticiones condicionales (ETag / If-None-Match) para las rutas de la API
+El ETag se obtiene del número de versión de los datos (generación del almacén
+de puntuaciones o posición del ledger del contador), sin serializar ni hashear
+la respuesta; si el cliente ya tiene esa versión se responde 304 sin cuerpo.
+"""
+
+import os
+
+from flask import request, make_response
+
+# Política Cache-Control por ruta (nombre del endpoint de Flask). Se puede
+# cambiar con CACHE_CONTROL_<ENDPOINT>, por ejemplo CACHE_CONTROL_GET_SCORES='public, max-age=5'
+DEFAULT_CACHE_CONTROL = {
+    'index': 'no-cache',
+    'simon_game': 'no-cache',
+    'get_payment_counter': 'no-cache',
+    'get_payment_counter_stats': 'no-cache',
+    'get_scores': 'no-cache',
+    'get_leaderboard': 'no-cache',
+}
+
+
+def cache_control_for(endpoint):
+    """Devuelve la política Cache-Control configurada para un endpoint"""
+    return os.getenv(f'CACHE_CONTROL_{endpoint.upper()}', DEFAULT_CACHE_CONTROL.get(endpoint, 'no-cache'))
+
+
+def conditional_response(version, build_response):
+    """
+    Responde 304 si el cliente ya tiene la versión actual; si no, construye la respuesta
+
+    Args:
+        version: Versión actual de los datos de la ruta
+        build_response (callable): Construye la respuesta completa (solo si hace falta)
+
+    Returns:
+        flask.Response: La respuesta con ETag y Cache-Control
+    """
+    endpoint = request.endpoint or 'default'
+    etag = f'{endpoint}-{version}'
+
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(build_response())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control_for(endpoint)
+    return response
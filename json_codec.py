@@ -0,0 +1,149 @@
+"""
+Codificación JSON común de la aplicación
+Usa orjson si está instalado (mucho más rápido y escribe bytes directamente) y
+si no la biblioteca estándar, con la misma salida compacta en UTF-8 en ambos
+casos (también para las fechas, que orjson pasa a _default como hace json).
+Lo usan las respuestas de Flask (install), los registros JSONL, el contador de
+pagos, las puntuaciones, los eventos SSE, los logs y el manifest de assets.py.
+orjson es opcional: pip install -r requirements-orjson.txt
+
+JSON_CODEC=json fuerza la biblioteca estándar.
+"""
+
+import os
+import json
+import uuid
+import logging
+import dataclasses
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.getenv('JSON_CODEC', 'auto').lower() == 'json':
+    orjson = None
+
+# Codificador en uso: 'orjson' o 'json'
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj):
+    """Tipos que no son JSON, convertidos como lo hace Flask (fechas, UUID, dataclasses, Markup)"""
+    if isinstance(obj, datetime):
+        from werkzeug.http import http_date
+        return http_date(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(obj, sort_keys=False, pretty=False, default=_default):
+    """
+    Codifica un objeto en JSON compacto (UTF-8, sin espacios)
+
+    Args:
+        obj: El objeto a codificar
+        sort_keys (bool): Ordenar las claves de los diccionarios
+        pretty (bool): Indentar con dos espacios (para archivos que se leen a mano)
+        default (callable): Conversión de los tipos que no son JSON
+
+    Returns:
+        bytes: El JSON codificado
+    """
+    if orjson is not None:
+        option = (orjson.OPT_SORT_KEYS if sort_keys else 0) | (orjson.OPT_INDENT_2 if pretty else 0)
+        # orjson escribe las fechas en ISO 8601: con PASSTHROUGH usan default, igual que json
+        option |= orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # Enteros de más de 64 bits u otros casos que orjson no admite
+            pass
+    return json.dumps(obj, separators=(',', ': ') if pretty else (',', ':'), indent=2 if pretty else None,
+                      sort_keys=sort_keys, ensure_ascii=False, default=default).encode('utf-8')
+
+
+def dumps_str(obj, sort_keys=False, default=_default):
+    """Como dumps, pero devuelve str (para construir texto, como los eventos SSE)"""
+    return dumps(obj, sort_keys=sort_keys, default=default).decode('utf-8')
+
+
+def loads(data):
+    """
+    Decodifica JSON de bytes o str
+
+    Raises:
+        ValueError: Si el JSON no es válido
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path):
+    """Lee y decodifica un archivo JSON completo"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+class _Encoder(json.JSONEncoder):
+    """JSONEncoder de Flask 2.0 que codifica con dumps (jsonify usa json.dumps(cls=...))"""
+
+    def encode(self, o):
+        if self.indent is not None:
+            # JSONIFY_PRETTYPRINT_REGULAR o modo debug: salida legible de la biblioteca estándar
+            return super().encode(o)
+        return dumps_str(o, sort_keys=self.sort_keys)
+
+    def default(self, o):
+        return _default(o)
+
+
+class _Decoder(json.JSONDecoder):
+    """JSONDecoder de Flask 2.0 para request.get_json"""
+
+    def decode(self, s, *args, **kwargs):
+        return loads(s)
+
+
+def install(app):
+    """
+    Hace que jsonify y request.get_json de una aplicación Flask usen este módulo
+
+    En Flask 2.2 o posterior se instala un JSONProvider cuyas respuestas llevan
+    directamente los bytes codificados; en versiones anteriores se configuran
+    app.json_encoder y app.json_decoder.
+    """
+    try:
+        from flask.json.provider import DefaultJSONProvider
+    except ImportError:
+        app.json_encoder = _Encoder
+        app.json_decoder = _Decoder
+        logger.debug('JSON responses encoded with %s (json_encoder)', BACKEND)
+        return
+
+    class CodecJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return dumps_str(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys))
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            if self.compact is False or (self.compact is None and self._app.debug):
+                return super().response(obj)
+            return self._app.response_class(dumps(obj, sort_keys=self.sort_keys) + b'\n', mimetype=self.mimetype)
+
+    app.json = CodecJSONProvider(app)
+    logger.debug('JSON responses encoded with %s (JSON provider)', BACKEND)
@@ -0,0 +1,166 @@
+"""
+Registro de solo-añadir en formato JSON Lines
+Cada registro es una línea JSON; añadir cuesta O(1) y varios procesos pueden
+compartir el mismo archivo gracias a un bloqueo de archivo (fcntl.flock).
+Cada lector sigue el archivo desde el último desplazamiento leído.
+"""
+
+import os
+import logging
+import threading
+import tempfile
+from contextlib import contextmanager
+
+import json_codec
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo bloqueo entre hilos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path, data):
+    """Escribe un archivo completo de forma atómica (archivo temporal + rename)"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class AppendLog:
+    """
+    Archivo JSONL compartido entre hilos y procesos
+
+    Args:
+        path (str): Ruta del archivo de registros
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = None
+        self._offset = 0
+        self._inode = None
+
+    @contextmanager
+    def lock(self):
+        """Bloqueo exclusivo entre hilos de este proceso y entre procesos"""
+        with self._thread_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                os.makedirs(os.path.dirname(self.lock_path) or '.', exist_ok=True)
+                self._lock_file = open(self.lock_path, 'a')
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, *records):
+        """Añade registros al final del archivo"""
+        data = b''.join(json_codec.dumps(record) + b'\n' for record in records)
+        with self.lock():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'ab+') as f:
+                # Una línea a medias (escritura interrumpida) no debe unirse al primer
+                # registro nuevo: se cierra y se descartará como registro corrupto
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        data = b'\n' + data
+                f.write(data)
+
+    def read_new(self):
+        """
+        Lee los registros añadidos desde la última lectura
+
+        Returns:
+            tuple: (registros, reiniciado). reiniciado es True si el archivo fue
+            reemplazado (compactado) y los registros empiezan desde el principio.
+        """
+        with self._thread_lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                reset = self._inode is not None or self._offset > 0
+                self._offset, self._inode = 0, None
+                return [], reset
+
+            reset = False
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                reset = self._inode is not None or self._offset > 0
+                self._offset, self._inode = 0, stat.st_ino
+            if stat.st_size == self._offset:
+                return [], reset
+
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read(stat.st_size - self._offset)
+
+            # Una línea sin salto final puede estar a medio escribir: se deja para la próxima lectura
+            end = chunk.rfind(b'\n') + 1
+            self._offset += end
+            records = []
+            for line in chunk[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json_codec.loads(line))
+                except ValueError:
+                    logger.warning('Skipping corrupt record in %s', self.path)
+            return records, reset
+
+    def position(self):
+        """Desplazamiento (en bytes) hasta el que se ha leído el archivo"""
+        with self._thread_lock:
+            return self._offset
+
+    def inode(self):
+        """Inodo del archivo leído: cambia cada vez que el archivo se reescribe o se reemplaza"""
+        with self._thread_lock:
+            return self._inode
+
+    def seek(self, offset):
+        """
+        Continúa la lectura desde un desplazamiento guardado previamente
+
+        Si el archivo es más corto que el desplazamiento se leerá desde el principio.
+        """
+        with self._thread_lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._offset, self._inode = 0, None
+                return
+            self._inode = stat.st_ino
+            self._offset = offset if offset <= stat.st_size else 0
+
+    def rewrite(self, records):
+        """Reemplaza el contenido del archivo de forma atómica (compactación)"""
+        data = b''.join(json_codec.dumps(record) + b'\n' for record in records)
+        with self.lock():
+            atomic_write(self.path, data)
+            stat = os.stat(self.path)
+            self._offset, self._inode = stat.st_size, stat.st_ino
@@ -0,0 +1,149 @@
+"""
+Clasificaciones por periodo del juego Simon Dice: del día, de la semana y de siempre
+Cada periodo tiene una clasificación con las K mejores puntuaciones de todos
+los niveles y una por nivel. Se mantienen en memoria y se actualizan con cada
+puntuación nueva (las de otros procesos se leen del almacén con since()), así
+que leer una clasificación cuesta O(K) y no hay que filtrar todas las
+puntuaciones por fecha. Los periodos se cuentan en UTC, la semana empieza el
+lunes, y al cambiar de día o de semana la clasificación empieza vacía.
+"""
+
+import time
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+ALL_TIME = 'all'
+WINDOWS = (DAILY, WEEKLY, ALL_TIME)
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def period_start(window, now_ms):
+    """
+    Inicio (ms desde epoch, UTC) del periodo de una ventana que contiene now_ms
+
+    Args:
+        window (str): daily, weekly o all
+        now_ms (int): Momento en milisegundos
+
+    Returns:
+        int: Inicio del periodo (0 para all)
+    """
+    if window == ALL_TIME:
+        return 0
+    day = now_ms - now_ms % DAY_MS
+    if window == DAILY:
+        return day
+    # El 1 de enero de 1970 fue jueves (weekday 3)
+    return day - ((now_ms // DAY_MS + 3) % 7) * DAY_MS
+
+
+class Leaderboards:
+    """
+    Las K mejores puntuaciones por ventana y nivel
+
+    Args:
+        store: Almacén de puntuaciones (ScoreStore, SqliteScoreStore o BinaryScoreStore)
+        k (int): Puntuaciones que se conservan en cada clasificación
+    """
+
+    def __init__(self, store, k=100):
+        self.store = store
+        self.k = k
+        # (ventana, nivel) -> lista ordenada de (-score, orden de llegada, puntuación); nivel None = todos
+        self._boards = {}
+        self._periods = {}  # ventana -> inicio del periodo actual
+        self._version = None  # versión del almacén ya incorporada
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _roll(self, now_ms):
+        """Vacía las clasificaciones de las ventanas cuyo periodo terminó"""
+        for window in WINDOWS:
+            start = period_start(window, now_ms)
+            if self._periods.get(window) == start:
+                continue
+            if window in self._periods:
+                logger.info('Starting new %s leaderboard', window)
+            self._periods[window] = start
+            for key in [key for key in self._boards if key[0] == window]:
+                del self._boards[key]
+
+    def _sync(self):
+        self._roll(int(time.time() * 1000))
+        version = self.store.version()
+        if version == self._version:
+            return
+        # La primera vez se recorren todas las puntuaciones; después solo las nuevas
+        records, self._version, reset = self.store.since(self._version)
+        if reset:
+            # El almacén se reescribió o se reemplazó: reconstruir desde el principio
+            self._boards.clear()
+        for record in records:
+            self._add(record)
+
+    def _add(self, record):
+        timestamp = _int(record.get('timestamp'))
+        level = _int(record.get('level'), None)
+        entry = (-_score_value(record), self._seq, record)
+        self._seq += 1
+        for window in WINDOWS:
+            if timestamp < self._periods[window]:
+                continue
+            for board_level in dict.fromkeys((None, level)):
+                board = self._boards.setdefault((window, board_level), [])
+                if len(board) >= self.k and entry[:2] > board[-1][:2]:
+                    continue
+                # El orden de llegada es único: nunca se comparan los diccionarios
+                bisect.insort(board, entry)
+                if len(board) > self.k:
+                    board.pop()
+
+    def update(self):
+        """Incorpora las puntuaciones nuevas (tras record_score) si ya se cargaron"""
+        with self._lock:
+            # Antes de la primera lectura no hay nada que actualizar: se cargará entonces
+            if self._version is not None:
+                self._sync()
+
+    def top(self, window, level=None, limit=None):
+        """
+        Las mejores puntuaciones del periodo actual de una ventana
+
+        Args:
+            window (str): daily, weekly o all
+            level (int, opcional): Solo las de este nivel
+            limit (int, opcional): Número de puntuaciones (como máximo K)
+
+        Returns:
+            tuple: (puntuaciones de mayor a menor, versión para el ETag)
+
+        Raises:
+            ValueError: Si la ventana no existe
+        """
+        if window not in WINDOWS:
+            raise ValueError(f'Unknown window: {window} (use {", ".join(WINDOWS)})')
+        with self._lock:
+            self._sync()
+            board = self._boards.get((window, level), [])
+            scores = [entry[2] for entry in (board if limit is None else board[:limit])]
+            return scores, f'{self._version}-{window}-{level}-{self._periods[window]}'
+
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _score_value(record):
+    try:
+        return float(record.get('score') or 0)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,194 @@
+"""
+Configuración de logging de la aplicación
+Los hilos que atienden peticiones solo crean el registro y lo dejan en una
+cola; un hilo aparte le da formato (texto o JSON), oculta tokens y datos
+personales y lo escribe. Los eventos de depuración muy frecuentes se muestrean
+por categoría.
+
+La redacción se aplica al mensaje ya formateado (getMessage), así que los datos
+personales que se pasan como argumento deben ir como clave=valor para que se
+reconozcan: logger.info('Saving score (username=%s)', username).
+
+Variables de entorno:
+    LOG_LEVEL: Nivel mínimo (DEBUG, INFO, WARNING...), INFO por defecto
+    LOG_FORMAT: json (por defecto) o text
+    LOG_SAMPLE_RATES: Fracción de eventos DEBUG que se registran por categoría,
+        por ejemplo 'upstream=0.1,payload=0.01'
+    LOG_REDACT: false para no ocultar tokens ni datos personales (solo en desarrollo)
+"""
+
+import os
+import re
+import sys
+import queue
+import atexit
+import logging
+import itertools
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import json_codec
+
+# Categorías para extra=...: los eventos DEBUG de estas categorías se muestrean
+REQUEST = {'category': 'request'}
+UPSTREAM = {'category': 'upstream'}
+PAYLOAD = {'category': 'payload'}
+
+DEFAULT_SAMPLE_RATES = {'request': 1.0, 'upstream': 0.1, 'payload': 0.1}
+QUEUE_SIZE = 10000
+
+# Tokens, claves y datos personales que no deben llegar a los logs
+REDACTED = '[REDACTED]'
+REDACT_PATTERNS = [
+    (re.compile(r'\b(Bearer|Key)\s+[A-Za-z0-9._~+/=\-]+'), r'\1 ' + REDACTED),
+    (re.compile(r'''(["']?(?:accessToken|access_token|api_key|apiKey|token|password|email|username|user_uid|user_id)["']?\s*[:=]\s*["']?)[^"',\s}]+'''),
+     r'\1' + REDACTED),
+    # Direcciones de wallet (formato Stellar: G + 55 caracteres)
+    (re.compile(r'\bG[A-Z2-7]{55}\b'), REDACTED),
+]
+
+_listener = None
+_lock = threading.Lock()
+
+
+def redact(text):
+    """Sustituye tokens, claves y datos personales de un texto por [REDACTED]"""
+    for pattern, replacement in REDACT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def parse_sample_rates(value):
+    """Convierte 'categoria=fraccion,...' en un diccionario"""
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    for item in (value or '').split(','):
+        name, _, rate = item.partition('=')
+        try:
+            rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar uno de cada N eventos DEBUG de cada categoría
+
+    Args:
+        rates (dict): Categoría -> fracción de eventos que se registran (0-1)
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._counters = {name: itertools.count() for name in rates}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        category = getattr(record, 'category', None)
+        rate = self.rates.get(category)
+        if rate is None or rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        # Determinista: 1 de cada round(1/rate), sin llamar a random en cada evento
+        return next(self._counters[category]) % round(1 / rate) == 0
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que no da formato al mensaje en el hilo que registra
+
+    El QueueHandler estándar formatea el mensaje antes de encolarlo; aquí se
+    encola el registro tal cual y el formato se hace en el hilo del listener.
+    Los argumentos se formatean más tarde, así que no deben modificarse después
+    de registrarlos. Si la cola está llena el registro se descarta.
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DeferredQueueHandler.dropped += 1
+
+
+class RedactingFormatter(logging.Formatter):
+    """Formato de texto con los datos sensibles ocultos"""
+
+    def __init__(self, fmt=None, redact_enabled=True):
+        super().__init__(fmt or '%(asctime)s %(levelname)s %(name)s: %(message)s')
+        self.redact_enabled = redact_enabled
+
+    def format(self, record):
+        text = super().format(record)
+        return redact(text) if self.redact_enabled else text
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea, con los datos sensibles ocultos"""
+
+    def __init__(self, redact_enabled=True):
+        super().__init__()
+        self.redact_enabled = redact_enabled
+
+    def format(self, record):
+        message = record.getMessage()
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': redact(message) if self.redact_enabled else message,
+        }
+        category = getattr(record, 'category', None)
+        if category:
+            entry['category'] = category
+        if record.exc_info:
+            exception = self.formatException(record.exc_info)
+            entry['exception'] = redact(exception) if self.redact_enabled else exception
+        return json_codec.dumps_str(entry, default=str)
+
+
+def configure_logging():
+    """
+    Configura el logging del proceso (solo la primera vez que se llama)
+
+    Sustituye los handlers del logger raíz por una cola atendida por un hilo
+    que formatea y escribe en stderr.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+        redact_enabled = os.getenv('LOG_REDACT', 'true').lower() not in ('0', 'false', 'no')
+        if os.getenv('LOG_FORMAT', 'json').lower() == 'text':
+            formatter = RedactingFormatter(redact_enabled=redact_enabled)
+        else:
+            formatter = JsonFormatter(redact_enabled=redact_enabled)
+
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(formatter)
+
+        log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        queue_handler = DeferredQueueHandler(log_queue)
+        # El muestreo se aplica antes de encolar: lo descartado no cuesta nada más
+        queue_handler.addFilter(SamplingFilter(parse_sample_rates(os.getenv('LOG_SAMPLE_RATES'))))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        # Vaciar la cola al terminar el proceso
+        atexit.register(_listener.stop)
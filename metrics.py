@@ -0,0 +1,253 @@
+"""
+Métricas de la aplicación en formato Prometheus
+Histogramas de latencia por ruta HTTP y por llamada a la API de Pi Network
+(método + plantilla de la URL, como /v2/payments/{id}/complete), contadores de
+códigos de estado, peticiones en curso y tiempos de lectura/escritura del
+almacenamiento de puntuaciones y del contador. Se exponen en /metrics.
+
+Cada observación es una búsqueda binaria en los límites del histograma y un par
+de sumas bajo un lock, así que se puede dejar activo en producción. Cada
+proceso (worker) tiene sus propias métricas.
+"""
+
+import os
+import time
+import threading
+import functools
+from bisect import bisect_left
+
+from flask import g, request, Response
+
+# Límites de los histogramas de latencia (segundos)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Segmentos fijos de las rutas de la API de Pi; el resto (IDs) se agrupa como {id}
+PI_API_PATH_SEGMENTS = {'v1', 'v2', 'me', 'wallet', 'payments', 'incomplete', 'approve', 'complete', 'cancel', 'transactions'}
+
+
+class _Metric:
+    """Base de las métricas: nombre, ayuda, etiquetas y valores por combinación de etiquetas"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _labels(self, label_values, extra=None):
+        pairs = list(zip(self.labelnames, label_values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(_Metric):
+    """Contador que solo aumenta"""
+
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _render_samples(self, items):
+        return [f'{self.name}{self._labels(labels)} {_number(value)}' for labels, value in items]
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja (por ejemplo, peticiones en curso)"""
+
+    kind = 'gauge'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def _render_samples(self, items):
+        return [f'{self.name}{self._labels(labels)} {_number(value)}' for labels, value in items]
+
+
+class Histogram(_Metric):
+    """Histograma de latencias con límites fijos"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # [conteo por intervalo (el último es +Inf), suma]
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _render_samples(self, items):
+        lines = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{self._labels(labels, ("le", _number(bound)))} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{self._labels(labels, ("le", "+Inf"))} {cumulative}')
+            lines.append(f'{self.name}_sum{self._labels(labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{self._labels(labels)} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+REGISTRY = []
+
+http_request_duration = Histogram(
+    'basicpi_http_request_duration_seconds', 'Latency of HTTP routes', ('method', 'route'))
+http_requests = Counter(
+    'basicpi_http_requests_total', 'Responses of HTTP routes by status code', ('method', 'route', 'status'))
+http_in_flight = Gauge(
+    'basicpi_http_requests_in_flight', 'Requests currently being handled')
+
+upstream_request_duration = Histogram(
+    'basicpi_pi_api_request_duration_seconds', 'Latency of Pi Network API calls', ('method', 'endpoint'))
+upstream_requests = Counter(
+    'basicpi_pi_api_requests_total', 'Pi Network API calls by status code (error = no response)',
+    ('method', 'endpoint', 'status'))
+upstream_in_flight = Gauge(
+    'basicpi_pi_api_requests_in_flight', 'Pi Network API calls currently waiting for a response')
+
+storage_duration = Histogram(
+    'basicpi_storage_operation_duration_seconds', 'Duration of score and payment counter storage operations',
+    ('store', 'operation'))
+upstream_timeout = Gauge(
+    'basicpi_pi_api_read_timeout_seconds', 'Current adaptive read timeout of Pi Network API calls',
+    ('method', 'endpoint'))
+circuit_state = Gauge(
+    'basicpi_pi_api_circuit_state', 'Pi Network API circuit breaker state (0 closed, 1 half-open, 2 open)',
+    ('method', 'endpoint'))
+circuit_opened = Counter(
+    'basicpi_pi_api_circuit_opened_total', 'Times a Pi Network API circuit breaker opened', ('method', 'endpoint'))
+circuit_rejected = Counter(
+    'basicpi_pi_api_circuit_rejected_total', 'Pi Network API calls failed fast by an open circuit',
+    ('method', 'endpoint'))
+
+outbox_transitions = Counter(
+    'basicpi_completion_outbox_transitions_total', 'Payment completion queue state changes', ('state',))
+
+
+def pi_api_endpoint(path):
+    """
+    Plantilla de una ruta de la API de Pi, para no crear una serie por cada pago
+
+    Args:
+        path (str): Ruta llamada, por ejemplo '/v2/payments/abc123/complete'
+
+    Returns:
+        str: La ruta con los IDs sustituidos, por ejemplo '/v2/payments/{id}/complete'
+    """
+    path = path.split('?', 1)[0]
+    return '/'.join(
+        segment if not segment or segment in PI_API_PATH_SEGMENTS else '{id}'
+        for segment in path.split('/')
+    )
+
+
+def observe_upstream(method, path, status, elapsed):
+    """Registra una llamada a la API de Pi (status None si no hubo respuesta)"""
+    endpoint = pi_api_endpoint(path)
+    upstream_request_duration.observe(elapsed, method, endpoint)
+    upstream_requests.inc(method, endpoint, status if status is not None else 'error')
+
+
+def timed_storage(store):
+    """
+    Decorador que mide un método de un almacén (la operación es el nombre del método)
+
+    Args:
+        store (str): Nombre del almacén ('scores' o 'counter')
+    """
+    def decorator(func):
+        operation = func.__name__.lstrip('_')
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                storage_duration.observe(time.perf_counter() - start, store, operation)
+        return wrapper
+    return decorator
+
+
+def observe_request(method, route, status, elapsed):
+    """Registra una petición atendida (la usan Flask y asgi.py)"""
+    http_request_duration.observe(elapsed, method, route)
+    http_requests.inc(method, route, status)
+
+
+def render():
+    """Todas las métricas en el formato de texto de Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Mide todas las rutas de la aplicación Flask y añade /metrics"""
+    if not METRICS_ENABLED:
+        return
+
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_start = time.perf_counter()
+        http_in_flight.inc()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            # Plantilla de la ruta (/api/scores, /static/<path:filename>), no la URL concreta
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            observe_request(request.method, route, response.status_code, time.perf_counter() - start)
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        http_in_flight.dec()
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
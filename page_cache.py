@@ -0,0 +1,113 @@
+"""
+Caché de páginas renderizadas
+index.html y simon.html no dependen de la petición, así que se renderizan una
+vez (al arrancar) y se guardan en memoria ya comprimidas. Cada petición solo
+elige la variante según Accept-Encoding o responde 304 si el cliente ya tiene
+la página. En modo debug se vuelve a renderizar cuando cambia la plantilla.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+
+from flask import request, render_template, Response
+
+from assets import compress_variants, negotiate_encoding
+from http_cache import cache_control_for
+
+logger = logging.getLogger(__name__)
+
+
+class PageCache:
+    """
+    Páginas renderizadas y precomprimidas, por nombre de plantilla
+
+    Args:
+        app (Flask): Aplicación cuyas plantillas se cachean
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._pages = {}  # plantilla -> {'mtime', 'etag', 'encodings': {codificación: bytes}}
+        self._lock = threading.Lock()
+
+    def _template_path(self, template_name):
+        return os.path.join(self.app.root_path, self.app.template_folder, template_name)
+
+    def _render(self, template_name):
+        """Renderiza y comprime una plantilla (necesita contexto de aplicación)"""
+        try:
+            mtime = os.stat(self._template_path(template_name)).st_mtime
+        except OSError:
+            mtime = None
+        body = render_template(template_name).encode('utf-8')
+        encodings = {'identity': body}
+        encodings.update(compress_variants(body, level=9))
+        page = {
+            'mtime': mtime,
+            'etag': hashlib.sha256(body).hexdigest()[:16],
+            'encodings': encodings,
+        }
+        with self._lock:
+            self._pages[template_name] = page
+        logger.debug('Rendered %s into page cache (%d bytes)', template_name, len(body))
+        return page
+
+    def _get(self, template_name):
+        page = self._pages.get(template_name)
+        if page is None:
+            return self._render(template_name)
+        if self.app.debug:
+            # Solo en desarrollo: comprobar si la plantilla cambió en disco
+            try:
+                mtime = os.stat(self._template_path(template_name)).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != page['mtime']:
+                logger.info('Template %s changed, re-rendering', template_name)
+                return self._render(template_name)
+        return page
+
+    def warm(self, *template_names):
+        """Renderiza las plantillas por adelantado (al arrancar)"""
+        with self.app.test_request_context('/'):
+            for template_name in template_names:
+                try:
+                    self._render(template_name)
+                except Exception as e:
+                    logger.error('Could not warm page cache for %s: %s', template_name, e)
+
+    def clear(self):
+        """Vacía la caché (las páginas se renderizan en la siguiente petición)"""
+        with self._lock:
+            self._pages.clear()
+
+    def response(self, template_name):
+        """
+        Respuesta para una página cacheada según If-None-Match y Accept-Encoding
+
+        Args:
+            template_name (str): Nombre de la plantilla
+
+        Returns:
+            flask.Response: Página completa o 304
+        """
+        page = self._get(template_name)
+        # Cada codificación tiene su propio ETag; cualquiera de ellos identifica la misma página
+        etags = {encoding: page['etag'] if encoding == 'identity' else f"{page['etag']}-{encoding}"
+                 for encoding in page['encodings']}
+        encoding = negotiate_encoding(request.accept_encodings, page['encodings'])
+
+        headers = {
+            'Cache-Control': cache_control_for(request.endpoint or 'default'),
+            'Vary': 'Accept-Encoding',
+        }
+        if any(request.if_none_match.contains(etag) for etag in etags.values()):
+            response = Response(status=304, headers=headers)
+        else:
+            if encoding != 'identity':
+                headers['Content-Encoding'] = encoding
+            response = Response(page['encodings'][encoding], mimetype='text/html', headers=headers)
+        response.set_etag(etags[encoding])
+        return response
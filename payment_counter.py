@@ -1,176 +1,336 @@
 """
 Sistema de conteo de pagos para Pi Network
 Mantiene un contador de los pagos recibidos y acumula fondos para transferencia posterior
+
+Cada pago se añade a un registro (ledger) de solo-añadir; los totales se
+mantienen en memoria y se guardan periódicamente en una instantánea
+(counter.json) escrita de forma atómica. Todas las escrituras se protegen con
+un bloqueo de archivo para que varios workers no pierdan incrementos.
 """
 
 import os
-import json
 import logging
+import threading
+from collections import deque
 from datetime import datetime
-from dotenv import load_dotenv
 
-# Configurar logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+import startup
+import json_codec
+from jsonl_log import AppendLog, atomic_write
+from metrics import timed_storage
+from storage import create_ledger
+from events import Broadcaster
+from payment_stats import PaymentRollups
+from log_config import configure_logging
 
-# Cargar variables de entorno
-load_dotenv()
+# Cargar variables de entorno (una sola vez por proceso)
+startup.load_env()
 
-# Ruta al archivo JSON que almacenará el contador
+# Configurar logging (ver log_config.py)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Ruta a los archivos del contador
+# (el directorio se crea al escribir el primer archivo)
 DATA_DIR = '/tmp'
-os.makedirs(DATA_DIR, exist_ok=True)  # ✅ ahora sí es válido en Vercel
+# Instantánea de los totales y del historial reciente
 COUNTER_FILE = os.path.join(DATA_DIR, 'counter.json')
+# Registro de todos los pagos y reinicios
+LEDGER_FILE = os.path.join(DATA_DIR, 'payments_ledger.jsonl')
+
+# Número de pagos recientes que se conservan en el historial
+HISTORY_LIMIT = 100
+# Número de registros del ledger entre instantáneas
+SNAPSHOT_EVERY = int(os.getenv('COUNTER_SNAPSHOT_EVERY', 50))
+
+
+class PaymentLedger:
+    """
+    Ledger de pagos con totales en memoria
+
+    Args:
+        counter_file (str): Ruta de la instantánea
+        ledger_file (str): Ruta del registro de pagos
+        snapshot_every (int): Registros entre instantáneas
+    """
+
+    def __init__(self, counter_file=COUNTER_FILE, ledger_file=LEDGER_FILE, snapshot_every=SNAPSHOT_EVERY):
+        self.counter_file = counter_file
+        self.log = AppendLog(ledger_file)
+        self.snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._since_snapshot = 0
+        self._reset_state()
+
+    def _reset_state(self):
+        self.accumulated_amount = 0.0
+        self.payments_count = 0
+        self.last_updated = datetime.now().isoformat()
+        # Los pagos más recientes, el último al final (buffer circular)
+        self.history = deque(maxlen=HISTORY_LIMIT)
+        # Estadísticas por hora, día, mes y usuario (no se ponen a cero con reset)
+        self.stats = PaymentRollups()
+
+    def _load_snapshot(self):
+        """Carga la última instantánea y sitúa la lectura del ledger tras ella"""
+        self._reset_state()
+        snapshot = None
+        if os.path.exists(self.counter_file):
+            try:
+                snapshot = json_codec.load_file(self.counter_file)
+            except ValueError as e:
+                logger.error("Error al cargar el contador: %s", e)
+
+        if snapshot:
+            self.accumulated_amount = float(snapshot.get('accumulated_amount', 0.0))
+            self.payments_count = int(snapshot.get('payments_count', 0))
+            self.last_updated = snapshot.get('last_updated', self.last_updated)
+            # La instantánea guarda el historial con los más recientes primero
+            self.history.extend(reversed(snapshot.get('payments_history', [])))
+            if 'stats' in snapshot:
+                self.stats = PaymentRollups.from_dict(snapshot['stats'])
+            else:
+                # Instantánea anterior a las estadísticas: partir del historial reciente
+                for payment in self.history:
+                    self.stats.add(payment)
+        self.log.seek(snapshot.get('ledger_offset', 0) if snapshot else 0)
+
+    def _apply(self, record):
+        if record.get('type') == 'reset':
+            # Mantenemos payments_count y el historial como registro histórico
+            self.accumulated_amount = 0.0
+        else:
+            self.accumulated_amount += float(record['amount'])
+            self.payments_count += 1
+            self.history.append({
+                'timestamp': record['timestamp'],
+                'amount': float(record['amount']),
+                'payment_id': record.get('payment_id'),
+                'user_id': record.get('user_id'),
+                'username': record.get('username')
+            })
+            self.stats.add(record)
+        self.last_updated = record['timestamp']
+
+    @timed_storage('counter')
+    def _sync(self):
+        """Aplica los registros que otros workers hayan añadido al ledger"""
+        if not self._loaded:
+            self._load_snapshot()
+            self._loaded = True
+        records, reset = self.log.read_new()
+        if reset:
+            # El ledger fue reemplazado: reconstruir desde la instantánea
+            self._load_snapshot()
+            records, _ = self.log.read_new()
+        for record in records:
+            self._apply(record)
+        self._since_snapshot += len(records)
+
+    @timed_storage('counter')
+    def _record(self, record):
+        """Añade un registro al ledger y lo aplica, todo bajo el bloqueo de archivo"""
+        with self._lock, self.log.lock():
+            self._sync()
+            self.log.append(record)
+            self._sync()
+            if self._since_snapshot >= self.snapshot_every:
+                self.snapshot()
+            return self.to_dict()
+
+    def add(self, amount, payment_id=None, user_id=None, username=None):
+        return self._record({
+            'type': 'payment',
+            'timestamp': datetime.now().isoformat(),
+            'amount': float(amount),
+            'payment_id': payment_id,
+            'user_id': user_id,
+            'username': username
+        })
+
+    @timed_storage('counter')
+    def reset(self, archive_file=None):
+        """
+        Pone a cero el acumulado
+
+        Args:
+            archive_file (str, opcional): Archivo donde guardar el estado anterior
+        """
+        with self._lock, self.log.lock():
+            if archive_file:
+                # El archivo se lee a mano: se guarda indentado
+                atomic_write(archive_file, json_codec.dumps(self.load(), pretty=True))
+            counter_data = self._record({'type': 'reset', 'timestamp': datetime.now().isoformat()})
+            self.snapshot()
+            return counter_data
+
+    @timed_storage('counter')
+    def snapshot(self):
+        """Guarda la instantánea de los totales de forma atómica"""
+        with self._lock, self.log.lock():
+            self._sync()
+            counter_data = self.to_dict()
+            counter_data['ledger_offset'] = self.log.position()
+            counter_data['stats'] = self.stats.to_dict()
+            save_counter(counter_data, self.counter_file)
+            self._since_snapshot = 0
+
+    def to_dict(self):
+        return {
+            'accumulated_amount': self.accumulated_amount,
+            'last_updated': self.last_updated,
+            'payments_count': self.payments_count,
+            # Los más recientes primero
+            'payments_history': list(reversed(self.history))
+        }
+
+    def load(self):
+        with self._lock:
+            self._sync()
+            return self.to_dict()
+
+    def version(self):
+        """Versión del contador: inodo y posición leída del ledger (igual en todos los workers)"""
+        with self._lock:
+            self._sync()
+            return f'{self.log.inode()}-{self.log.position()}'
+
+    def payment_stats(self, top=None):
+        """Estadísticas precalculadas de los pagos (ver payment_stats.py)"""
+        with self._lock:
+            self._sync()
+            return self.stats.stats(top)
+
+    def summary(self):
+        with self._lock:
+            self._sync()
+            return {
+                'accumulated_amount': self.accumulated_amount,
+                'payments_count': self.payments_count,
+                'last_updated': self.last_updated
+            }
+
+
+# Eventos de cambios del contador para los clientes SSE de este proceso
+counter_events = Broadcaster()
+
+# Backend según STORAGE_BACKEND (JSON por defecto o SQLite)
+ledger = create_ledger(PaymentLedger)
 
-def get_counter_summary():
-    if os.path.exists(COUNTER_FILE):
-        with open(COUNTER_FILE, 'r') as f:
-            return json.load(f)
-    return {'accumulated_amount': 0, 'payments_count': 0}
-
-def add_to_counter(amount, payment_id, user_id, username):
-    summary = get_counter_summary()
-    summary['accumulated_amount'] += amount
-    summary['payments_count'] += 1
-    with open(COUNTER_FILE, 'w') as f:
-        json.dump(summary, f)
-    return summary
-
-# Asegurarse de que el directorio de datos existe
-os.makedirs(DATA_DIR, exist_ok=True)
 
 def initialize_counter():
     """Inicializa el contador si no existe"""
     if not os.path.exists(COUNTER_FILE):
-        counter_data = {
-            'accumulated_amount': 0.0,
-            'last_updated': datetime.now().isoformat(),
-            'payments_count': 0,
-            'payments_history': []
-        }
-        save_counter(counter_data)
-        return counter_data
+        ledger.snapshot()
     return load_counter()
 
 def load_counter():
-    """Carga el contador desde el archivo JSON"""
+    """Carga el contador (instantánea más los pagos registrados después)"""
     try:
-        if os.path.exists(COUNTER_FILE):
-            with open(COUNTER_FILE, 'r') as f:
-                return json.load(f)
-        else:
-            return initialize_counter()
+        return ledger.load()
     except Exception as e:
-        logger.error(f"Error al cargar el contador: {str(e)}")
-        # Si hay un error, inicializar un nuevo contador
-        return initialize_counter()
+        logger.error("Error al cargar el contador: %s", e)
+        return None
 
-def save_counter(counter_data):
-    """Guarda el contador en el archivo JSON"""
+def save_counter(counter_data, counter_file=COUNTER_FILE):
+    """Guarda el contador en el archivo JSON de forma atómica"""
     try:
-        with open(COUNTER_FILE, 'w') as f:
-            json.dump(counter_data, f, indent=2)
+        atomic_write(counter_file, json_codec.dumps(counter_data))
     except Exception as e:
-        logger.error(f"Error al guardar el contador: {str(e)}")
+        logger.error("Error al guardar el contador: %s", e)
 
 def add_to_counter(amount, payment_id=None, user_id=None, username=None):
     """
     Añade una cantidad al contador
-    
+
     Args:
         amount (float): La cantidad a añadir al contador (en Pi)
         payment_id (str, opcional): El ID del pago
         user_id (str, opcional): El ID del usuario que realizó el pago
         username (str, opcional): El nombre de usuario que realizó el pago
-        
+
     Returns:
         dict: Los datos actualizados del contador
     """
     try:
-        # Cargar el contador actual
-        counter_data = load_counter()
-        
-        # Añadir la cantidad al acumulado
-        counter_data['accumulated_amount'] += float(amount)
-        counter_data['payments_count'] += 1
-        counter_data['last_updated'] = datetime.now().isoformat()
-        
-        # Añadir el registro del pago al historial
-        payment_record = {
-            'timestamp': datetime.now().isoformat(),
-            'amount': float(amount),
-            'payment_id': payment_id,
-            'user_id': user_id,
-            'username': username
-        }
-        
-        # Añadir al inicio para tener los más recientes primero
-        counter_data['payments_history'].insert(0, payment_record)
-        
-        # Limitar el historial a los últimos 100 pagos para que no crezca indefinidamente
-        counter_data['payments_history'] = counter_data['payments_history'][:100]
-        
-        # Guardar los datos actualizados
-        save_counter(counter_data)
-        
-        logger.info(f"Añadido {amount} Pi al contador. Total acumulado: {counter_data['accumulated_amount']} Pi")
+        counter_data = ledger.add(amount, payment_id=payment_id, user_id=user_id, username=username)
+        counter_events.publish('counter', _summary(counter_data))
+        logger.info("Añadido %s Pi al contador. Total acumulado: %s Pi", amount, counter_data['accumulated_amount'])
         return counter_data
     except Exception as e:
-        logger.error(f"Error al añadir al contador: {str(e)}")
+        logger.error("Error al añadir al contador: %s", e)
         return None
 
 def get_counter_summary():
     """
     Obtiene un resumen del contador
-    
+
     Returns:
         dict: Un resumen del contador
     """
     try:
-        counter_data = load_counter()
-        return {
-            'accumulated_amount': counter_data['accumulated_amount'],
-            'payments_count': counter_data['payments_count'],
-            'last_updated': counter_data['last_updated']
-        }
+        return ledger.summary()
     except Exception as e:
-        logger.error(f"Error al obtener el resumen del contador: {str(e)}")
+        logger.error("Error al obtener el resumen del contador: %s", e)
         return None
 
+def get_payment_stats(top=None):
+    """
+    Obtiene las estadísticas de los pagos: totales, agregados por hora, día y mes y los usuarios que más han pagado
+
+    Args:
+        top (int, opcional): Número de usuarios a devolver
+
+    Returns:
+        dict: Las estadísticas, o None si no se pudieron leer
+    """
+    try:
+        return ledger.payment_stats(top)
+    except Exception as e:
+        logger.error("Error al obtener las estadísticas de pagos: %s", e)
+        return None
+
+def get_counter_version():
+    """
+    Obtiene la versión actual del contador, para ETags
+
+    Returns:
+        str: Un identificador que cambia con cada pago o reinicio
+    """
+    return str(ledger.version())
+
+def _summary(counter_data):
+    return {
+        'accumulated_amount': counter_data['accumulated_amount'],
+        'payments_count': counter_data['payments_count'],
+        'last_updated': counter_data['last_updated']
+    }
+
 def reset_counter():
     """
     Reinicia el contador después de realizar una transferencia manual
     Guarda el historial anterior en un archivo separado
-    
+
     Returns:
         bool: True si se reinició correctamente, False en caso contrario
     """
     try:
-        # Cargar el contador actual
-        counter_data = load_counter()
-        
-        # Guardar el historial anterior
+        # Guardar el historial anterior y reiniciar el contador
         history_file = os.path.join(
-            DATA_DIR, 
+            DATA_DIR,
             f"payment_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         )
-        
-        with open(history_file, 'w') as f:
-            json.dump(counter_data, f, indent=2)
-        
-        # Reiniciar el contador
-        counter_data['accumulated_amount'] = 0.0
-        counter_data['last_updated'] = datetime.now().isoformat()
-        # Mantenemos el payments_count para tener un registro histórico
-        # Mantenemos el payments_history para referencia
-        
-        # Guardar el contador reiniciado
-        save_counter(counter_data)
-        
-        logger.info(f"Contador reiniciado. Historial guardado en {history_file}")
+        counter_data = ledger.reset(archive_file=history_file)
+        counter_events.publish('counter', _summary(counter_data))
+
+        logger.info("Contador reiniciado. Historial guardado en %s", history_file)
         return True
     except Exception as e:
-        logger.error(f"Error al reiniciar el contador: {str(e)}")
+        logger.error("Error al reiniciar el contador: %s", e)
         return False
 
-# Inicializar el contador al importar el módulo
-initialize_counter()
+# Inicializar el contador al importar el módulo; en modo lazy se carga en su primer uso
+if not startup.lazy_startup():
+    with startup.profiler.phase('initialize_counter'):
+        initialize_counter()
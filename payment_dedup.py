@@ -0,0 +1,97 @@
+"""
+Índice persistente de pagos ya completados
+Guarda la respuesta de cada /payment/complete correcto por payment_id para que
+los reintentos del cliente la reciban de nuevo sin volver a llamar a la API
+de Pi Network ni sumar dos veces el mismo pago al contador.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from jsonl_log import AppendLog
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_PAYMENTS_FILE = '/tmp/processed_payments.jsonl'
+
+
+class ProcessedPayments:
+    """
+    Índice payment_id -> respuesta almacenada
+
+    Args:
+        path (str): Ruta del registro JSONL
+        ttl (float, opcional): Segundos que se conserva cada entrada; None sin límite
+        max_entries (int, opcional): Número máximo de entradas; None sin límite
+    """
+
+    def __init__(self, path=PROCESSED_PAYMENTS_FILE, ttl=None, max_entries=None):
+        self.log = AppendLog(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # payment_id -> {'payment_id', 'timestamp', 'response'}
+        self._log_records = 0
+        self._lock = threading.RLock()
+        self._payment_locks = {}
+
+    def _sync(self):
+        records, reset = self.log.read_new()
+        if reset:
+            self._entries.clear()
+            self._log_records = 0
+        for record in records:
+            self._entries[record['payment_id']] = record
+            self._entries.move_to_end(record['payment_id'])
+        self._log_records += len(records)
+        self._evict()
+
+    def _evict(self):
+        if self.ttl is not None:
+            cutoff = time.time() - self.ttl
+            while self._entries and next(iter(self._entries.values()))['timestamp'] < cutoff:
+                self._entries.popitem(last=False)
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, payment_id):
+        """Devuelve la respuesta almacenada para un pago o None"""
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(payment_id)
+            return entry['response'] if entry else None
+
+    def record(self, payment_id, response):
+        """Guarda la respuesta de un pago completado"""
+        with self._lock, self.log.lock():
+            self.log.append({'payment_id': payment_id, 'timestamp': time.time(), 'response': response})
+            self._sync()
+            # Compactar cuando el registro tiene muchas entradas caducadas o repetidas
+            if self._log_records > 2 * len(self._entries) + 100:
+                self.log.rewrite(list(self._entries.values()))
+                self._log_records = len(self._entries)
+
+    @contextmanager
+    def exclusive(self):
+        """Sección crítica entre workers para comprobar y registrar un pago"""
+        with self._lock, self.log.lock():
+            yield
+
+    @contextmanager
+    def claim(self, payment_id):
+        """Serializa en este proceso las peticiones concurrentes del mismo pago"""
+        with self._lock:
+            entry = self._payment_locks.setdefault(payment_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._payment_locks[payment_id]
+
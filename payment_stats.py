@@ -0,0 +1,174 @@
+"""
+Estadísticas de pagos precalculadas para /api/payment-counter/stats
+Cada pago se suma a unos agregados (número, suma, mínimo y máximo) por hora,
+por día, por mes y totales, y al total de quien lo hizo, en el mismo momento en
+que se registra. Así las estadísticas se leen sin recorrer el ledger.
+
+Los agregados por hora y por día más antiguos que PAYMENT_STATS_HOURS y
+PAYMENT_STATS_DAYS se descartan (sus pagos siguen contados en el mes y en el
+total), y solo se conservan los PAYMENT_STATS_MAX_USERS usuarios que más han
+pagado.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import startup
+
+startup.load_env()
+
+# Periodos de los agregados y longitud del prefijo del timestamp ISO que los identifica
+GRANULARITIES = (('hour', 13), ('day', 10), ('month', 7), ('all', 0))
+# Horas y días que se conservan con detalle
+STATS_HOURS = int(os.getenv('PAYMENT_STATS_HOURS', 48))
+STATS_DAYS = int(os.getenv('PAYMENT_STATS_DAYS', 90))
+# Usuarios con mayor total que se devuelven y que se conservan (siempre más que los del top)
+STATS_TOP = max(0, int(os.getenv('PAYMENT_STATS_TOP', 10)))
+STATS_MAX_USERS = max(STATS_TOP + 1, int(os.getenv('PAYMENT_STATS_MAX_USERS', 1000)))
+
+
+def bucket_keys(timestamp):
+    """
+    Agregados a los que pertenece un pago
+
+    Args:
+        timestamp (str): Fecha ISO del pago (como la guarda el ledger)
+
+    Returns:
+        list: (granularidad, clave), como ('hour', '2024-05-01T13')
+    """
+    return [(granularity, timestamp[:length]) for granularity, length in GRANULARITIES]
+
+
+def retention_cutoffs(now):
+    """Claves a partir de las cuales se conservan los agregados por hora y por día"""
+    return {
+        'hour': (now - timedelta(hours=STATS_HOURS)).isoformat()[:13],
+        'day': (now - timedelta(days=STATS_DAYS)).isoformat()[:10],
+    }
+
+
+def payer_key(record):
+    """Identificador de quien hizo el pago (None si es anónimo)"""
+    return record.get('user_id') or record.get('username') or None
+
+
+def format_bucket(bucket, values):
+    """Agregado tal como se devuelve en /api/payment-counter/stats"""
+    count, total, minimum, maximum = values
+    return {
+        'bucket': bucket,
+        'count': count,
+        'total': total,
+        'min': minimum,
+        'max': maximum,
+        'average': total / count if count else 0.0,
+    }
+
+
+class PaymentRollups:
+    """
+    Agregados de pagos mantenidos en memoria (ledger JSON)
+
+    Args:
+        max_users (int): Usuarios cuyo total se conserva
+        top (int): Usuarios que devuelve top_payers
+    """
+
+    def __init__(self, max_users=STATS_MAX_USERS, top=STATS_TOP):
+        self.top = max(0, top)
+        # Los usuarios del top nunca se descartan: tiene que caber al menos uno más
+        self.max_users = max(max_users, self.top + 1)
+        # granularidad -> {clave: [número, suma, mínimo, máximo]}
+        self.buckets = {granularity: {} for granularity, _ in GRANULARITIES}
+        # usuario -> {'user_id', 'username', 'count', 'total'}
+        self.payers = {}
+        # Los usuarios con mayor total, ordenados de mayor a menor
+        self._top = []
+
+    def add(self, record):
+        """Suma un pago del ledger (dict con timestamp, amount, user_id y username)"""
+        amount = float(record['amount'])
+        for granularity, key in bucket_keys(record['timestamp']):
+            bucket = self.buckets[granularity].get(key)
+            if bucket is None:
+                self.buckets[granularity][key] = [1, amount, amount, amount]
+                if granularity in ('hour', 'day'):
+                    self._compact(granularity, record['timestamp'])
+            else:
+                bucket[0] += 1
+                bucket[1] += amount
+                bucket[2] = min(bucket[2], amount)
+                bucket[3] = max(bucket[3], amount)
+        self._add_payer(record, amount)
+
+    def _compact(self, granularity, timestamp):
+        """Descarta los agregados antiguos al empezar uno nuevo (una vez por hora o por día)"""
+        try:
+            cutoff = retention_cutoffs(datetime.fromisoformat(timestamp))[granularity]
+        except ValueError:
+            return
+        buckets = self.buckets[granularity]
+        for key in [key for key in buckets if key < cutoff]:
+            del buckets[key]
+
+    def _add_payer(self, record, amount):
+        key = payer_key(record)
+        if key is None:
+            return
+        payer = self.payers.get(key)
+        if payer is None:
+            if len(self.payers) >= self.max_users:
+                self._evict()
+            payer = self.payers[key] = {'user_id': record.get('user_id'), 'username': record.get('username'),
+                                        'count': 0, 'total': 0.0}
+        payer['count'] += 1
+        payer['total'] += amount
+        if record.get('username'):
+            payer['username'] = record['username']
+        # Los totales solo crecen: un usuario entra en el top únicamente con su propio pago
+        if self.top > 0 and (key in self._top or len(self._top) < self.top
+                             or payer['total'] > self.payers[self._top[-1]]['total']):
+            if key not in self._top:
+                self._top.append(key)
+            self._top.sort(key=lambda k: self.payers[k]['total'], reverse=True)
+            del self._top[self.top:]
+
+    def _evict(self):
+        """Descarta la décima parte de usuarios con menor total (nunca los del top)"""
+        top = set(self._top)
+        candidates = sorted((k for k in self.payers if k not in top), key=lambda k: self.payers[k]['total'])
+        for key in candidates[:max(1, self.max_users // 10)]:
+            del self.payers[key]
+
+    def stats(self, top=None):
+        """
+        Estadísticas de los pagos
+
+        Args:
+            top (int, opcional): Número de usuarios en top_payers (como máximo self.top)
+
+        Returns:
+            dict: Totales, agregados por hora, día y mes (del más antiguo al más reciente) y top_payers
+        """
+        totals = self.buckets['all'].get('', [0, 0.0, None, None])
+        result = format_bucket(None, totals)
+        del result['bucket']
+        for granularity, name in (('hour', 'hourly'), ('day', 'daily'), ('month', 'monthly')):
+            result[name] = [format_bucket(key, values) for key, values in sorted(self.buckets[granularity].items())]
+        result['top_payers'] = [dict(self.payers[key]) for key in self._top[:top]]
+        return result
+
+    def to_dict(self):
+        """Estado serializable (se guarda en la instantánea del contador)"""
+        return {'buckets': self.buckets, 'payers': self.payers}
+
+    @classmethod
+    def from_dict(cls, data, **options):
+        rollups = cls(**options)
+        for granularity, buckets in (data.get('buckets') or {}).items():
+            if granularity in rollups.buckets:
+                rollups.buckets[granularity] = {key: list(values) for key, values in buckets.items()}
+        rollups.payers = {key: dict(payer) for key, payer in (data.get('payers') or {}).items()}
+        rollups._top = sorted(rollups.payers, key=lambda k: rollups.payers[k]['total'], reverse=True)[:rollups.top]
+        return rollups
@@ -0,0 +1,260 @@
+"""
+Cliente compartido para la API de Pi Network
+Mantiene un pool de conexiones keep-alive hacia api.minepi.com para no repetir
+el handshake TCP+TLS en cada petición, con timeouts configurables, reintentos
+con backoff para las peticiones GET y medición del tiempo de cada llamada.
+Cada endpoint pasa por un circuit breaker con timeout adaptativo
+(circuit_breaker.py): con el circuito abierto la llamada falla al instante con
+CircuitOpenError.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import metrics
+from log_config import UPSTREAM
+from circuit_breaker import UPSTREAM_BREAKERS, BREAKER_ENABLED, CircuitOpenError, is_failure_status
+
+logger = logging.getLogger(__name__)
+
+PI_API_BASE_URL = 'https://api.minepi.com'
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return int(default)
+
+
+def _default_pool_size():
+    """Tamaño del pool: una conexión por hilo de trabajo del servidor"""
+    workers = _env_int('WEB_CONCURRENCY', 1) * _env_int('WORKER_THREADS', 8)
+    return _env_int('PI_API_POOL_SIZE', max(workers, 10))
+
+
+class PiApiClient:
+    """
+    Cliente HTTP para la API de Pi Network
+
+    Las peticiones de usuario se autentican con el access token del frontend
+    (Bearer) y las de servidor con la API key de la aplicación (Key).
+    """
+
+    def __init__(self, api_key=None, base_url=PI_API_BASE_URL, pool_size=None,
+                 connect_timeout=None, read_timeout=None, retries=None, backoff=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size or _default_pool_size()
+        self.connect_timeout = connect_timeout if connect_timeout is not None else _env_float('PI_API_CONNECT_TIMEOUT', 3.05)
+        self.read_timeout = read_timeout if read_timeout is not None else _env_float('PI_API_READ_TIMEOUT', 10)
+        self.retries = retries if retries is not None else _env_int('PI_API_RETRIES', 2)
+        self.backoff = backoff if backoff is not None else _env_float('PI_API_BACKOFF', 0.2)
+        self.breakers = UPSTREAM_BREAKERS
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Sesión HTTP, creada en la primera llamada (requests no se importa hasta entonces)"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        # Solo se reintentan los métodos idempotentes; los POST de pagos nunca
+        # se repiten automáticamente para no aprobar ni completar dos veces
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                              max_retries=retry, pool_block=False)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def url(self, path):
+        return f'{self.base_url}{path}'
+
+    def _headers(self, access_token):
+        if access_token:
+            return {'Authorization': f'Bearer {access_token}'}
+        return {'Authorization': f'Key {self.api_key}'}
+
+    def breaker(self, method, path):
+        """
+        Circuito del endpoint de una llamada
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto
+        """
+        breaker = self.breakers.get(method, metrics.pi_api_endpoint(path), self.read_timeout)
+        if BREAKER_ENABLED and not breaker.allow():
+            metrics.circuit_rejected.inc(method, breaker.endpoint)
+            raise CircuitOpenError(breaker)
+        return breaker
+
+    def request(self, method, path, access_token=None, json=None, timeout=None):
+        """
+        Realiza una petición a la API de Pi Network
+
+        Args:
+            method (str): Método HTTP
+            path (str): Ruta de la API (por ejemplo, '/v2/me')
+            access_token (str, opcional): Token del usuario; si no se indica
+                se usa la API key del servidor
+            json (dict, opcional): Cuerpo JSON de la petición
+            timeout (tuple, opcional): Timeouts (connect, read) para esta llamada;
+                por defecto el timeout adaptativo del endpoint
+
+        Returns:
+            requests.Response: La respuesta de la API
+
+        Raises:
+            CircuitOpenError: Si el circuito del endpoint está abierto
+        """
+        breaker = self.breaker(method, path)
+        start = time.perf_counter()
+        status = None
+        metrics.upstream_in_flight.inc()
+        try:
+            response = self.session.request(
+                method, self.url(path),
+                headers=self._headers(access_token),
+                json=json,
+                timeout=timeout or (self.connect_timeout, breaker.timeout.current)
+            )
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            breaker.record(not is_failure_status(status), elapsed)
+            metrics.upstream_in_flight.dec()
+            metrics.observe_upstream(method, path, status, elapsed)
+            logger.debug('Pi API %s %s -> %s in %.1f ms', method, path, status, elapsed * 1000, extra=UPSTREAM)
+
+    def get(self, path, access_token=None, **kwargs):
+        return self.request('GET', path, access_token=access_token, **kwargs)
+
+    def post(self, path, access_token=None, json=None, **kwargs):
+        return self.request('POST', path, access_token=access_token, json=json, **kwargs)
+
+
+class AsyncPiApiClient:
+    """
+    Cliente asíncrono para la API de Pi Network (modo ASGI)
+
+    Misma configuración que PiApiClient pero sobre httpx.AsyncClient, de modo que
+    miles de esperas a la API pueden estar en curso sin ocupar un hilo cada una.
+    """
+
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(self, api_key=None, base_url=PI_API_BASE_URL, pool_size=None,
+                 connect_timeout=None, read_timeout=None, retries=None, backoff=None):
+        # Solo el modo ASGI los necesita: no se importan al cargar app.py
+        import asyncio
+        import httpx
+
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size or _env_int('PI_API_ASYNC_POOL_SIZE', 200)
+        self.connect_timeout = connect_timeout if connect_timeout is not None else _env_float('PI_API_CONNECT_TIMEOUT', 3.05)
+        self.read_timeout = read_timeout if read_timeout is not None else _env_float('PI_API_READ_TIMEOUT', 10)
+        self.retries = retries if retries is not None else _env_int('PI_API_RETRIES', 2)
+        self.backoff = backoff if backoff is not None else _env_float('PI_API_BACKOFF', 0.2)
+        self.breakers = UPSTREAM_BREAKERS
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+        )
+        self._httpx = httpx
+        self._asyncio = asyncio
+        self._transport_errors = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError)
+
+    def url(self, path):
+        return f'{self.base_url}{path}'
+
+    def _headers(self, access_token):
+        if access_token:
+            return {'Authorization': f'Bearer {access_token}'}
+        return {'Authorization': f'Key {self.api_key}'}
+
+    def breaker(self, method, path):
+        """Igual que PiApiClient.breaker"""
+        breaker = self.breakers.get(method, metrics.pi_api_endpoint(path), self.read_timeout)
+        if BREAKER_ENABLED and not breaker.allow():
+            metrics.circuit_rejected.inc(method, breaker.endpoint)
+            raise CircuitOpenError(breaker)
+        return breaker
+
+    async def request(self, method, path, access_token=None, json=None, timeout=None):
+        """Igual que PiApiClient.request; devuelve un httpx.Response"""
+        breaker = self.breaker(method, path)
+        # Acepta los mismos timeouts (connect, read) que el cliente síncrono
+        connect_timeout, read_timeout = timeout or (self.connect_timeout, breaker.timeout.current)
+        # Solo se reintentan los GET, igual que en el cliente síncrono
+        attempts = self.retries + 1 if method in ('GET', 'HEAD') else 1
+        start = time.perf_counter()
+        status = None
+        metrics.upstream_in_flight.inc()
+        try:
+            for attempt in range(attempts):
+                last_attempt = attempt == attempts - 1
+                try:
+                    response = await self.client.request(
+                        method, self.url(path),
+                        headers=self._headers(access_token),
+                        json=json,
+                        timeout=self._httpx.Timeout(read_timeout, connect=connect_timeout)
+                    )
+                except self._transport_errors:
+                    if last_attempt:
+                        raise
+                else:
+                    status = response.status_code
+                    if last_attempt or status not in self.RETRY_STATUSES:
+                        return response
+                await self._asyncio.sleep(self.backoff * (2 ** attempt))
+        finally:
+            elapsed = time.perf_counter() - start
+            breaker.record(not is_failure_status(status), elapsed)
+            metrics.upstream_in_flight.dec()
+            metrics.observe_upstream(method, path, status, elapsed)
+            logger.debug('Pi API %s %s -> %s in %.1f ms', method, path, status, elapsed * 1000, extra=UPSTREAM)
+
+    async def get(self, path, access_token=None, **kwargs):
+        return await self.request('GET', path, access_token=access_token, **kwargs)
+
+    async def post(self, path, access_token=None, json=None, **kwargs):
+        return await self.request('POST', path, access_token=access_token, json=json, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
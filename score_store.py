@@ -0,0 +1,227 @@
+"""
+Almacenamiento de puntuaciones del juego Simon Dice
+Las puntuaciones se añaden a un registro JSONL (O(1) por puntuación) y se
+mantienen en un índice en memoria que se construye la primera vez que se usa
+y se actualiza leyendo solo lo que otros procesos hayan añadido después.
+"""
+
+import os
+import bisect
+import logging
+import threading
+
+import json_codec
+from jsonl_log import AppendLog
+from metrics import timed_storage
+
+logger = logging.getLogger(__name__)
+
+SCORES_FILE = '/tmp/scores.jsonl'
+# Formato anterior: una lista JSON reescrita completa en cada puntuación
+LEGACY_SCORES_FILE = '/tmp/scores.json'
+
+
+class ScoreStore:
+    """
+    Registro de puntuaciones con índice en memoria
+
+    Args:
+        path (str): Ruta del registro JSONL
+        legacy_path (str, opcional): Archivo JSON antiguo a importar si el registro no existe
+        compact_every (int): Número de puntuaciones añadidas entre compactaciones
+    """
+
+    def __init__(self, path=SCORES_FILE, legacy_path=LEGACY_SCORES_FILE, compact_every=1000):
+        self.log = AppendLog(path)
+        self.legacy_path = legacy_path
+        self.compact_every = compact_every
+        self._scores = []
+        # Clasificación ordenada por (-score, orden de llegada) y su índice por usuario
+        self._ranked = []
+        self._by_username = {}
+        self._loaded = False
+        self._appends_since_compact = 0
+        self._lock = threading.RLock()
+
+    def _migrate_legacy(self):
+        """Importa /tmp/scores.json al registro JSONL la primera vez"""
+        if self.log.exists() or not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            legacy_scores = json_codec.load_file(self.legacy_path)
+        except ValueError:
+            # Si el archivo está corrupto, empezar con un registro vacío
+            legacy_scores = []
+        if isinstance(legacy_scores, list):
+            self._index([s for s in legacy_scores if isinstance(s, dict)])
+            self.log.rewrite(self._scores)
+            logger.info('Imported %d scores from %s', len(self._scores), self.legacy_path)
+
+    @timed_storage('scores')
+    def _sync(self):
+        """Incorpora al índice los registros nuevos del archivo"""
+        if not self._loaded:
+            with self.log.lock():
+                self._migrate_legacy()
+            self._loaded = True
+        records, reset = self.log.read_new()
+        if reset:
+            self._scores, self._ranked, self._by_username = [], [], {}
+        self._index(records)
+
+    def _index(self, records):
+        """Añade registros a la lista y a la clasificación ordenada"""
+        if len(records) > 64:
+            # Carga inicial o recarga: más barato ordenar una vez que insertar uno a uno
+            start = len(self._scores)
+            self._scores.extend(records)
+            keys = [(-_score_value(r), start + i) for i, r in enumerate(records)]
+            self._ranked = sorted(self._ranked + keys)
+            for key in keys:
+                self._by_username.setdefault(self._scores[key[1]].get('username'), []).append(key)
+            for username_keys in self._by_username.values():
+                username_keys.sort()
+            return
+        for record in records:
+            key = (-_score_value(record), len(self._scores))
+            self._scores.append(record)
+            bisect.insort(self._ranked, key)
+            bisect.insort(self._by_username.setdefault(record.get('username'), []), key)
+
+    @timed_storage('scores')
+    def append(self, score_obj):
+        """
+        Añade una puntuación al registro
+
+        Args:
+            score_obj (dict): La puntuación a guardar
+
+        Returns:
+            dict: La puntuación guardada
+        """
+        with self._lock, self.log.lock():
+            self._sync()
+            self.log.append(score_obj)
+            self._sync()
+            self._appends_since_compact += 1
+            if self._appends_since_compact >= self.compact_every:
+                self.compact()
+        return score_obj
+
+    def all(self):
+        """Devuelve todas las puntuaciones en orden de llegada"""
+        with self._lock:
+            self._sync()
+            return list(self._scores)
+
+    def since(self, version):
+        """
+        Puntuaciones añadidas después de una versión
+
+        Args:
+            version (str): Versión devuelta antes por version() (None para todas)
+
+        Returns:
+            tuple: (puntuaciones nuevas en orden de llegada, versión actual, reiniciado).
+            reiniciado es True si el archivo se reescribió o se reemplazó desde
+            esa versión: entonces se devuelven todas las puntuaciones.
+        """
+        with self._lock:
+            self._sync()
+            inode, _, count = _parse_version(version)
+            if version is not None and (inode != self.log.inode() or count > len(self._scores)):
+                return list(self._scores), self._version(), True
+            return self._scores[count:], self._version(), False
+
+    @timed_storage('scores')
+    def ranked(self, username=None, offset=0, limit=None, cursor=None):
+        """
+        Devuelve una página de la clasificación (de mayor a menor puntuación)
+
+        Args:
+            username (str, opcional): Limitar a las puntuaciones de un usuario
+            offset (int): Posiciones a saltar desde el inicio o desde el cursor
+            limit (int, opcional): Número máximo de puntuaciones; None para todas
+            cursor (str, opcional): Cursor devuelto por una página anterior
+
+        Returns:
+            tuple: (puntuaciones, total, siguiente_cursor o None)
+        """
+        with self._lock:
+            self._sync()
+            keys = self._ranked if username is None else self._by_username.get(username, [])
+            start = offset
+            if cursor:
+                start += bisect.bisect_right(keys, decode_cursor(cursor))
+            end = len(keys) if limit is None else min(len(keys), start + limit)
+            page = keys[start:end]
+            next_cursor = encode_cursor(page[-1]) if page and end < len(keys) else None
+            return [self._scores[seq] for _, seq in page], len(keys), next_cursor
+
+    def top(self, k, username=None):
+        """Devuelve las k mejores puntuaciones en O(k)"""
+        return self.ranked(username=username, limit=k)[0]
+
+    @timed_storage('scores')
+    def compact(self):
+        """Reescribe el registro sin líneas corruptas ni incompletas"""
+        with self._lock, self.log.lock():
+            self._sync()
+            self.log.rewrite(self._scores)
+            self._appends_since_compact = 0
+            logger.info('Compacted score log: %d scores', len(self._scores))
+
+    def version(self):
+        """
+        Versión para el ETag y since(): inodo, posición leída y número de puntuaciones
+
+        Cambia con cada puntuación y también cuando el archivo se reescribe o se
+        reemplaza (compactación) aunque quede con las mismas puntuaciones.
+        """
+        with self._lock:
+            self._sync()
+            return self._version()
+
+    def _version(self):
+        return f'{self.log.inode()}-{self.log.position()}-{len(self._scores)}'
+
+    def count(self, username=None):
+        with self._lock:
+            self._sync()
+            if username is None:
+                return len(self._scores)
+            return len(self._by_username.get(username, []))
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self._scores)
+
+
+def _score_value(record):
+    try:
+        return float(record.get('score') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _parse_version(version):
+    """(inodo, posición, número de puntuaciones) de una versión de ScoreStore"""
+    try:
+        inode, position, count = version.split('-')
+        return int(inode), int(position), int(count)
+    except (AttributeError, ValueError):
+        return None, 0, 0
+
+
+def encode_cursor(key):
+    """Cursor opaco a partir de la clave de clasificación (-score, orden)"""
+    return f'{-key[0]!r}:{key[1]}'
+
+
+def decode_cursor(cursor):
+    try:
+        score, seq = cursor.rsplit(':', 1)
+        return (-float(score), int(seq))
+    except (AttributeError, ValueError):
+        raise ValueError(f'Invalid cursor: {cursor}')
@@ -0,0 +1,423 @@
+"""
+Backend SQLite (modo WAL) para las puntuaciones y el contador de pagos
+WAL permite lectores concurrentes mientras un worker escribe, y las
+actualizaciones del contador se hacen en una única transacción.
+Las consultas frecuentes son constantes SQL que el caché de sentencias de
+sqlite3 mantiene preparadas en cada conexión.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+import json_codec
+from jsonl_log import atomic_write
+from metrics import timed_storage
+from payment_stats import bucket_keys, payer_key, retention_cutoffs, format_bucket, STATS_TOP, STATS_MAX_USERS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT,
+    score REAL NOT NULL,
+    level INTEGER,
+    timestamp INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scores_rank ON scores (score DESC, id);
+CREATE INDEX IF NOT EXISTS idx_scores_username ON scores (username, score DESC, id);
+CREATE INDEX IF NOT EXISTS idx_scores_timestamp ON scores (timestamp);
+
+CREATE TABLE IF NOT EXISTS counter (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    accumulated_amount REAL NOT NULL,
+    payments_count INTEGER NOT NULL,
+    last_updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    amount REAL NOT NULL,
+    payment_id TEXT,
+    user_id TEXT,
+    username TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_payments_timestamp ON payments (timestamp);
+CREATE TABLE IF NOT EXISTS payment_rollups (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min_amount REAL NOT NULL,
+    max_amount REAL NOT NULL,
+    PRIMARY KEY (granularity, bucket)
+);
+CREATE TABLE IF NOT EXISTS payment_payers (
+    payer TEXT PRIMARY KEY,
+    user_id TEXT,
+    username TEXT,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_payment_payers_total ON payment_payers (total DESC);
+"""
+
+INSERT_SCORE = 'INSERT INTO scores (username, score, level, timestamp, data) VALUES (?, ?, ?, ?, ?)'
+COUNT_SCORES = 'SELECT COUNT(*) FROM scores'
+COUNT_USER_SCORES = 'SELECT COUNT(*) FROM scores WHERE username = ?'
+RANKED_SCORES = 'SELECT id, score, data FROM scores ORDER BY score DESC, id LIMIT ? OFFSET ?'
+RANKED_SCORES_AFTER = (
+    'SELECT id, score, data FROM scores WHERE score < ? OR (score = ? AND id > ?) '
+    'ORDER BY score DESC, id LIMIT ? OFFSET ?'
+)
+RANKED_USER_SCORES = 'SELECT id, score, data FROM scores WHERE username = ? ORDER BY score DESC, id LIMIT ? OFFSET ?'
+RANKED_USER_SCORES_AFTER = (
+    'SELECT id, score, data FROM scores WHERE username = ? AND (score < ? OR (score = ? AND id > ?)) '
+    'ORDER BY score DESC, id LIMIT ? OFFSET ?'
+)
+ALL_SCORES = 'SELECT data FROM scores ORDER BY id'
+SCORES_SINCE = 'SELECT id, data FROM scores WHERE id > ? ORDER BY id'
+SCORES_VERSION = 'SELECT COALESCE(MAX(id), 0) FROM scores'
+
+SELECT_COUNTER = 'SELECT accumulated_amount, payments_count, last_updated FROM counter WHERE id = 1'
+INSERT_PAYMENT = 'INSERT INTO payments (timestamp, amount, payment_id, user_id, username) VALUES (?, ?, ?, ?, ?)'
+ADD_TO_COUNTER = (
+    'UPDATE counter SET accumulated_amount = accumulated_amount + ?, '
+    'payments_count = payments_count + 1, last_updated = ? WHERE id = 1'
+)
+RESET_COUNTER = 'UPDATE counter SET accumulated_amount = 0, last_updated = ? WHERE id = 1'
+RECENT_PAYMENTS = (
+    'SELECT timestamp, amount, payment_id, user_id, username FROM payments ORDER BY id DESC LIMIT ?'
+)
+ADD_TO_ROLLUP = (
+    'INSERT INTO payment_rollups (granularity, bucket, count, total, min_amount, max_amount) '
+    'VALUES (?, ?, 1, ?, ?, ?) ON CONFLICT (granularity, bucket) DO UPDATE SET '
+    'count = count + 1, total = total + excluded.total, '
+    'min_amount = MIN(min_amount, excluded.min_amount), max_amount = MAX(max_amount, excluded.max_amount)'
+)
+ADD_TO_PAYER = (
+    'INSERT INTO payment_payers (payer, user_id, username, count, total) VALUES (?, ?, ?, 1, ?) '
+    'ON CONFLICT (payer) DO UPDATE SET count = count + 1, total = total + excluded.total, '
+    'username = COALESCE(excluded.username, username)'
+)
+COUNT_PAYERS = 'SELECT COUNT(*) FROM payment_payers'
+EVICT_PAYERS = (
+    'DELETE FROM payment_payers WHERE payer NOT IN '
+    '(SELECT payer FROM payment_payers ORDER BY total DESC LIMIT ?)'
+)
+COMPACT_ROLLUPS = 'DELETE FROM payment_rollups WHERE granularity = ? AND bucket < ?'
+COUNT_ROLLUPS = 'SELECT COUNT(*) FROM payment_rollups'
+SELECT_ROLLUPS = 'SELECT granularity, bucket, count, total, min_amount, max_amount FROM payment_rollups ORDER BY bucket'
+TOP_PAYERS = 'SELECT user_id, username, count, total FROM payment_payers ORDER BY total DESC LIMIT ?'
+
+# Número de pagos recientes que se devuelven como historial
+HISTORY_LIMIT = 100
+
+
+class SqliteDatabase:
+    """Una conexión por hilo a la base de datos en modo WAL"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=128)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(SCHEMA)
+                    self._initialized = True
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Transacción de escritura (BEGIN IMMEDIATE bloquea a otros escritores)"""
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+
+class SqliteScoreStore:
+    """
+    Almacén de puntuaciones en SQLite con la misma interfaz que ScoreStore
+
+    Args:
+        path (str): Ruta de la base de datos
+        seed (callable, opcional): Devuelve las puntuaciones a importar si la tabla está vacía
+    """
+
+    def __init__(self, path, seed=None):
+        self.db = SqliteDatabase(path)
+        self.seed = seed
+        self._seeded = False
+        self._seed_lock = threading.Lock()
+
+    def _conn(self):
+        conn = self.db.connection()
+        if not self._seeded:
+            # Solo se marca como importado tras el COMMIT: si falla, la siguiente llamada lo reintenta
+            with self._seed_lock:
+                if not self._seeded:
+                    if self.seed is not None:
+                        with self.db.transaction() as tx:
+                            if tx.execute(COUNT_SCORES).fetchone()[0] == 0:
+                                scores = self.seed()
+                                tx.executemany(INSERT_SCORE, [_score_row(s) for s in scores])
+                                if scores:
+                                    logger.info('Imported %d scores into SQLite', len(scores))
+                    self._seeded = True
+        return conn
+
+    @timed_storage('scores')
+    def append(self, score_obj):
+        self._conn()
+        with self.db.transaction() as tx:
+            tx.execute(INSERT_SCORE, _score_row(score_obj))
+        return score_obj
+
+    @timed_storage('scores')
+    def all(self):
+        return [json_codec.loads(row[0]) for row in self._conn().execute(ALL_SCORES)]
+
+    @timed_storage('scores')
+    def since(self, version):
+        """
+        Puntuaciones con id mayor que version (None para todas)
+
+        Returns:
+            tuple: (puntuaciones nuevas, versión actual (el último id), reiniciado),
+            como ScoreStore.since. Los ids no se reutilizan: solo se reinicia si la
+            base de datos se reemplazó por una con menos puntuaciones.
+        """
+        conn = self._conn()
+        reset = version is not None and version > conn.execute(SCORES_VERSION).fetchone()[0]
+        after = 0 if version is None or reset else version
+        rows = conn.execute(SCORES_SINCE, (after,)).fetchall()
+        return [json_codec.loads(row[1]) for row in rows], rows[-1][0] if rows else after, reset
+
+    @timed_storage('scores')
+    def ranked(self, username=None, offset=0, limit=None, cursor=None):
+        conn = self._conn()
+        total = self.count(username)
+        # Se pide una fila más para saber si hay página siguiente
+        fetch = -1 if limit is None else limit + 1
+        if cursor:
+            score, last_id = decode_cursor(cursor)
+            if username is None:
+                rows = conn.execute(RANKED_SCORES_AFTER, (score, score, last_id, fetch, offset)).fetchall()
+            else:
+                rows = conn.execute(RANKED_USER_SCORES_AFTER, (username, score, score, last_id, fetch, offset)).fetchall()
+        elif username is None:
+            rows = conn.execute(RANKED_SCORES, (fetch, offset)).fetchall()
+        else:
+            rows = conn.execute(RANKED_USER_SCORES, (username, fetch, offset)).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if rows else None
+        return [json_codec.loads(row[2]) for row in rows], total, next_cursor
+
+    def top(self, k, username=None):
+        return self.ranked(username=username, limit=k)[0]
+
+    @timed_storage('scores')
+    def version(self):
+        """Número de generación: el último id insertado"""
+        return self._conn().execute(SCORES_VERSION).fetchone()[0]
+
+    def count(self, username=None):
+        conn = self._conn()
+        if username is None:
+            return conn.execute(COUNT_SCORES).fetchone()[0]
+        return conn.execute(COUNT_USER_SCORES, (username,)).fetchone()[0]
+
+    @timed_storage('scores')
+    def compact(self):
+        """SQLite gestiona su propio espacio; solo se hace checkpoint del WAL"""
+        self._conn().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def __len__(self):
+        return self.count()
+
+
+class SqlitePaymentLedger:
+    """
+    Contador de pagos en SQLite con la misma interfaz que PaymentLedger
+
+    Args:
+        path (str): Ruta de la base de datos
+        seed (callable, opcional): Devuelve el estado del contador a importar la primera vez
+    """
+
+    def __init__(self, path, seed=None):
+        self.db = SqliteDatabase(path)
+        self.seed = seed
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _conn(self):
+        conn = self.db.connection()
+        if not self._ready:
+            # Igual que SqliteScoreStore: listo solo cuando la importación se ha confirmado
+            with self._ready_lock:
+                if not self._ready:
+                    self._prepare()
+                    self._ready = True
+        return conn
+
+    def _prepare(self):
+        """Crea la fila del contador (importando el estado de seed) y las estadísticas si faltan"""
+        with self.db.transaction() as tx:
+            if tx.execute(SELECT_COUNTER).fetchone() is None:
+                state = self.seed() if self.seed is not None else None
+                state = state or {'accumulated_amount': 0.0, 'payments_count': 0,
+                                  'last_updated': datetime.now().isoformat(), 'payments_history': []}
+                tx.execute(
+                    'INSERT INTO counter (id, accumulated_amount, payments_count, last_updated) VALUES (1, ?, ?, ?)',
+                    (state['accumulated_amount'], state['payments_count'], state['last_updated'])
+                )
+                tx.executemany(INSERT_PAYMENT, [
+                    (p['timestamp'], p['amount'], p.get('payment_id'), p.get('user_id'), p.get('username'))
+                    for p in reversed(state.get('payments_history', []))
+                ])
+            if tx.execute(COUNT_ROLLUPS).fetchone()[0] == 0:
+                # Base de datos anterior a las estadísticas: calcularlas una vez con los pagos guardados
+                for row in tx.execute('SELECT timestamp, amount, user_id, username FROM payments ORDER BY id').fetchall():
+                    self._add_stats(tx, {'timestamp': row[0], 'amount': row[1], 'user_id': row[2], 'username': row[3]})
+
+    def _add_stats(self, tx, payment):
+        """Suma un pago a las estadísticas (en la misma transacción que el pago)"""
+        amount = payment['amount']
+        for granularity, bucket in bucket_keys(payment['timestamp']):
+            tx.execute(ADD_TO_ROLLUP, (granularity, bucket, amount, amount, amount))
+        payer = payer_key(payment)
+        if payer is not None:
+            tx.execute(ADD_TO_PAYER, (payer, payment.get('user_id'), payment.get('username'), amount))
+            # Igual que PaymentRollups: solo STATS_MAX_USERS usuarios, descartando la décima parte con menor total
+            if tx.execute(COUNT_PAYERS).fetchone()[0] > STATS_MAX_USERS:
+                tx.execute(EVICT_PAYERS, (STATS_MAX_USERS - max(1, STATS_MAX_USERS // 10),))
+
+    @timed_storage('counter')
+    def add(self, amount, payment_id=None, user_id=None, username=None):
+        self._conn()
+        now = datetime.now().isoformat()
+        with self.db.transaction() as tx:
+            tx.execute(INSERT_PAYMENT, (now, float(amount), payment_id, user_id, username))
+            tx.execute(ADD_TO_COUNTER, (float(amount), now))
+            self._add_stats(tx, {'timestamp': now, 'amount': float(amount), 'user_id': user_id, 'username': username})
+            for granularity, cutoff in retention_cutoffs(datetime.fromisoformat(now)).items():
+                tx.execute(COMPACT_ROLLUPS, (granularity, cutoff))
+            return self._state(tx)
+
+    @timed_storage('counter')
+    def reset(self, archive_file=None):
+        self._conn()
+        with self.db.transaction() as tx:
+            if archive_file:
+                atomic_write(archive_file, json_codec.dumps(self._state(tx), pretty=True))
+            tx.execute(RESET_COUNTER, (datetime.now().isoformat(),))
+            return self._state(tx)
+
+    @timed_storage('counter')
+    def snapshot(self):
+        """Las escrituras ya son duraderas; solo se asegura que la tabla exista"""
+        self._conn()
+
+    def _state(self, conn):
+        accumulated_amount, payments_count, last_updated = conn.execute(SELECT_COUNTER).fetchone()
+        history = [
+            {'timestamp': row[0], 'amount': row[1], 'payment_id': row[2], 'user_id': row[3], 'username': row[4]}
+            for row in conn.execute(RECENT_PAYMENTS, (HISTORY_LIMIT,))
+        ]
+        return {
+            'accumulated_amount': accumulated_amount,
+            'last_updated': last_updated,
+            'payments_count': payments_count,
+            'payments_history': history
+        }
+
+    @timed_storage('counter')
+    def load(self):
+        return self._state(self._conn())
+
+    @timed_storage('counter')
+    def version(self):
+        """Versión del contador: cambia con cada pago o reinicio"""
+        _, payments_count, last_updated = self._conn().execute(SELECT_COUNTER).fetchone()
+        return f'{payments_count}-{last_updated}'
+
+    @timed_storage('counter')
+    def payment_stats(self, top=None):
+        """Estadísticas precalculadas de los pagos, con el mismo formato que PaymentRollups.stats"""
+        conn = self._conn()
+        buckets = {}
+        for granularity, bucket, *values in conn.execute(SELECT_ROLLUPS):
+            buckets.setdefault(granularity, []).append(format_bucket(bucket, values))
+        totals = buckets.get('all') or [format_bucket(None, (0, 0.0, None, None))]
+        result = dict(totals[0])
+        del result['bucket']
+        for granularity, name in (('hour', 'hourly'), ('day', 'daily'), ('month', 'monthly')):
+            result[name] = buckets.get(granularity, [])
+        limit = STATS_TOP if top is None else min(top, STATS_TOP)
+        result['top_payers'] = [
+            {'user_id': row[0], 'username': row[1], 'count': row[2], 'total': row[3]}
+            for row in conn.execute(TOP_PAYERS, (limit,))
+        ]
+        return result
+
+    @timed_storage('counter')
+    def summary(self):
+        accumulated_amount, payments_count, last_updated = self._conn().execute(SELECT_COUNTER).fetchone()
+        return {
+            'accumulated_amount': accumulated_amount,
+            'payments_count': payments_count,
+            'last_updated': last_updated
+        }
+
+
+def _score_value(score_obj):
+    try:
+        return float(score_obj.get('score') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _score_row(score_obj):
+    return (
+        score_obj.get('username'),
+        _score_value(score_obj),
+        score_obj.get('level'),
+        score_obj.get('timestamp'),
+        json_codec.dumps_str(score_obj)
+    )
+
+
+def encode_cursor(score, row_id):
+    return f'{score!r}:{row_id}'
+
+
+def decode_cursor(cursor):
+    try:
+        score, row_id = cursor.rsplit(':', 1)
+        return float(score), int(row_id)
+    except (AttributeError, ValueError):
+        raise ValueError(f'Invalid cursor: {cursor}')
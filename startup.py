@@ -0,0 +1,190 @@
+"""
+Arranque de la aplicación: modo de inicio y perfil de tiempos de importación
+En modo perezoso (STARTUP_MODE=lazy, por defecto en Vercel) app.py no hace
+trabajo que la primera petición quizá no necesite: no renderiza las páginas por
+adelantado, no inicializa el contador en disco, no registra extensiones que las
+plantillas no usan y el cliente de la API de Pi importa requests en su primera
+llamada. Así un arranque en frío responde antes.
+
+Con STARTUP_PROFILE=true (variable del entorno del proceso, antes de leer .env)
+se mide cuánto tarda en importarse cada módulo y cada fase del arranque, y se
+registra un resumen al terminar de cargar app.py. También se puede ejecutar:
+    python startup.py [módulo]
+"""
+
+import os
+import sys
+import time
+import logging
+import builtins
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() not in ('0', 'false', 'no', '')
+
+
+def load_env():
+    """Carga el archivo .env una sola vez por proceso"""
+    global _env_loaded
+    with _env_lock:
+        if _env_loaded:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def lazy_startup():
+    """True si la aplicación debe aplazar el trabajo de arranque hasta que se use"""
+    load_env()
+    # Vercel define VERCEL=1 en sus funciones
+    default = 'lazy' if os.getenv('VERCEL') else 'eager'
+    return os.getenv('STARTUP_MODE', default).lower() == 'lazy'
+
+
+class StartupProfiler:
+    """
+    Tiempos de importación por módulo y de las fases del arranque
+
+    Sustituye builtins.__import__ mientras está activo: cada módulo que se
+    importa por primera vez se mide con su tiempo total (incluidos los módulos
+    que importa) y propio (sin ellos), como python -X importtime.
+    """
+
+    def __init__(self):
+        self.modules = {}  # módulo -> [total, propio] en segundos
+        self.phases = []  # (nombre, segundos)
+        self._original_import = None
+        self._stack = []
+        self._started = None
+        self._elapsed = None
+        self._lock = threading.RLock()
+
+    @property
+    def active(self):
+        return self._original_import is not None
+
+    def start(self):
+        """Empieza a medir (no hace nada si ya está activo)"""
+        with self._lock:
+            if self.active:
+                return
+            self._started = time.perf_counter()
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if level == 0 and name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        if level > 0:
+            package = (globals or {}).get('__package__') or ''
+            base = package.rsplit('.', level - 1)[0] if level > 1 else package
+            module_name = f'{base}.{name}' if name else base
+        else:
+            module_name = name
+        if module_name in sys.modules or threading.current_thread() is not threading.main_thread():
+            return original(name, globals, locals, fromlist, level)
+
+        entry = [0.0, 0.0]
+        self._stack.append(entry)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            entry[0] += elapsed
+            entry[1] += elapsed
+            if self._stack:
+                # El tiempo de este módulo no es tiempo propio de quien lo importó
+                self._stack[-1][1] -= elapsed
+            if module_name in sys.modules and module_name not in self.modules:
+                self.modules[module_name] = entry
+
+    @contextmanager
+    def phase(self, name):
+        """Mide una fase del arranque (renderizado, inicialización...)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.active:
+                self.phases.append((name, time.perf_counter() - start))
+
+    def stop(self):
+        """Deja de medir y devuelve el informe"""
+        with self._lock:
+            if not self.active:
+                return None
+            builtins.__import__ = self._original_import
+            self._original_import = None
+            self._elapsed = time.perf_counter() - self._started
+            return self.report()
+
+    def report(self, top=15):
+        """
+        Resumen de los tiempos medidos
+
+        Returns:
+            dict: total_ms, los módulos más lentos (total y propio en ms) y las fases
+        """
+        if self._elapsed is not None:
+            total = self._elapsed
+        else:
+            total = time.perf_counter() - self._started if self._started is not None else 0.0
+        slowest = sorted(self.modules.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return {
+            'total_ms': round(total * 1000, 1),
+            'modules': [
+                {'module': name, 'total_ms': round(cumulative * 1000, 1), 'self_ms': round(own * 1000, 1)}
+                for name, (cumulative, own) in slowest
+            ],
+            'phases': [{'phase': name, 'ms': round(elapsed * 1000, 1)} for name, elapsed in self.phases],
+        }
+
+
+profiler = StartupProfiler()
+if _env_flag('STARTUP_PROFILE', 'false'):
+    profiler.start()
+
+
+def finish():
+    """Termina el perfil de arranque (si está activo) y registra el resumen"""
+    report = profiler.stop()
+    if report is not None:
+        logger.info('Startup took %s ms; slowest imports: %s; phases: %s',
+                    report['total_ms'],
+                    ', '.join(f"{m['module']} {m['self_ms']}/{m['total_ms']} ms" for m in report['modules']),
+                    ', '.join(f"{p['phase']} {p['ms']} ms" for p in report['phases']) or 'none')
+    return report
+
+
+def format_report(report):
+    """Tabla de texto con el informe de StartupProfiler.report()"""
+    lines = [f"Startup: {report['total_ms']} ms", '', f"{'module':<40} {'self ms':>10} {'total ms':>10}"]
+    for module in report['modules']:
+        lines.append(f"{module['module']:<40} {module['self_ms']:>10} {module['total_ms']:>10}")
+    if report['phases']:
+        lines.extend(['', f"{'phase':<40} {'ms':>10}"])
+        for phase in report['phases']:
+            lines.append(f"{phase['phase']:<40} {phase['ms']:>10}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    # python startup.py [módulo]: importa el módulo (app por defecto) y muestra los tiempos.
+    # Se usa el perfil del módulo startup (no el de __main__), que es el que ve app.py
+    import startup
+    target = sys.argv[1] if len(sys.argv) > 1 else 'app'
+    startup.profiler.start()
+    __import__(target)
+    startup.profiler.stop()
+    print(format_report(startup.profiler.report(top=25)))
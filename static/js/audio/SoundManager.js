@@ -10,7 +10,7 @@ class SoundManager {
         this.audioContext = null;
         this.sounds = {};
         this.initialized = false;
-        this.baseSoundPath = '/static/sounds/green.wav';
+        this.baseSoundPath = window.SOUND_BASE_PATH || '/static/sounds/green.wav';
         this.soundBuffer = null;
         
         // Define pitch ratios for different buttons/sounds
@@ -15,20 +15,65 @@ document.addEventListener('DOMContentLoaded', function() {
     const PaymentCounter = {
         // Estado del contador
         counterData: null,
+        eventSource: null,
+        pollTimer: null,
         
         // Inicializar el contador
         init: function() {
-            // Cargar datos del contador
-            this.fetchCounterData();
-            
-            // Actualizar cada 60 segundos
-            setInterval(() => {
+            // Recibir los cambios del servidor en cuanto ocurren (SSE)
+            if (window.EventSource) {
+                this.connectStream();
+            } else {
+                // Navegadores sin SSE: cargar y consultar periódicamente
                 this.fetchCounterData();
-            }, 60000);
+                this.startPolling();
+            }
             
             return this;
         },
         
+        // Conectar al stream de cambios del contador
+        connectStream: function() {
+            this.eventSource = new EventSource('/api/payment-counter/stream');
+            
+            this.eventSource.addEventListener('counter', event => {
+                this.counterData = JSON.parse(event.data);
+                this.updateUI();
+            });
+            
+            this.eventSource.onopen = () => {
+                // El stream vuelve a funcionar: ya no hace falta consultar
+                this.stopPolling();
+            };
+            
+            this.eventSource.onerror = () => {
+                // El navegador reintenta solo; mientras tanto, consultar como respaldo.
+                // Si el servidor no sirve el stream (204) no hay reintento: cargar ya
+                console.warn('Stream del contador no disponible, usando consultas periódicas');
+                if (!this.pollTimer) {
+                    this.fetchCounterData();
+                }
+                this.startPolling();
+            };
+        },
+        
+        // Consultar cada 60 segundos (solo como respaldo del stream)
+        startPolling: function() {
+            if (this.pollTimer) {
+                return;
+            }
+            this.pollTimer = setInterval(() => {
+                this.fetchCounterData();
+            }, 60000);
+        },
+        
+        stopPolling: function() {
+            if (this.pollTimer) {
+                clearInterval(this.pollTimer);
+                this.pollTimer = null;
+            }
+        },
+        
         // Obtener datos del contador desde el backend
         fetchCounterData: function() {
             fetch('/api/payment-counter')
@@ -46,6 +91,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
         },
         
+        // Mostrar datos del contador obtenidos en otra petición (/api/bootstrap)
+        setCounterData: function(counterData) {
+            this.counterData = counterData;
+            this.updateUI();
+        },
+        
         // Actualizar la interfaz con los datos del contador
         updateUI: function() {
             if (!this.counterData) {
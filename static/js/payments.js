@@ -243,10 +243,11 @@ const PaymentSystem = {
             },
             body: JSON.stringify({ 
                 paymentId: paymentId,
-                txid: txid
+                txid: txid,
+                accessToken: currentAccessToken
             })
         })
-        .then(response => response.json())
+        .then(response => this.readCompletion(response))
         .then(data => {
             console.log('Respuesta de completado de pago pendiente:', data);
             // Marcar como completado
@@ -301,6 +302,60 @@ const PaymentSystem = {
         });
     },
     
+    // Leer la respuesta de /payment/complete. En modo asíncrono el servidor
+    // responde 202 y completa el pago en segundo plano: esperar al resultado
+    readCompletion: function(response) {
+        return response.json().then(data => {
+            if (response.status !== 202) {
+                return data;
+            }
+            if (paymentStatus) paymentStatus.textContent = 'Pago en cola, completando...';
+            return this.waitForCompletion(data.paymentId);
+        });
+    },
+    
+    // Esperar a que un pago en cola termine (SSE, o consultas si no está disponible)
+    waitForCompletion: function(paymentId) {
+        const url = '/payment/status/' + encodeURIComponent(paymentId);
+        const isFinished = status => !status || status.state === 'completed' || status.state === 'failed';
+        const toResult = status => (status && status.state === 'completed')
+            ? (status.result || { status: 'success' })
+            : { error: (status && status.error) || 'Payment completion failed' };
+        
+        return new Promise(resolve => {
+            const poll = () => {
+                fetch(url)
+                    .then(response => response.status === 404 ? null : response.json())
+                    .then(status => {
+                        if (isFinished(status)) {
+                            resolve(toResult(status));
+                        } else {
+                            setTimeout(poll, 2000);
+                        }
+                    })
+                    .catch(() => setTimeout(poll, 2000));
+            };
+            
+            if (!window.EventSource) {
+                poll();
+                return;
+            }
+            const source = new EventSource(url + '/stream');
+            source.addEventListener('payment', event => {
+                const status = JSON.parse(event.data);
+                if (isFinished(status)) {
+                    source.close();
+                    resolve(toResult(status));
+                }
+            });
+            source.onerror = () => {
+                // El stream se cerró antes de terminar: seguir con consultas
+                source.close();
+                poll();
+            };
+        });
+    },
+    
     // Completar un pago
     // Resetear el permiso para jugar cuando el juego termina
     resetPurchase: function() {
@@ -333,10 +388,11 @@ const PaymentSystem = {
             },
             body: JSON.stringify({ 
                 paymentId: paymentId,
-                txid: txid
+                txid: txid,
+                accessToken: currentAccessToken
             })
         })
-        .then(response => response.json())
+        .then(response => this.readCompletion(response))
         .then(data => {
             console.log('Respuesta de completado de pago:', data);
             // Marcar como completado
@@ -667,6 +723,37 @@ const PaymentSystem = {
         }
     },
     
+    // Obtener varias secciones (user, wallet, counter, scores) en una sola petición
+    bootstrap: async function(accessToken, sections, username) {
+        try {
+            const response = await fetch('/api/bootstrap', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    accessToken: accessToken || currentAccessToken,
+                    sections: sections,
+                    username: username
+                })
+            });
+            
+            if (!response.ok) {
+                throw new Error('Error al obtener los datos iniciales');
+            }
+            
+            // Las secciones que fallan vienen en errors; el resto se puede usar igual
+            const result = await response.json();
+            if (result.errors && Object.keys(result.errors).length > 0) {
+                console.warn('Secciones no disponibles:', result.errors);
+            }
+            return result;
+        } catch (error) {
+            console.error('Error en la solicitud de datos iniciales:', error);
+            return { data: {}, errors: { all: error.message } };
+        }
+    },
+    
     // Establecer token de acceso
     setAccessToken: function(token) {
         currentAccessToken = token;
@@ -8,6 +8,8 @@ let currentScores = [];
 let currentUsername = '';
 let maxScore = 0;
 let maxLevel = 0;
+// Número máximo de puntuaciones que se piden al servidor
+const SERVER_SCORES_LIMIT = 50;
 
 // Inicializar el sistema de puntuaciones
 const ScoreSystem = {
@@ -215,36 +217,42 @@ const ScoreSystem = {
     
     // Obtener puntuaciones desde el servidor
     fetchScores: function() {
-        // Filtrar por usuario actual si existe
+        // Filtrar por usuario actual si existe (solo se piden las mejores puntuaciones)
         const url = currentUsername ? 
-            `/api/scores?username=${encodeURIComponent(currentUsername)}` : 
-            '/api/scores';
+            `/api/scores?top=${SERVER_SCORES_LIMIT}&username=${encodeURIComponent(currentUsername)}` : 
+            `/api/scores?top=${SERVER_SCORES_LIMIT}`;
         
         fetch(url)
             .then(response => response.json())
             .then(scores => {
                 console.log('Puntuaciones obtenidas del servidor:', scores);
-                
-                if (Array.isArray(scores)) {
-                    // Fusionar con puntuaciones locales
-                    this.mergeScores(scores);
-                    
-                    // Actualizar interfaz
-                    if (this.scoreboardElement) {
-                        this.renderScoreboard();
-                    }
-                    
-                    // Actualizar puntuación máxima mostrada
-                    if (this.userScoreElement) {
-                        this.updateUserScoreDisplay();
-                    }
-                }
+                this.applyServerScores(scores);
             })
             .catch(error => {
                 console.error('Error al obtener puntuaciones del servidor:', error);
             });
     },
     
+    // Mostrar puntuaciones recibidas del servidor (de /api/scores o /api/bootstrap)
+    applyServerScores: function(scores) {
+        if (!Array.isArray(scores)) {
+            return;
+        }
+        
+        // Fusionar con puntuaciones locales
+        this.mergeScores(scores);
+        
+        // Actualizar interfaz
+        if (this.scoreboardElement) {
+            this.renderScoreboard();
+        }
+        
+        // Actualizar puntuación máxima mostrada
+        if (this.userScoreElement) {
+            this.updateUserScoreDisplay();
+        }
+    },
+    
     // Fusionar puntuaciones nuevas con las existentes
     mergeScores: function(newScores) {
         if (!Array.isArray(newScores) || newScores.length === 0) {
@@ -478,12 +478,20 @@ document.addEventListener('DOMContentLoaded', function() {
                     console.warn('No se pudieron guardar datos en localStorage:', storageError);
                 }
                 
-                // Obtener información adicional del usuario si es necesario
+                // Wallet, contador y puntuaciones del usuario en una sola petición
                 try {
-                    const walletInfo = await PaymentSystem.getWalletInfo(auth.accessToken);
+                    const initial = await PaymentSystem.bootstrap(
+                        auth.accessToken, ['wallet', 'counter', 'scores'], auth.user.username);
+                    const walletInfo = initial.data.wallet;
                     if (balanceDisplay && walletInfo && walletInfo.balance) {
                         balanceDisplay.textContent = walletInfo.balance;
                     }
+                    if (initial.data.counter && window.PaymentCounter) {
+                        window.PaymentCounter.setCounterData(initial.data.counter);
+                    }
+                    if (initial.data.scores && window.ScoreSystem) {
+                        window.ScoreSystem.applyServerScores(initial.data.scores);
+                    }
                 } catch (walletError) {
                     console.warn('Error al obtener información de wallet:', walletError);
                 }
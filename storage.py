@@ -0,0 +1,54 @@
+"""
+Selección del backend de almacenamiento de puntuaciones y del contador de pagos
+STORAGE_BACKEND=json (por defecto) usa los archivos JSON/JSONL de /tmp;
+STORAGE_BACKEND=sqlite usa una base de datos SQLite en modo WAL (SQLITE_PATH);
+STORAGE_BACKEND=binary guarda las puntuaciones en un archivo binario mapeado en
+memoria (BINARY_SCORES_PATH) y el ledger en JSON.
+"""
+
+import os
+
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', '/tmp/basicpi.db')
+BINARY_SCORES_PATH = os.getenv('BINARY_SCORES_PATH', '/tmp/scores.bin')
+
+if STORAGE_BACKEND not in ('json', 'sqlite', 'binary'):
+    raise ValueError(f'Unknown STORAGE_BACKEND: {STORAGE_BACKEND}')
+
+
+def create_score_store(**json_options):
+    """
+    Crea el almacén de puntuaciones del backend configurado
+
+    Args:
+        **json_options: Opciones para ScoreStore cuando el backend es json
+
+    Returns:
+        ScoreStore, SqliteScoreStore o BinaryScoreStore
+    """
+    from score_store import ScoreStore
+    if STORAGE_BACKEND == 'sqlite':
+        from sqlite_storage import SqliteScoreStore
+        # La primera vez se importan las puntuaciones guardadas en JSON
+        return SqliteScoreStore(SQLITE_PATH, seed=lambda: ScoreStore(**json_options).all())
+    if STORAGE_BACKEND == 'binary':
+        from binary_scores import BinaryScoreStore
+        return BinaryScoreStore(BINARY_SCORES_PATH, seed=lambda: ScoreStore(**json_options).all())
+    return ScoreStore(**json_options)
+
+
+def create_ledger(json_factory):
+    """
+    Crea el ledger de pagos del backend configurado
+
+    Args:
+        json_factory (callable): Crea el ledger JSON (también se usa para
+            importar su estado la primera vez que se usa SQLite)
+
+    Returns:
+        PaymentLedger o SqlitePaymentLedger
+    """
+    if STORAGE_BACKEND == 'sqlite':
+        from sqlite_storage import SqlitePaymentLedger
+        return SqlitePaymentLedger(SQLITE_PATH, seed=lambda: json_factory().load())
+    return json_factory()
@@ -0,0 +1,54 @@
+"""
+Configuración común de las pruebas
+Los módulos de la aplicación están en la raíz del repositorio (no es un paquete),
+así que se añade al path para poder ejecutar pytest desde cualquier directorio.
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeResponse:
+    """Respuesta mínima de requests/httpx para simular la API de Pi Network"""
+
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data if data is not None else {}
+
+    def json(self):
+        return self._data
+
+    @property
+    def text(self):
+        return str(self._data)
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+
+@pytest.fixture
+def pi_app(tmp_path, monkeypatch):
+    """
+    El módulo app con su índice de pagos en tmp_path y un contador en memoria
+
+    Devuelve un namespace con app y counted (payment_id de cada suma al contador).
+    El cliente de la API de Pi se sustituye en cada prueba con monkeypatch.
+    """
+    import app
+    from payment_dedup import ProcessedPayments
+
+    counted = []
+
+    def add_to_counter(amount, payment_id=None, user_id=None, username=None):
+        counted.append(payment_id)
+        return {'accumulated_amount': amount * len(counted), 'payments_count': len(counted)}
+
+    monkeypatch.setattr(app, 'processed_payments', ProcessedPayments(str(tmp_path / 'processed.jsonl')))
+    monkeypatch.setattr(app, 'add_to_counter', add_to_counter)
+    return types.SimpleNamespace(app=app, counted=counted)
@@ -0,0 +1,131 @@
+"""Pruebas de BinaryScoreStore: formato, clasificación, cursores y validación"""
+
+import pytest
+
+from binary_scores import BinaryScoreStore, MAX_SCORE, valid_scores
+
+
+def score(username, value, level=1, timestamp=1_700_000_000_000, **extra):
+    return dict({'username': username, 'score': value, 'level': level, 'timestamp': timestamp}, **extra)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BinaryScoreStore(str(tmp_path / 'scores.bin'))
+
+
+def test_round_trip_keeps_fields(store):
+    store.append(score('ana', 12, level=3, paymentId='p1', blockchain=True))
+    store.append(score('bob', 7.5))
+    records = store.all()
+    assert records[0]['username'] == 'ana'
+    assert records[0]['score'] == 12
+    assert records[0]['level'] == 3
+    assert records[0]['paymentId'] == 'p1'
+    assert records[0]['blockchain'] is True
+    assert records[1]['score'] == 7.5
+    assert len(store) == 2
+
+
+def test_ranking_is_stable_for_equal_scores(store):
+    store.extend([score('a', 5), score('b', 9), score('c', 5), score('d', 1)])
+    assert [s['username'] for s in store.top(4)] == ['b', 'a', 'c', 'd']
+
+
+def test_cursor_pagination_visits_every_score_once(store):
+    store.extend([score(f'u{i}', i % 4) for i in range(10)])
+    seen, cursor = [], None
+    while True:
+        page, total, cursor = store.ranked(limit=3, cursor=cursor)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert total == 10
+    assert len(seen) == 10
+    assert {s['username'] for s in seen} == {f'u{i}' for i in range(10)}
+    values = [s['score'] for s in seen]
+    assert values == sorted(values, reverse=True)
+
+
+def test_filter_by_username(store):
+    store.extend([score('ana', 3), score('bob', 8), score('ana', 6)])
+    page, total, _ = store.ranked(username='ana')
+    assert total == 2
+    assert [s['score'] for s in page] == [6, 3]
+    assert store.count('ana') == 2
+    assert store.count('nobody') == 0
+
+
+def test_reopened_store_sees_existing_records(tmp_path):
+    path = str(tmp_path / 'scores.bin')
+    writer = BinaryScoreStore(path)
+    writer.extend([score('a', 1), score('b', 2)])
+    reopened = BinaryScoreStore(path)
+    assert [s['username'] for s in reopened.top(2)] == ['b', 'a']
+    assert reopened.version() == writer.version()
+
+
+def test_since_returns_new_scores(store):
+    store.append(score('a', 1))
+    version = store.version()
+    store.append(score('b', 2))
+    records, new_version, reset = store.since(version)
+    assert [s['username'] for s in records] == ['b']
+    assert new_version == store.version()
+    assert not reset
+
+
+@pytest.mark.parametrize('value', [1e20, float('inf'), float('nan'), -(MAX_SCORE + 1)])
+def test_out_of_range_scores_are_rejected(store, value):
+    with pytest.raises(ValueError):
+        store.append(score('a', value))
+    assert len(store) == 0
+
+
+def test_out_of_range_level_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.append(score('a', 1, level=1e30))
+
+
+def test_valid_scores_skips_invalid_entries():
+    scores = [score('a', 1), score('b', float('inf')), score('c', 2, level=2 ** 70)]
+    assert [s['username'] for s in valid_scores(scores)] == ['a']
+
+
+def test_seed_imports_only_valid_scores(tmp_path):
+    store = BinaryScoreStore(str(tmp_path / 'scores.bin'), seed=lambda: [score('a', 1), score('b', 1e30)])
+    assert [s['username'] for s in store.all()] == ['a']
+
+
+def test_sync_with_append_from_another_instance_between_steps(tmp_path):
+    path = str(tmp_path / 'scores.bin')
+    reader, writer = BinaryScoreStore(path), BinaryScoreStore(path)
+    writer.append(score('ana', 1))
+    reader.all()
+    read_strings, appended = reader.strings.read_new, []
+
+    def read_new_then_append():
+        # Otro proceso escribe una cadena nueva y su registro justo después de leer las cadenas
+        result = read_strings()
+        if not appended:
+            appended.append(writer.append(score('bob', 2)))
+        return result
+
+    reader.strings.read_new = read_new_then_append
+    assert [s['username'] for s in reader.all()] == ['ana']
+    assert [s['username'] for s in reader.all()] == ['ana', 'bob']
+
+
+def test_replaced_file_with_same_count_changes_version(tmp_path):
+    path = tmp_path / 'scores.bin'
+    store = BinaryScoreStore(str(path))
+    store.append(score('a', 1))
+    version = store.version()
+    other = tmp_path / 'other.bin'
+    BinaryScoreStore(str(other)).append(score('a', 5))
+    # Mismo número de registros con otro contenido (las cadenas coinciden)
+    other.replace(path)
+    assert store.version() != version
+    records, _, reset = store.since(version)
+    assert reset
+    assert [s['score'] for s in records] == [5]
@@ -0,0 +1,21 @@
+"""Pruebas de la validación de /api/bootstrap"""
+
+import pytest
+
+
+@pytest.fixture
+def client(pi_app):
+    return pi_app.app.app.test_client()
+
+
+@pytest.mark.parametrize('sections', ['user', {'user': True}, ['user', 1], [['user']]])
+def test_sections_must_be_a_list_of_strings(client, sections):
+    response = client.post('/api/bootstrap', json={'sections': sections})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'sections must be a list of strings'}
+
+
+def test_unknown_sections_are_rejected(client):
+    response = client.post('/api/bootstrap', json={'sections': ['user', 'nope']})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unknown sections: nope'}
@@ -0,0 +1,74 @@
+"""Pruebas de fan_out y de la cancelación de pagos con plazo total"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from conftest import FakeResponse
+from fanout import fan_out, DeadlineExceeded
+
+
+def test_fan_out_distinguishes_running_and_unstarted_tasks():
+    release = threading.Event()
+    outcomes = fan_out({'fast': lambda: 1, 'slow': release.wait, 'queued': lambda: 3}, max_workers=1, deadline=0.1)
+    release.set()
+    assert outcomes['fast'] == (True, 1)
+    ok, error = outcomes['slow']
+    assert not ok and isinstance(error, DeadlineExceeded) and error.started
+    ok, error = outcomes['queued']
+    assert not ok and isinstance(error, DeadlineExceeded) and not error.started
+
+
+class SlowPiClient:
+    """Cancela 'fast' al momento y tarda delay segundos con el resto"""
+
+    connect_timeout, read_timeout = 5, 30
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.timeouts = {}
+        self.release = threading.Event()
+
+    def post(self, path, timeout=None, **kwargs):
+        payment_id = path.split('/')[3]
+        self.timeouts[payment_id] = timeout
+        if payment_id != 'fast':
+            self.release.wait(self.delay)
+        return FakeResponse(200, {})
+
+
+def test_in_flight_cancellations_are_reported_as_unknown(pi_app, monkeypatch):
+    pi_client = SlowPiClient(delay=1)
+    monkeypatch.setattr(pi_app.app, 'pi_client', pi_client)
+    monkeypatch.setattr(pi_app.app, 'CANCEL_MAX_PARALLEL', 1)
+    deadline_at = time.monotonic() + 0.2
+    results = pi_app.app.cancel_payments(['fast', 'slow', 'queued'], deadline_at)
+    pi_client.release.set()
+    assert [r['status'] for r in results] == ['cancelled', 'unknown', 'error']
+    # Ninguna llamada puede durar más que el plazo de la petición
+    assert all(t <= 0.2 for timeout in pi_client.timeouts.values() for t in timeout)
+
+
+class AsyncSlowPiClient:
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def post(self, path, **kwargs):
+        if path.split('/')[3] != 'fast':
+            await self.release.wait()
+        return FakeResponse(200, {})
+
+
+def test_async_in_flight_cancellations_are_reported_as_unknown(pi_app, monkeypatch):
+    import asgi
+    monkeypatch.setattr(pi_app.app, 'CANCEL_MAX_PARALLEL', 1)
+
+    async def run():
+        monkeypatch.setattr(asgi, 'pi_client', AsyncSlowPiClient())
+        deadline_at = asyncio.get_running_loop().time() + 0.1
+        return await asgi.cancel_payments(['fast', 'slow', 'queued'], deadline_at)
+
+    results = asyncio.run(run())
+    assert [r['status'] for r in results] == ['cancelled', 'unknown', 'error']
@@ -0,0 +1,110 @@
+"""Pruebas de los circuit breakers y del timeout adaptativo"""
+
+import time
+
+import pytest
+
+from circuit_breaker import (AdaptiveTimeout, CircuitBreaker, CircuitBreakers, CircuitOpenError,
+                             CLOSED, OPEN, HALF_OPEN, is_failure_status)
+
+
+def breaker(**options):
+    options.setdefault('min_requests', 4)
+    options.setdefault('open_seconds', 0.05)
+    return CircuitBreaker('GET', '/v2/test', **options)
+
+
+def test_opens_when_failure_rate_is_reached():
+    cb = breaker()
+    for success in (True, False, False, True):
+        assert cb.allow()
+        cb.record(success)
+    assert cb.state == OPEN
+    assert not cb.allow()
+
+
+def test_stays_closed_below_minimum_requests():
+    cb = breaker()
+    for _ in range(3):
+        cb.record(False)
+    assert cb.state == CLOSED
+
+
+def test_half_open_probe_closes_on_success():
+    cb = breaker()
+    for _ in range(4):
+        cb.record(False)
+    time.sleep(0.06)
+    assert cb.allow()
+    assert cb.state == HALF_OPEN
+    # Solo una llamada de prueba a la vez
+    assert not cb.allow()
+    cb.record(True)
+    assert cb.state == CLOSED
+    assert cb.allow()
+
+
+def test_half_open_probe_reopens_on_failure():
+    cb = breaker()
+    for _ in range(4):
+        cb.record(False)
+    time.sleep(0.06)
+    assert cb.allow()
+    cb.record(False)
+    assert cb.state == OPEN
+    assert not cb.allow()
+
+
+def test_old_calls_leave_the_window():
+    cb = breaker(window=0.05)
+    for _ in range(3):
+        cb.record(False)
+    time.sleep(0.06)
+    cb.record(False)
+    assert cb.state == CLOSED
+
+
+def test_open_error_payload_and_headers():
+    cb = breaker(open_seconds=10)
+    for _ in range(4):
+        cb.record(False)
+    error = CircuitOpenError(cb)
+    assert error.payload()['retryAfter'] == 10
+    assert error.headers() == {'Retry-After': '10'}
+
+
+def test_adaptive_timeout_follows_latency_within_limits():
+    timeout = AdaptiveTimeout(maximum=10, minimum=1, percentile=0.99, multiplier=3, min_samples=5)
+    assert timeout.current == 10
+    for _ in range(5):
+        timeout.observe(0.5)
+    assert timeout.current == pytest.approx(1.5)
+    for _ in range(5):
+        timeout.observe(0.01)
+    assert timeout.current >= 1
+    for _ in range(20):
+        timeout.observe(60)
+    assert timeout.current == 10
+
+
+def test_adaptive_timeout_forgets_old_samples():
+    timeout = AdaptiveTimeout(maximum=10, minimum=0.1, percentile=0.99, multiplier=2, samples=5, min_samples=5)
+    for _ in range(5):
+        timeout.observe(4)
+    for _ in range(5):
+        timeout.observe(0.1)
+    assert timeout.current == pytest.approx(0.2)
+
+
+def test_registry_returns_one_breaker_per_endpoint():
+    breakers = CircuitBreakers()
+    first = breakers.get('GET', '/v2/me', 10)
+    assert breakers.get('GET', '/v2/me', 10) is first
+    assert breakers.get('POST', '/v2/me', 10) is not first
+    assert 'GET /v2/me' in breakers.snapshot()
+
+
+@pytest.mark.parametrize('status, failure', [(None, True), (500, True), (503, True), (429, True),
+                                             (200, False), (404, False), (400, False)])
+def test_failure_statuses(status, failure):
+    assert is_failure_status(status) is failure
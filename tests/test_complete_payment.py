@@ -0,0 +1,83 @@
+"""Pruebas de /payment/complete en app.py (Flask) y asgi.py (Starlette)"""
+
+import pytest
+
+from completion_outbox import CompletionOutbox
+from conftest import FakeResponse
+
+
+class PiClient:
+    """API de Pi que completa cualquier pago y cuenta las llamadas a /complete"""
+
+    def __init__(self):
+        self.posts = 0
+
+    def get(self, path, access_token=None, **kwargs):
+        return FakeResponse(200, {'identifier': 'p1', 'amount': 2.0, 'user_uid': 'u1',
+                                  'status': {'developer_approved': True, 'developer_completed': False}})
+
+    def post(self, path, access_token=None, json=None, **kwargs):
+        self.posts += 1
+        return FakeResponse(200, {'identifier': 'p1', 'txid': json['txid']})
+
+
+@pytest.fixture(params=['wsgi', 'asgi'])
+def post(request, pi_app):
+    """POST a /payment/complete con el front end indicado; devuelve (código, JSON)"""
+    if request.param == 'asgi':
+        from starlette.testclient import TestClient
+        import asgi
+        client = TestClient(asgi.application)
+    else:
+        client = pi_app.app.app.test_client()
+
+    def post(body):
+        response = client.post('/payment/complete', json=body)
+        return response.status_code, response.json() if request.param == 'asgi' else response.get_json()
+    return post
+
+
+@pytest.fixture
+def outbox(pi_app, tmp_path, monkeypatch):
+    # Sin start(): los pagos anotados no se procesan
+    outbox = CompletionOutbox(pi_app.app.process_queued_completion, path=str(tmp_path / 'outbox.jsonl'))
+    monkeypatch.setattr(pi_app.app, 'completion_outbox', outbox)
+    return outbox
+
+
+def test_stored_result_is_returned_before_queueing(pi_app, outbox, post):
+    stored = {'status': 'success', 'payment_result': {'identifier': 'p1'}}
+    pi_app.app.processed_payments.record('p1', stored)
+    assert post({'paymentId': 'p1', 'txid': 'tx1'}) == (200, stored)
+    assert outbox.status('p1') is None
+
+
+def test_new_payment_is_queued_in_async_mode(outbox, post):
+    status_code, body = post({'paymentId': 'p1', 'txid': 'tx1'})
+    assert status_code == 202
+    assert body['status'] == 'queued'
+    assert body['statusUrl'] == '/payment/status/p1'
+    assert outbox.status('p1')['state'] == 'pending'
+
+
+@pytest.mark.parametrize('body, expected', [
+    ({'txid': 'tx1'}, (400, {'error': 'Missing paymentId'})),
+    ({'paymentId': 'p1', 'debug': 'cancel'}, (200, {'status': 'cancelled'})),
+    ({'paymentId': 'p1'}, (200, {'status': 'incomplete', 'message': 'No transaction ID provided'})),
+])
+def test_requests_answered_without_completing(post, body, expected):
+    assert post(body) == expected
+
+
+def test_sync_completion_is_counted_once_and_replayed(pi_app, monkeypatch):
+    pi_client = PiClient()
+    monkeypatch.setattr(pi_app.app, 'completion_outbox', None)
+    monkeypatch.setattr(pi_app.app, 'pi_client', pi_client)
+    client = pi_app.app.app.test_client()
+    first = client.post('/payment/complete', json={'paymentId': 'p1', 'txid': 'tx1'})
+    again = client.post('/payment/complete', json={'paymentId': 'p1', 'txid': 'tx1'})
+    assert first.status_code == again.status_code == 200
+    assert first.get_json()['payment_result'] == {'identifier': 'p1', 'txid': 'tx1'}
+    assert again.get_json() == first.get_json()
+    assert pi_app.counted == ['p1']
+    assert pi_client.posts == 1
@@ -0,0 +1,68 @@
+"""Pruebas de la cola de completados con el proceso de app.py y una API de Pi simulada"""
+
+import threading
+import time
+
+import requests
+
+from completion_outbox import CompletionOutbox, COMPLETED, FAILED, ACTIVE_STATES
+from conftest import FakeResponse
+
+
+class FlakyPiClient:
+    """
+    API de Pi cuyo primer POST /complete llega pero agota el timeout del cliente
+
+    Los siguientes POST responden 400 (ya completado), y GET /v2/payments/{id}
+    refleja el estado real del pago.
+    """
+
+    def __init__(self, reaches_pi=True):
+        self.reaches_pi = reaches_pi
+        self.completed = False
+        self.posts = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, access_token=None, **kwargs):
+        return FakeResponse(200, {'identifier': 'p1', 'amount': 2.0, 'user_uid': 'u1',
+                                  'status': {'developer_approved': True, 'developer_completed': self.completed}})
+
+    def post(self, path, access_token=None, json=None, **kwargs):
+        with self._lock:
+            self.posts += 1
+            if self.posts == 1:
+                self.completed = self.reaches_pi
+                raise requests.exceptions.ReadTimeout('Read timed out')
+        return FakeResponse(400, {'error': 'payment_already_completed'})
+
+
+def run_outbox(pi_app, tmp_path):
+    outbox = CompletionOutbox(pi_app.app.process_queued_completion, path=str(tmp_path / 'outbox.jsonl'),
+                              workers=1, max_attempts=3, backoff=0.01, max_backoff=0.02)
+    outbox.start()
+    outbox.enqueue('p1', 'tx1')
+    deadline = time.monotonic() + 5
+    while outbox.status('p1')['state'] in ACTIVE_STATES and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return outbox.status('p1')
+
+
+def test_timed_out_completion_is_counted_once_on_retry(pi_app, tmp_path, monkeypatch):
+    client = FlakyPiClient()
+    monkeypatch.setattr(pi_app.app, 'pi_client', client)
+    entry = run_outbox(pi_app, tmp_path)
+    assert entry['state'] == COMPLETED
+    assert pi_app.counted == ['p1']
+    # El segundo intento ve el pago completado en la API y no repite el POST
+    assert client.posts == 1
+    assert pi_app.app.processed_payments.get('p1')['status'] == 'success'
+
+
+def test_rejected_completion_fails_without_retry(pi_app, tmp_path, monkeypatch):
+    client = FlakyPiClient(reaches_pi=False)
+    client.posts = 1  # Sin timeout: la API rechaza el primer POST
+    monkeypatch.setattr(pi_app.app, 'pi_client', client)
+    entry = run_outbox(pi_app, tmp_path)
+    assert entry['state'] == FAILED
+    assert entry['attempts'] == 1
+    assert pi_app.counted == []
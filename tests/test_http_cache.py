@@ -0,0 +1,53 @@
+"""Pruebas de los ETag de /api/scores y /api/payment-counter (200 y después 304)"""
+
+import pytest
+
+import payment_counter
+from payment_counter import PaymentLedger
+from score_store import ScoreStore
+
+
+@pytest.fixture
+def client(pi_app):
+    return pi_app.app.app.test_client()
+
+
+def revalidate(client, path, response):
+    return client.get(path, headers={'If-None-Match': response.headers['ETag']})
+
+
+def test_scores_etag_round_trip_and_rewrite(pi_app, client, tmp_path, monkeypatch):
+    path = str(tmp_path / 'scores.jsonl')
+    store = ScoreStore(path=path, legacy_path=None)
+    monkeypatch.setattr(pi_app.app, 'score_store', store)
+    store.append({'username': 'a', 'score': 1})
+
+    first = client.get('/api/scores')
+    assert first.status_code == 200
+    assert revalidate(client, '/api/scores', first).status_code == 304
+
+    store.append({'username': 'b', 'score': 2})
+    second = revalidate(client, '/api/scores', first)
+    assert second.status_code == 200
+    assert len(second.get_json()) == 2
+
+    # Otro worker reescribe el archivo con el mismo número de puntuaciones
+    ScoreStore(path=path, legacy_path=None).log.rewrite([{'username': 'c', 'score': 3}, {'username': 'd', 'score': 4}])
+    third = revalidate(client, '/api/scores', second)
+    assert third.status_code == 200
+    assert [s['username'] for s in third.get_json()] == ['d', 'c']
+
+
+def test_payment_counter_etag_round_trip(client, tmp_path, monkeypatch):
+    ledger = PaymentLedger(counter_file=str(tmp_path / 'counter.json'), ledger_file=str(tmp_path / 'ledger.jsonl'))
+    monkeypatch.setattr(payment_counter, 'ledger', ledger)
+    ledger.add(1)
+
+    first = client.get('/api/payment-counter')
+    assert first.status_code == 200
+    assert revalidate(client, '/api/payment-counter', first).status_code == 304
+
+    ledger.add(2)
+    second = revalidate(client, '/api/payment-counter', first)
+    assert second.status_code == 200
+    assert second.get_json()['counter']['payments_count'] == 2
@@ -0,0 +1,60 @@
+"""Pruebas de json_codec: la salida es la misma con orjson y con la biblioteca estándar"""
+
+import dataclasses
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+
+import json_codec
+
+orjson = pytest.importorskip('orjson')
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: int
+
+
+VALUES = [
+    {'b': 1, 'a': [1.5, None, True], 'texto': 'año ñ €'},
+    {'when': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc), 'day': date(2024, 1, 2)},
+    {'naive': datetime(2024, 1, 2, 3, 4, 5)},
+    {'id': uuid.UUID('12345678-1234-5678-1234-567812345678'), 'point': Point(1, 2)},
+    {1: 'clave entera'},
+    {'big': 2 ** 70},
+]
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(json_codec, 'orjson', orjson if request.param == 'orjson' else None)
+    return request.param
+
+
+def encode_with(backend_name, monkeypatch, value, **options):
+    monkeypatch.setattr(json_codec, 'orjson', orjson if backend_name == 'orjson' else None)
+    return json_codec.dumps(value, **options)
+
+
+@pytest.mark.parametrize('value', VALUES)
+@pytest.mark.parametrize('options', [{}, {'sort_keys': True}, {'pretty': True}])
+def test_both_backends_produce_the_same_bytes(monkeypatch, value, options):
+    assert encode_with('orjson', monkeypatch, value, **options) == encode_with('json', monkeypatch, value, **options)
+
+
+def test_datetimes_use_http_date_like_flask(backend):
+    encoded = json_codec.dumps_str({'when': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)})
+    assert encoded == '{"when":"Tue, 02 Jan 2024 03:04:05 GMT"}'
+
+
+def test_round_trip_and_invalid_input(backend):
+    assert json_codec.loads(json_codec.dumps(VALUES[0])) == VALUES[0]
+    with pytest.raises(ValueError):
+        json_codec.loads(b'{"a":')
+
+
+def test_unknown_types_raise_type_error(backend):
+    with pytest.raises(TypeError):
+        json_codec.dumps({'value': object()})
@@ -0,0 +1,97 @@
+"""Pruebas de las clasificaciones por periodo (día y semana en UTC) y de su actualización incremental"""
+
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+import leaderboards
+from binary_scores import BinaryScoreStore
+from leaderboards import Leaderboards, period_start, DAILY, WEEKLY, ALL_TIME, WINDOWS
+from score_store import ScoreStore
+from sqlite_storage import SqliteScoreStore
+
+
+def ms(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def score(username, value, timestamp, level=1):
+    return {'username': username, 'score': value, 'level': level, 'timestamp': timestamp}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj falso en milisegundos para leaderboards (now[0])"""
+    now = [ms(2024, 1, 7, 23, 59)]
+    monkeypatch.setattr(leaderboards, 'time', types.SimpleNamespace(time=lambda: now[0] / 1000))
+    return now
+
+
+@pytest.fixture(params=['json', 'sqlite', 'binary'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        return SqliteScoreStore(str(tmp_path / 'scores.db'))
+    if request.param == 'binary':
+        return BinaryScoreStore(str(tmp_path / 'scores.bin'))
+    return ScoreStore(path=str(tmp_path / 'scores.jsonl'), legacy_path=None)
+
+
+def names(boards, window, level=None):
+    return [s['username'] for s in boards.top(window, level)[0]]
+
+
+def test_period_start_uses_utc_days_and_monday_weeks():
+    wednesday = ms(2024, 1, 3, 15, 30)
+    assert period_start(DAILY, wednesday) == ms(2024, 1, 3)
+    assert period_start(WEEKLY, wednesday) == ms(2024, 1, 1)
+    assert period_start(WEEKLY, ms(2024, 1, 7, 23, 59)) == ms(2024, 1, 1)
+    assert period_start(WEEKLY, ms(2024, 1, 8)) == ms(2024, 1, 8)
+    assert period_start(ALL_TIME, wednesday) == 0
+
+
+def test_boards_roll_over_at_day_and_week_boundaries(clock, store):
+    boards = Leaderboards(store, k=10)
+    store.append(score('sunday', 5, clock[0]))
+    assert names(boards, DAILY) == names(boards, WEEKLY) == ['sunday']
+    _, etag = boards.top(DAILY)
+
+    # Lunes 00:00 UTC: empieza un día y una semana nuevos
+    clock[0] = ms(2024, 1, 8, 0, 0, 1)
+    assert names(boards, DAILY) == []
+    assert names(boards, WEEKLY) == []
+    assert names(boards, ALL_TIME) == ['sunday']
+    assert boards.top(DAILY)[1] != etag
+
+    store.append(score('monday', 3, clock[0]))
+    boards.update()
+    clock[0] = ms(2024, 1, 9, 12)
+    assert names(boards, DAILY) == []
+    assert names(boards, WEEKLY) == ['monday']
+    assert names(boards, ALL_TIME) == ['sunday', 'monday']
+
+
+def test_incremental_updates_match_a_full_rebuild(clock, store):
+    boards = Leaderboards(store, k=3)
+    assert names(boards, ALL_TIME) == []
+    timestamps = (ms(2024, 1, 1, 9), ms(2024, 1, 6, 9), ms(2024, 1, 7, 9))
+    for i in range(12):
+        store.append(score(f'u{i}', (i * 7) % 5, timestamps[i % 3], level=1 + i % 2))
+        if i % 4 == 0:
+            boards.update()
+    boards.update()
+
+    rebuilt = Leaderboards(store, k=3)
+    for window in WINDOWS:
+        for level in (None, 1, 2):
+            assert boards.top(window, level)[0] == rebuilt.top(window, level)[0]
+
+
+def test_rewritten_store_is_rebuilt(clock, tmp_path):
+    path = str(tmp_path / 'scores.jsonl')
+    store = ScoreStore(path=path, legacy_path=None)
+    boards = Leaderboards(store, k=3)
+    store.append(score('a', 1, clock[0]))
+    assert names(boards, ALL_TIME) == ['a']
+    ScoreStore(path=path, legacy_path=None).log.rewrite([score('b', 2, clock[0])])
+    assert names(boards, ALL_TIME) == ['b']
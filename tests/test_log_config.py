@@ -0,0 +1,47 @@
+"""Pruebas de la redacción de datos sensibles en los logs"""
+
+import logging
+
+import pytest
+
+from log_config import JsonFormatter, RedactingFormatter, redact, REDACTED
+
+
+def record(message, *args):
+    return logging.LogRecord('app', logging.INFO, __file__, 1, message, args, None)
+
+
+@pytest.mark.parametrize('text, secret', [
+    ('Authorization: Bearer abc.def-123', 'abc.def-123'),
+    ("{'username': 'alice', 'score': 3}", 'alice'),
+    ('{"accessToken": "tok123"}', 'tok123'),
+    ("payment {'user_uid': 'uid-42'}", 'uid-42'),
+    ('wallet G' + 'A' * 55, 'G' + 'A' * 55),
+])
+def test_redact_hides_sensitive_values(text, secret):
+    redacted = redact(text)
+    assert secret not in redacted
+    assert REDACTED in redacted
+
+
+@pytest.mark.parametrize('formatter', [JsonFormatter(), RedactingFormatter()])
+def test_positional_arguments_are_redacted_after_formatting(formatter):
+    output = formatter.format(record('Saving score (username=%s): %s', 'alice', 10))
+    assert 'alice' not in output
+    assert '10' in output
+
+
+def test_redaction_can_be_disabled():
+    assert 'alice' in JsonFormatter(redact_enabled=False).format(record('Hi (username=%s)', 'alice'))
+
+
+def test_score_routes_do_not_log_usernames(pi_app, tmp_path, monkeypatch, caplog):
+    from score_store import ScoreStore
+    monkeypatch.setattr(pi_app.app, 'score_store', ScoreStore(path=str(tmp_path / 'scores.jsonl'), legacy_path=None))
+    client = pi_app.app.app.test_client()
+    with caplog.at_level(logging.INFO, logger='app'):
+        client.post('/api/scores', json={'username': 'alice-private', 'score': 10})
+        client.post('/api/scores/record', json={'username': 'alice-private', 'score': 10, 'level': 2})
+    messages = [JsonFormatter().format(r) for r in caplog.records if r.name == 'app']
+    assert any('score' in m.lower() for m in messages)
+    assert not any('alice-private' in m for m in messages)
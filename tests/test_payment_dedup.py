@@ -0,0 +1,72 @@
+"""Pruebas del índice de pagos completados y del registro de completados concurrentes"""
+
+import threading
+import time
+import types
+
+import payment_dedup
+from payment_dedup import ProcessedPayments
+
+
+def test_concurrent_completions_count_the_payment_once(pi_app, monkeypatch):
+    add_to_counter = pi_app.app.add_to_counter
+    started = threading.Barrier(2)
+
+    def slow_add_to_counter(*args, **kwargs):
+        # Deja tiempo a la otra petición para llegar a la comprobación
+        time.sleep(0.05)
+        return add_to_counter(*args, **kwargs)
+
+    monkeypatch.setattr(pi_app.app, 'add_to_counter', slow_add_to_counter)
+    results = []
+
+    def complete():
+        started.wait()
+        results.append(pi_app.app.record_completion('p1', 2.0, 'user-1', {'identifier': 'p1'}))
+
+    threads = [threading.Thread(target=complete) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pi_app.counted == ['p1']
+    assert results[0] == results[1]
+    assert pi_app.app.processed_payments.get('p1') == results[0]
+
+
+def test_other_instance_sees_recorded_payment(tmp_path):
+    path = str(tmp_path / 'processed.jsonl')
+    first, second = ProcessedPayments(path), ProcessedPayments(path)
+    assert second.get('p1') is None
+    first.record('p1', {'status': 'success'})
+    assert second.get('p1') == {'status': 'success'}
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(payment_dedup, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    payments = ProcessedPayments(str(tmp_path / 'processed.jsonl'), ttl=60)
+    payments.record('old', {'n': 1})
+    now[0] += 30
+    payments.record('new', {'n': 2})
+    now[0] += 40
+    assert payments.get('old') is None
+    assert payments.get('new') == {'n': 2}
+
+
+def test_oldest_entries_are_evicted_over_max_entries(tmp_path):
+    payments = ProcessedPayments(str(tmp_path / 'processed.jsonl'), max_entries=2)
+    for payment_id in ('p1', 'p2', 'p3'):
+        payments.record(payment_id, {'id': payment_id})
+    assert payments.get('p1') is None
+    assert payments.get('p2') == {'id': 'p2'}
+    assert payments.get('p3') == {'id': 'p3'}
+
+
+def test_claim_releases_per_payment_locks(tmp_path):
+    payments = ProcessedPayments(str(tmp_path / 'processed.jsonl'))
+    with payments.claim('p1'):
+        with payments.claim('p2'):
+            assert set(payments._payment_locks) == {'p1', 'p2'}
+    assert payments._payment_locks == {}
@@ -0,0 +1,71 @@
+"""Pruebas del ledger de pagos (instantánea + registro JSONL compartido)"""
+
+import json
+
+import pytest
+
+from payment_counter import PaymentLedger
+from sqlite_storage import SqlitePaymentLedger
+
+
+@pytest.fixture
+def make_json_ledger(tmp_path):
+    def make(**options):
+        return PaymentLedger(counter_file=str(tmp_path / 'counter.json'),
+                             ledger_file=str(tmp_path / 'ledger.jsonl'), **options)
+    return make
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def make_ledger(request, tmp_path, make_json_ledger):
+    """Crea ledgers que comparten los mismos datos con el backend json o sqlite"""
+    if request.param == 'sqlite':
+        return lambda: SqlitePaymentLedger(str(tmp_path / 'counter.db'))
+    return make_json_ledger
+
+
+def test_replays_ledger_tail_after_snapshot(tmp_path, make_json_ledger):
+    ledger = make_json_ledger(snapshot_every=2)
+    for i, amount in enumerate((1, 2, 4)):
+        ledger.add(amount, payment_id=f'p{i}', username='ana')
+    snapshot = json.loads((tmp_path / 'counter.json').read_text())
+    assert snapshot['payments_count'] == 2
+
+    reopened = make_json_ledger(snapshot_every=2).load()
+    assert reopened['payments_count'] == 3
+    assert reopened['accumulated_amount'] == 7
+    assert [p['payment_id'] for p in reopened['payments_history']] == ['p2', 'p1', 'p0']
+
+
+def test_torn_last_line_is_skipped_and_next_append_survives(tmp_path, make_json_ledger):
+    make_json_ledger().add(1, payment_id='p0')
+    # Un worker murió a mitad de escribir un registro
+    with open(tmp_path / 'ledger.jsonl', 'ab') as f:
+        f.write(b'{"type": "payment", "amo')
+
+    ledger = make_json_ledger()
+    assert ledger.load()['payments_count'] == 1
+    ledger.add(2, payment_id='p1')
+    reopened = make_json_ledger().load()
+    assert reopened['payments_count'] == 2
+    assert reopened['accumulated_amount'] == 3
+
+
+def test_two_instances_append_to_the_same_ledger(make_ledger):
+    first, second = make_ledger(), make_ledger()
+    first.add(1, payment_id='p0')
+    second.add(2, payment_id='p1')
+    assert first.add(4, payment_id='p2')['payments_count'] == 3
+    assert first.summary() == second.summary()
+    assert second.load()['accumulated_amount'] == 7
+    assert first.version() == second.version()
+
+
+def test_version_changes_after_a_write(make_ledger):
+    first, second = make_ledger(), make_ledger()
+    before = first.version()
+    second.add(1)
+    assert first.version() != before
+    after_payment = first.version()
+    second.reset()
+    assert first.version() != after_payment
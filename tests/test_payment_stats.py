@@ -0,0 +1,96 @@
+"""Pruebas de PaymentRollups: agregados por periodo, top de usuarios y desalojo"""
+
+import pytest
+
+from payment_stats import PaymentRollups, bucket_keys
+
+
+def payment(amount, user, timestamp='2024-05-01T13:20:00'):
+    return {'timestamp': timestamp, 'amount': amount, 'user_id': user, 'username': f'name-{user}'}
+
+
+def test_bucket_keys_use_iso_prefixes():
+    assert bucket_keys('2024-05-01T13:20:00') == [
+        ('hour', '2024-05-01T13'), ('day', '2024-05-01'), ('month', '2024-05'), ('all', ''),
+    ]
+
+
+def test_totals_and_buckets():
+    rollups = PaymentRollups()
+    rollups.add(payment(1.0, 'u1'))
+    rollups.add(payment(3.0, 'u2', '2024-05-01T14:00:00'))
+    stats = rollups.stats()
+    assert stats['count'] == 2
+    assert stats['total'] == pytest.approx(4.0)
+    assert stats['min'] == 1.0
+    assert stats['max'] == 3.0
+    assert stats['average'] == pytest.approx(2.0)
+    assert [bucket['bucket'] for bucket in stats['hourly']] == ['2024-05-01T13', '2024-05-01T14']
+    assert stats['daily'][0]['count'] == 2
+    assert stats['monthly'][0]['total'] == pytest.approx(4.0)
+
+
+def test_empty_stats():
+    stats = PaymentRollups().stats()
+    assert stats['count'] == 0
+    assert stats['average'] == 0.0
+    assert stats['top_payers'] == []
+
+
+def test_top_payers_ordered_by_total():
+    rollups = PaymentRollups(top=2)
+    for amount, user in ((1.0, 'u1'), (2.0, 'u2'), (1.5, 'u1'), (5.0, 'u3')):
+        rollups.add(payment(amount, user))
+    assert [payer['user_id'] for payer in rollups.stats()['top_payers']] == ['u3', 'u1']
+    assert rollups.stats(top=1)['top_payers'][0]['total'] == pytest.approx(5.0)
+
+
+def test_top_zero_keeps_no_ranking():
+    rollups = PaymentRollups(top=0)
+    rollups.add(payment(1.0, 'u1'))
+    rollups.add(payment(2.0, 'u2'))
+    assert rollups.stats()['top_payers'] == []
+    assert rollups.stats()['count'] == 2
+
+
+def test_anonymous_payments_count_but_have_no_payer():
+    rollups = PaymentRollups()
+    rollups.add({'timestamp': '2024-05-01T13:00:00', 'amount': 2.0})
+    assert rollups.stats()['count'] == 1
+    assert rollups.payers == {}
+
+
+def test_eviction_never_drops_top_payers():
+    rollups = PaymentRollups(max_users=3, top=2)
+    rollups.add(payment(10.0, 'big1'))
+    rollups.add(payment(9.0, 'big2'))
+    for i in range(20):
+        rollups.add(payment(0.1, f'small{i}'))
+    assert len(rollups.payers) <= rollups.max_users
+    assert [payer['user_id'] for payer in rollups.stats()['top_payers']] == ['big1', 'big2']
+
+
+def test_max_users_is_always_larger_than_top():
+    rollups = PaymentRollups(max_users=3, top=10)
+    assert rollups.max_users == 11
+    for i in range(15):
+        rollups.add(payment(float(i), f'u{i}'))
+    assert len(rollups.stats()['top_payers']) == 10
+
+
+def test_old_hourly_buckets_are_compacted():
+    rollups = PaymentRollups()
+    rollups.add(payment(1.0, 'u1', '2024-01-01T00:00:00'))
+    rollups.add(payment(1.0, 'u1', '2024-03-01T00:00:00'))
+    hours = [bucket['bucket'] for bucket in rollups.stats()['hourly']]
+    assert hours == ['2024-03-01T00']
+    # El pago antiguo sigue contado en el total
+    assert rollups.stats()['count'] == 2
+
+
+def test_round_trip_through_dict():
+    rollups = PaymentRollups(top=3)
+    for amount, user in ((1.0, 'u1'), (2.0, 'u2'), (3.0, 'u3')):
+        rollups.add(payment(amount, user))
+    restored = PaymentRollups.from_dict(rollups.to_dict(), top=3)
+    assert restored.stats() == rollups.stats()
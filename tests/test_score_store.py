@@ -0,0 +1,168 @@
+"""Pruebas de ScoreStore y de AppendLog (registro JSONL compartido)"""
+
+import json
+
+import pytest
+
+from jsonl_log import AppendLog
+from score_store import ScoreStore, encode_cursor, decode_cursor
+from sqlite_storage import SqliteScoreStore
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def make_store(request, tmp_path):
+    """Crea almacenes que comparten los mismos datos con el backend json o sqlite"""
+    def make():
+        if request.param == 'sqlite':
+            return SqliteScoreStore(str(tmp_path / 'scores.db'))
+        return ScoreStore(path=str(tmp_path / 'scores.jsonl'), legacy_path=str(tmp_path / 'scores.json'))
+    return make
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store()
+
+
+# --- AppendLog ---
+
+def test_append_log_reads_only_new_records(tmp_path):
+    log = AppendLog(str(tmp_path / 'log.jsonl'))
+    assert log.read_new() == ([], False)
+    log.append({'a': 1}, {'a': 2})
+    assert log.read_new() == ([{'a': 1}, {'a': 2}], False)
+    log.append({'a': 3})
+    assert log.read_new() == ([{'a': 3}], False)
+
+
+def test_append_log_leaves_incomplete_line_for_next_read(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    log = AppendLog(str(path))
+    path.write_bytes(b'{"a":1}\n{"a":')
+    assert log.read_new() == ([{'a': 1}], False)
+    with open(path, 'ab') as f:
+        f.write(b'2}\n')
+    assert log.read_new() == ([{'a': 2}], False)
+
+
+def test_append_log_skips_corrupt_lines(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    path.write_bytes(b'{"a":1}\nnot json\n{"a":2}\n')
+    assert AppendLog(str(path)).read_new() == ([{'a': 1}, {'a': 2}], False)
+
+
+def test_append_log_detects_rewrite_by_another_instance(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    reader, writer = AppendLog(path), AppendLog(path)
+    writer.append({'a': 1}, {'a': 2})
+    reader.read_new()
+    writer.rewrite([{'a': 2}])
+    assert reader.read_new() == ([{'a': 2}], True)
+
+
+def test_append_log_seek_resumes_from_saved_offset(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    log = AppendLog(path)
+    log.append({'a': 1})
+    log.read_new()
+    offset = log.position()
+    log.append({'a': 2})
+    resumed = AppendLog(path)
+    resumed.seek(offset)
+    assert resumed.read_new() == ([{'a': 2}], False)
+
+
+# --- ScoreStore ---
+
+def test_ranked_orders_by_score_then_arrival(store):
+    for username, value in (('a', 5), ('b', 9), ('c', 5)):
+        store.append({'username': username, 'score': value})
+    page, total, cursor = store.ranked()
+    assert [s['username'] for s in page] == ['b', 'a', 'c']
+    assert total == 3
+    assert cursor is None
+
+
+def test_cursor_pagination(store):
+    for i in range(7):
+        store.append({'username': f'u{i}', 'score': i % 3})
+    seen, cursor = [], None
+    while True:
+        page, _, cursor = store.ranked(limit=2, cursor=cursor)
+        seen.extend(s['username'] for s in page)
+        if cursor is None:
+            break
+    assert sorted(seen) == [f'u{i}' for i in range(7)]
+    assert len(seen) == 7
+
+
+def test_invalid_cursor_raises_value_error():
+    with pytest.raises(ValueError):
+        decode_cursor('garbage')
+    assert decode_cursor(encode_cursor((-2.5, 4))) == (-2.5, 4)
+
+
+def test_two_instances_share_the_log(make_store):
+    first, second = make_store(), make_store()
+    first.append({'username': 'a', 'score': 1})
+    second.append({'username': 'b', 'score': 2})
+    assert [s['username'] for s in first.top(2)] == ['b', 'a']
+    assert first.version() == second.version()
+
+
+def test_since_returns_scores_after_a_version(store):
+    store.append({'username': 'a', 'score': 1})
+    version = store.version()
+    store.append({'username': 'b', 'score': 2})
+    scores, current, reset = store.since(version)
+    assert [s['username'] for s in scores] == ['b']
+    assert current == store.version()
+    assert not reset
+    assert store.since(current) == ([], current, False)
+    assert [s['username'] for s in store.since(None)[0]] == ['a', 'b']
+
+
+def test_compaction_keeps_scores_and_drops_corrupt_lines(tmp_path):
+    path = tmp_path / 'scores.jsonl'
+    path.write_bytes(b'{"username":"a","score":1}\ngarbage\n')
+    store = ScoreStore(path=str(path), legacy_path=None, compact_every=1)
+    store.append({'username': 'b', 'score': 2})
+    assert [json.loads(line)['username'] for line in path.read_text().splitlines()] == ['a', 'b']
+    assert store.count() == 2
+
+
+def test_imports_legacy_json_file(tmp_path):
+    legacy = tmp_path / 'scores.json'
+    legacy.write_text(json.dumps([{'username': 'a', 'score': 3}, {'username': 'b', 'score': 4}]))
+    store = ScoreStore(path=str(tmp_path / 'scores.jsonl'), legacy_path=str(legacy))
+    assert [s['username'] for s in store.top(2)] == ['b', 'a']
+    assert (tmp_path / 'scores.jsonl').exists()
+
+
+def test_count_by_username(store):
+    store.append({'username': 'a', 'score': 1})
+    store.append({'username': 'a', 'score': 2})
+    store.append({'username': 'b', 'score': 3})
+    assert store.count() == 3
+    assert store.count('a') == 2
+    assert store.ranked(username='a')[1] == 2
+
+
+def test_rewrite_with_same_count_changes_version(tmp_path):
+    path = str(tmp_path / 'scores.jsonl')
+    reader, writer = ScoreStore(path=path, legacy_path=None), ScoreStore(path=path, legacy_path=None)
+    writer.append({'username': 'a', 'score': 1})
+    version = reader.version()
+    writer.log.rewrite([{'username': 'a', 'score': 9}])
+    assert reader.version() != version
+    scores, _, reset = reader.since(version)
+    assert reset
+    assert [s['score'] for s in scores] == [9]
+
+
+def test_compaction_changes_version(tmp_path):
+    store = ScoreStore(path=str(tmp_path / 'scores.jsonl'), legacy_path=None)
+    store.append({'username': 'a', 'score': 1})
+    version = store.version()
+    store.compact()
+    assert store.version() != version
@@ -0,0 +1,98 @@
+"""Pruebas específicas del backend SQLite: importación, conexiones, estadísticas y versión"""
+
+import json
+import threading
+
+import pytest
+
+from payment_counter import PaymentLedger
+from score_store import ScoreStore
+from sqlite_storage import SqliteDatabase, SqliteScoreStore, SqlitePaymentLedger
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'basicpi.db')
+
+
+def test_scores_are_seeded_once_from_json(tmp_path, db_path):
+    legacy = tmp_path / 'scores.json'
+    legacy.write_text(json.dumps([{'username': 'a', 'score': 3}, {'username': 'b', 'score': 4}]))
+    json_store = ScoreStore(path=str(tmp_path / 'scores.jsonl'), legacy_path=str(legacy))
+    calls = []
+
+    def seed():
+        calls.append(1)
+        return json_store.all()
+
+    store = SqliteScoreStore(db_path, seed=seed)
+    assert [s['username'] for s in store.top(2)] == ['b', 'a']
+    store.append({'username': 'c', 'score': 1})
+    # Otro worker con la tabla ya llena no vuelve a importar
+    assert SqliteScoreStore(db_path, seed=seed).count() == 3
+    assert len(calls) == 1
+
+
+def test_ledger_is_seeded_from_json_state_with_stats(tmp_path, db_path):
+    json_ledger = PaymentLedger(counter_file=str(tmp_path / 'counter.json'),
+                                ledger_file=str(tmp_path / 'ledger.jsonl'))
+    json_ledger.add(2, payment_id='p0', user_id='u1', username='ana')
+    json_ledger.add(4, payment_id='p1', user_id='u1', username='ana')
+
+    ledger = SqlitePaymentLedger(db_path, seed=json_ledger.load)
+    state = ledger.load()
+    assert state['payments_count'] == 2
+    assert state['accumulated_amount'] == 6
+    assert [p['payment_id'] for p in state['payments_history']] == ['p1', 'p0']
+    stats = ledger.payment_stats()
+    assert stats['count'] == 2
+    assert stats['top_payers'][0]['count'] == 2
+
+
+def test_each_thread_gets_its_own_wal_connection(db_path):
+    db = SqliteDatabase(db_path)
+    main = db.connection()
+    assert db.connection() is main
+    assert main.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    others = []
+    thread = threading.Thread(target=lambda: others.append(db.connection()))
+    thread.start()
+    thread.join()
+    assert others[0] is not main
+
+
+def test_concurrent_payments_from_threads_are_all_counted(db_path):
+    ledger = SqlitePaymentLedger(db_path)
+
+    def pay():
+        for _ in range(10):
+            ledger.add(1, user_id='u1')
+
+    threads = [threading.Thread(target=pay) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert ledger.summary()['payments_count'] == 40
+    assert ledger.payment_stats()['top_payers'][0]['count'] == 40
+
+
+def test_rollups_are_upserted_per_bucket_and_payer(db_path):
+    ledger = SqlitePaymentLedger(db_path)
+    for amount, user in ((1, 'u1'), (5, 'u2'), (3, 'u1')):
+        ledger.add(amount, user_id=user, username=user)
+    stats = ledger.payment_stats()
+    assert (stats['count'], stats['total'], stats['min'], stats['max']) == (3, 9, 1, 5)
+    assert [(b['count'], b['total']) for b in stats['daily']] == [(3, 9)]
+    assert [(p['user_id'], p['count'], p['total']) for p in stats['top_payers']] == [('u2', 1, 5), ('u1', 2, 4)]
+
+
+def test_version_changes_with_payments_and_resets(db_path):
+    first, second = SqlitePaymentLedger(db_path), SqlitePaymentLedger(db_path)
+    before = first.version()
+    state = second.add(1)
+    after_payment = first.version()
+    assert after_payment != before
+    assert after_payment == f"{state['payments_count']}-{state['last_updated']}"
+    second.reset()
+    assert first.version() != after_payment
@@ -0,0 +1,25 @@
+"""Pruebas de los streams SSE y de su desactivación bajo WSGI"""
+
+import pytest
+
+
+@pytest.fixture
+def client(pi_app):
+    return pi_app.app.app.test_client()
+
+
+@pytest.mark.parametrize('path', ['/api/payment-counter/stream', '/payment/status/p1/stream'])
+def test_streams_answer_204_when_disabled(pi_app, client, monkeypatch, path):
+    monkeypatch.setattr(pi_app.app, 'SSE_ENABLED', False)
+    response = client.get(path)
+    assert response.status_code == 204
+    assert response.data == b''
+
+
+def test_counter_stream_is_served_when_enabled(pi_app, client, monkeypatch):
+    monkeypatch.setattr(pi_app.app, 'SSE_ENABLED', True)
+    response = client.get('/api/payment-counter/stream')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert next(response.response) == b'retry: 3000\n\n'
+    response.close()
@@ -0,0 +1,97 @@
+"""Pruebas del filtrado y la paginación de /api/transactions"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from transactions import parse_date, parse_filters, decode_cursor, filter_transactions, paginate
+
+
+def tx(identifier, amount=1.0, created_at='2024-01-01T00:00:00Z', tx_type='game'):
+    return {'identifier': identifier, 'amount': amount, 'created_at': created_at, 'metadata': {'type': tx_type}}
+
+
+TRANSACTIONS = [
+    tx('t0', 1, '2024-01-01T10:00:00Z'),
+    tx('t1', 5, '2024-01-02T10:00:00Z', tx_type='donation'),
+    tx('t2', 3, '2024-01-03T10:00:00Z'),
+    tx('t3', 8, '2024-01-04T10:00:00Z'),
+    tx('t4', 2, '2024-01-05T10:00:00Z', tx_type='donation'),
+]
+
+
+def ids(transactions):
+    return [t['identifier'] for t in transactions]
+
+
+def run(body, transactions=TRANSACTIONS, default_limit=2, max_limit=3):
+    limit, filters = parse_filters(body, default_limit, max_limit)
+    start = decode_cursor(body['cursor'], transactions) if body.get('cursor') else 0
+    return paginate(filter_transactions(transactions, start=start, **filters), limit)
+
+
+def test_without_limit_or_cursor_everything_is_returned():
+    assert run({}) == (TRANSACTIONS, None)
+
+
+def test_cursor_walks_every_page_once():
+    page, cursor = run({'limit': 2})
+    seen = ids(page)
+    while cursor:
+        page, cursor = run({'limit': 2, 'cursor': cursor})
+        seen.extend(ids(page))
+    assert seen == ids(TRANSACTIONS)
+
+
+def test_cursor_without_limit_uses_the_default_and_limit_is_capped():
+    _, cursor = run({'limit': 1})
+    assert len(run({'cursor': cursor})[0]) == 2
+    assert len(run({'limit': 100})[0]) == 3
+
+
+def test_cursor_follows_its_transaction_when_the_list_changes():
+    _, cursor = run({'limit': 2})
+    refreshed = [tx('new')] + TRANSACTIONS
+    assert ids(run({'limit': 2, 'cursor': cursor}, transactions=refreshed)[0]) == ['t2', 't3']
+
+
+@pytest.mark.parametrize('cursor', ['garbage', '2:missing'])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, TRANSACTIONS)
+
+
+def test_type_and_amount_filters():
+    assert ids(run({'filterType': 'donation'})[0]) == ['t1', 't4']
+    assert ids(run({'minAmount': 2, 'maxAmount': 5})[0]) == ['t1', 't2', 't4']
+
+
+def test_date_range_is_inclusive_and_accepts_milliseconds():
+    since = int(datetime(2024, 1, 2, 10, tzinfo=timezone.utc).timestamp() * 1000)
+    assert ids(run({'since': since, 'until': '2024-01-04T10:00:00Z'})[0]) == ['t1', 't2', 't3']
+
+
+def test_transactions_with_unparseable_dates_are_skipped_by_date_filters():
+    transactions = [tx('bad', created_at='yesterday'), tx('ok')]
+    assert ids(run({'since': '2023-12-31'}, transactions=transactions)[0]) == ['ok']
+
+
+@pytest.mark.parametrize('body', [{'limit': 0}, {'limit': 'x'}, {'since': 'not a date'}, {'minAmount': []}])
+def test_invalid_filters_raise_value_error(body):
+    with pytest.raises(ValueError):
+        parse_filters(body, 2, 3)
+
+
+def test_naive_dates_are_utc():
+    assert parse_date('2024-01-01T00:00:00') == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def test_route_returns_the_whole_list_unless_a_page_is_requested(pi_app, monkeypatch):
+    monkeypatch.setattr(pi_app.app, 'load_transactions', lambda access_token: TRANSACTIONS)
+    client = pi_app.app.app.test_client()
+    response = client.post('/api/transactions', json={'accessToken': 'token'})
+    assert ids(response.get_json()) == ids(TRANSACTIONS)
+    assert 'X-Next-Cursor' not in response.headers
+    response = client.post('/api/transactions', json={'accessToken': 'token', 'limit': 2})
+    assert ids(response.get_json()) == ['t0', 't1']
+    assert response.headers['X-Next-Cursor']
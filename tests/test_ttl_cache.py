@@ -0,0 +1,112 @@
+"""Pruebas de TTLCache: expiración, LRU, coalescencia, etiquetas y generación"""
+
+import threading
+import time
+
+import pytest
+
+from ttl_cache import TTLCache
+
+
+def test_get_returns_stored_value_until_it_expires():
+    cache = TTLCache(ttl=0.05)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_evicts_least_recently_used_entry():
+    cache = TTLCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_respects_byte_budget():
+    cache = TTLCache(max_bytes=10)
+    cache.set('a', 'x', size=6)
+    cache.set('b', 'y', size=6)
+    assert cache.get('a') is None
+    assert cache.get('b') == 'y'
+    # Un valor mayor que el presupuesto no se almacena
+    cache.set('c', 'z', size=11)
+    assert cache.get('c') is None
+
+
+def test_get_or_load_coalesces_concurrent_loads():
+    cache = TTLCache()
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(1)
+        return 'value', True
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', loader))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ['value'] * 5
+    assert cache.get('k') == 'value'
+
+
+def test_get_or_load_does_not_store_uncacheable_values():
+    cache = TTLCache()
+    assert cache.get_or_load('k', lambda: ('error', False)) == 'error'
+    assert cache.get('k') is None
+
+
+def test_get_or_load_propagates_loader_errors():
+    cache = TTLCache()
+
+    def loader():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('k', loader)
+    assert cache.get_or_load('k', lambda: ('ok', True)) == 'ok'
+
+
+def test_invalidation_during_load_discards_the_result():
+    cache = TTLCache()
+
+    def loader():
+        cache.invalidate('k')
+        return 'stale', True
+
+    assert cache.get_or_load('k', loader) == 'stale'
+    assert cache.get('k') is None
+
+
+def test_invalidate_tag_removes_tagged_keys():
+    cache = TTLCache()
+    cache.set(('me', 't1'), 1)
+    cache.set(('wallet', 't1'), 2)
+    cache.set(('me', 't2'), 3)
+    cache.tag('user:u1', ('me', 't1'), ('wallet', 't1'))
+    cache.invalidate_tag('user:u1')
+    assert cache.get(('me', 't1')) is None
+    assert cache.get(('wallet', 't1')) is None
+    assert cache.get(('me', 't2')) == 3
+
+
+def test_set_with_an_old_generation_is_ignored():
+    cache = TTLCache()
+    generation = cache.generation()
+    cache.invalidate('other')
+    cache.set('k', 'stale', generation=generation)
+    assert cache.get('k') is None
+    cache.set('k', 'fresh', generation=cache.generation())
+    assert cache.get('k') == 'fresh'
@@ -0,0 +1,151 @@
+"""
+Filtrado y paginación de las transacciones de un usuario
+Los filtros se evalúan con un generador sobre la lista descargada de la API de
+Pi Network, sin crear listas intermedias, y se detienen en cuanto se completa
+la página: solo la página (como mucho TRANSACTIONS_MAX_LIMIT transacciones) se
+codifica en la respuesta. Sin limit ni cursor se devuelven todas las que cumplen
+los filtros, como antes de la paginación.
+"""
+
+from datetime import datetime, timezone
+
+
+def parse_date(value):
+    """
+    Convierte una fecha ISO 8601 (con o sin 'Z') en un datetime con zona horaria
+
+    Raises:
+        ValueError: Si la fecha no es válida o está fuera del rango de datetime
+    """
+    try:
+        if isinstance(value, (int, float)):
+            # Milisegundos desde epoch, como los timestamps del frontend
+            return datetime.fromtimestamp(value / 1000, timezone.utc)
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (ValueError, OverflowError, OSError) as e:
+        raise ValueError(f'Invalid date {value!r}: {e}')
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_filters(body, default_limit, max_limit):
+    """
+    Lee el tamaño de página y los filtros del cuerpo de /api/transactions
+
+    Args:
+        body (dict): filterType, since, until, minAmount, maxAmount y limit (todos opcionales)
+        default_limit (int): Tamaño de página si se indica cursor pero no limit
+        max_limit (int): Tamaño máximo de página
+
+    Returns:
+        tuple: (limit, argumentos de filter_transactions). limit es None si no
+        se indican limit ni cursor: la respuesta no se pagina
+
+    Raises:
+        ValueError: Si algún valor no es válido
+    """
+    try:
+        if body.get('limit') is None and not body.get('cursor'):
+            limit = None
+        else:
+            limit = int(body['limit'] if body.get('limit') is not None else default_limit)
+        filters = {
+            'tx_type': body.get('filterType') or None,
+            'since': parse_date(body['since']) if body.get('since') is not None else None,
+            'until': parse_date(body['until']) if body.get('until') is not None else None,
+            'min_amount': float(body['minAmount']) if body.get('minAmount') is not None else None,
+            'max_amount': float(body['maxAmount']) if body.get('maxAmount') is not None else None,
+        }
+    except TypeError as e:
+        raise ValueError(str(e))
+    if limit is None:
+        return None, filters
+    if limit <= 0:
+        raise ValueError('limit must be positive')
+    return min(limit, max_limit), filters
+
+
+def encode_cursor(index, transaction):
+    """Cursor de la página siguiente: posición en la lista y el identificador que la ocupa"""
+    return f"{index}:{transaction.get('identifier', '')}"
+
+
+def decode_cursor(cursor, transactions):
+    """
+    Posición donde sigue la página indicada por un cursor
+
+    Si la lista cambió desde la página anterior (nueva descarga con transacciones
+    nuevas) se busca la transacción por su identificador.
+
+    Raises:
+        ValueError: Si el cursor no es válido o la transacción ya no está en la lista
+    """
+    try:
+        index, identifier = cursor.split(':', 1)
+        index = int(index)
+    except (AttributeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if 0 < index <= len(transactions) and transactions[index - 1].get('identifier', '') == identifier:
+        return index
+    for position, transaction in enumerate(transactions):
+        if transaction.get('identifier') == identifier:
+            return position + 1
+    raise ValueError('Cursor no longer valid, restart from the first page')
+
+
+def filter_transactions(transactions, start=0, tx_type=None, since=None, until=None,
+                        min_amount=None, max_amount=None):
+    """
+    Generador de (posición, transacción) que cumplen los filtros, desde start
+
+    Args:
+        transactions (list): Transacciones de la API de Pi Network
+        start (int): Posición donde empezar (de decode_cursor)
+        tx_type (str, opcional): metadata.type requerido
+        since, until (datetime, opcional): Rango de created_at (inclusivo)
+        min_amount, max_amount (float, opcional): Rango de amount (inclusivo)
+    """
+    for index in range(start, len(transactions)):
+        tx = transactions[index]
+        if tx_type is not None:
+            metadata = tx.get('metadata')
+            if not isinstance(metadata, dict) or metadata.get('type') != tx_type:
+                continue
+        if min_amount is not None or max_amount is not None:
+            try:
+                amount = float(tx.get('amount', 0))
+            except (TypeError, ValueError):
+                continue
+            if (min_amount is not None and amount < min_amount) or (max_amount is not None and amount > max_amount):
+                continue
+        if since is not None or until is not None:
+            try:
+                created_at = parse_date(tx.get('created_at'))
+            except (TypeError, ValueError):
+                continue
+            if (since is not None and created_at < since) or (until is not None and created_at > until):
+                continue
+        yield index, tx
+
+
+def paginate(matches, limit):
+    """
+    Toma una página de un generador de filter_transactions
+
+    Args:
+        matches: Generador de filter_transactions
+        limit (int): Tamaño de página; None devuelve todas sin cursor
+
+    Returns:
+        tuple: (transacciones de la página, cursor de la siguiente o None)
+    """
+    if limit is None:
+        return [tx for _, tx in matches], None
+    page = []
+    last_index = None
+    for index, tx in matches:
+        if len(page) == limit:
+            # Hay al menos una más: la página siguiente empieza tras la última devuelta
+            return page, encode_cursor(last_index + 1, page[-1])
+        page.append(tx)
+        last_index = index
+    return page, None
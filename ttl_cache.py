@@ -0,0 +1,173 @@
+"""
+Caché en memoria con expiración (TTL), desalojo LRU y coalescencia de peticiones
+Las búsquedas concurrentes de la misma clave comparten una única llamada de carga
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class _Flight:
+    """Carga en curso de una clave, compartida por todas las peticiones que la esperan"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Caché LRU con TTL y límite de memoria
+
+    Args:
+        ttl (float): Segundos de vida de cada entrada
+        max_entries (int): Número máximo de entradas
+        max_bytes (int): Tamaño máximo aproximado de los valores almacenados
+    """
+
+    def __init__(self, ttl=30, max_entries=1024, max_bytes=4 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # clave -> (expira, tamaño, valor)
+        self._bytes = 0
+        self._tags = OrderedDict()  # etiqueta -> conjunto de claves
+        self._inflight = {}
+        # Aumenta con cada invalidación: las cargas que no pasan por get_or_load la comparan antes de guardar
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Devuelve el valor almacenado o None si no existe o ha expirado"""
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, _, value = entry
+        if expires < time.monotonic():
+            self._remove_locked(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, size=1, generation=None):
+        """
+        Almacena un valor, desalojando las entradas menos usadas si hace falta
+
+        Args:
+            generation (int, opcional): Valor de generation() antes de cargar el
+                valor; si desde entonces hubo una invalidación no se almacena
+        """
+        with self._lock:
+            if generation is None or generation == self._generation:
+                self._set_locked(key, value, size)
+
+    def generation(self):
+        """Contador de invalidaciones, para descartar cargas que empezaron antes de una"""
+        with self._lock:
+            return self._generation
+
+    def _set_locked(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove_locked(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove_locked(oldest)
+
+    def get_or_load(self, key, loader, size_of=len):
+        """
+        Devuelve el valor de la clave o lo carga una sola vez
+
+        Args:
+            key: Clave de la caché
+            loader (callable): Devuelve (valor, cacheable); solo se almacenan
+                los valores marcados como cacheables
+            size_of (callable): Estima el tamaño en bytes de un valor
+
+        Returns:
+            El valor almacenado o el recién cargado
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value, cacheable = loader()
+            flight.value = value
+            with self._lock:
+                # Si se invalidó durante la carga, el valor ya no es fiable
+                if cacheable and self._inflight.get(key) is flight:
+                    self._set_locked(key, value, size_of(value))
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.event.set()
+
+    def tag(self, tag, *keys):
+        """
+        Asocia claves a una etiqueta para poder invalidarlas juntas
+
+        Las claves pueden no existir todavía; la asociación sobrevive al
+        desalojo de las entradas y se limita a max_entries etiquetas.
+        """
+        with self._lock:
+            self._tags.setdefault(tag, set()).update(keys)
+            self._tags.move_to_end(tag)
+            while len(self._tags) > self.max_entries:
+                self._tags.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """Elimina las claves indicadas"""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._remove_locked(key)
+                self._inflight.pop(key, None)
+
+    def invalidate_tag(self, tag):
+        """Elimina todas las claves asociadas a una etiqueta"""
+        with self._lock:
+            self._generation += 1
+            for key in self._tags.pop(tag, set()):
+                self._remove_locked(key)
+                self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)